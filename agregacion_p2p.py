@@ -0,0 +1,82 @@
+from typing import Callable, Dict, List, Optional
+
+
+# Lados del libro de Binance P2P desde el punto de vista de quien consulta:
+# BUY son anuncios que venden USDT (precio de compra), SELL los que compran USDT
+COMPRA = 'BUY'
+VENTA = 'SELL'
+
+
+def _niveles(ofertas: List[Dict]) -> List[tuple]:
+    """Pares (precio, volumen en USDT) de las ofertas con precio"""
+    return [(o['price'], o.get('volume_usdt') or 0.0) for o in ofertas if o.get('price')]
+
+
+def _vwap(niveles: List[tuple]) -> Optional[float]:
+    """Precio promedio ponderado por volumen; promedio simple si no hay volumen"""
+    if not niveles:
+        return None
+    volumen = sum(v for _, v in niveles)
+    if volumen == 0:
+        return sum(p for p, _ in niveles) / len(niveles)
+    return sum(p * v for p, v in niveles) / volumen
+
+
+def top5(libro: Dict[str, List[Dict]], **_) -> Optional[float]:
+    """Promedio ponderado por volumen de las 5 mejores ofertas de compra (cálculo original)"""
+    return _vwap(_niveles(libro.get(COMPRA, [])[:5]))
+
+
+def vwap_medio(libro: Dict[str, List[Dict]], **_) -> Optional[float]:
+    """Punto medio entre el VWAP de todo el lado de compra y el de todo el lado de venta"""
+    compra = _vwap(_niveles(libro.get(COMPRA, [])))
+    venta = _vwap(_niveles(libro.get(VENTA, [])))
+    if compra is None or venta is None:
+        return None
+    return (compra + venta) / 2
+
+
+def media_recortada(libro: Dict[str, List[Dict]], recorte: float = 0.1, **_) -> Optional[float]:
+    """Media de los precios de compra sin la fracción `recorte` más baja ni la más alta"""
+    precios = sorted(p for p, _ in _niveles(libro.get(COMPRA, [])))
+    if not precios:
+        return None
+    k = int(len(precios) * recorte)
+    centro = precios[k:len(precios) - k] or precios
+    return sum(centro) / len(centro)
+
+
+def profundidad(libro: Dict[str, List[Dict]], profundidad_usdt: float = 1000.0, **_) -> Optional[float]:
+    """Precio promedio de comprar `profundidad_usdt` recorriendo el libro desde la mejor oferta.
+    
+    Si el libro no alcanza esa profundidad se usa todo el volumen disponible.
+    """
+    niveles = sorted((n for n in _niveles(libro.get(COMPRA, [])) if n[1] > 0), key=lambda n: n[0])
+    if not niveles:
+        return None
+    consumidos = []
+    restante = profundidad_usdt
+    for precio, volumen in niveles:
+        tomado = min(volumen, restante)
+        consumidos.append((precio, tomado))
+        restante -= tomado
+        if restante <= 0:
+            break
+    return _vwap(consumidos)
+
+
+METODOS: Dict[str, Callable[..., Optional[float]]] = {
+    'top5': top5,
+    'vwap_medio': vwap_medio,
+    'media_recortada': media_recortada,
+    'profundidad': profundidad
+}
+
+
+def calcular_tasas(libro: Dict[str, List[Dict]], **parametros) -> Dict[str, Optional[float]]:
+    """Tasa del libro con cada método de agregación (recorte y profundidad_usdt son opcionales)"""
+    tasas = {}
+    for nombre, metodo in METODOS.items():
+        valor = metodo(libro, **parametros)
+        tasas[nombre] = round(valor, 4) if valor is not None else None
+    return tasas
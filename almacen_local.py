@@ -0,0 +1,306 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from config import settings
+import os
+import threading
+import logging
+
+# pandas y pyarrow se importan en el primer uso del espejo o de la exportación:
+# tardan más que el resto de la API en cargarse y no hacen falta para arrancar
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Tipo Arrow de cada columna (nombre de la función de pyarrow que lo construye)
+TIPOS_PRECIOS = {
+    'accion_codigo': 'string',
+    'fecha': 'date32',
+    'precio_cierre_bs': 'float64',
+    'precio_cierre_usd_oficial': 'float64',
+    'precio_cierre_usd_paralelo': 'float64',
+    'monto_efectivo_usd_oficial': 'float64',
+    'monto_efectivo_usd_paralelo': 'float64',
+    'num_operaciones': 'int64',
+    'titulos_negociados': 'int64',
+    'capitalizacion_oficial': 'float64',
+    'capitalizacion_paralelo': 'float64'
+}
+
+TIPOS_TASAS = {
+    'fecha': 'date32',
+    'tasa_oficial': 'float64',
+    'tasa_paralelo': 'float64'
+}
+
+COLUMNAS_PRECIOS = list(TIPOS_PRECIOS)
+
+
+def _esquema(tipos: Dict[str, str]) -> "pa.Schema":
+    import pyarrow as pa
+    return pa.schema([(columna, getattr(pa, tipo)()) for columna, tipo in tipos.items()])
+
+
+@lru_cache(maxsize=None)
+def esquema_precios() -> "pa.Schema":
+    """Esquema Arrow de precios_bvc"""
+    return _esquema(TIPOS_PRECIOS)
+
+
+@lru_cache(maxsize=None)
+def esquema_tasas() -> "pa.Schema":
+    """Esquema Arrow de tasas_cambio"""
+    return _esquema(TIPOS_TASAS)
+
+
+def tabla_arrow(filas: List[Dict[str, Any]], esquema: "pa.Schema") -> "pa.Table":
+    """Convertir filas como las devuelve PostgREST en una tabla Arrow con el esquema dado"""
+    import pyarrow as pa
+    return pa.Table.from_pandas(AlmacenColumnar._normalizar(filas, esquema), schema=esquema, preserve_index=False)
+
+
+class AlmacenColumnar:
+    """Espejo local en Parquet de las tablas precios_bvc y tasas_cambio.
+    
+    precios_bvc se particiona por año (precios_bvc/anio=AAAA/datos.parquet) y
+    tasas_cambio se guarda en un único archivo. Las lecturas usan
+    memory-mapping y filtros con poda de particiones. El espejo solo se usa
+    para leer después de una sincronización completa; a partir de ahí cada
+    ejecución del scheduler lo actualiza de forma incremental, y las demás
+    instancias lo ponen al día siguiendo el historial de ejecuciones.
+    """
+    
+    MARCA_SINCRONIZADO = ".sincronizado"
+    
+    def __init__(self, directorio: Optional[str]):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._fs_local = None
+    
+    @property
+    def habilitado(self) -> bool:
+        return bool(self.directorio)
+    
+    @property
+    def sincronizado(self) -> bool:
+        """Si el espejo tiene una copia completa y puede atender lecturas"""
+        return self.habilitado and os.path.exists(os.path.join(self.directorio, self.MARCA_SINCRONIZADO))
+    
+    @property
+    def _fs(self):
+        """Sistema de archivos de pyarrow con memory-mapping, creado en el primer uso"""
+        if self._fs_local is None:
+            from pyarrow import fs
+            self._fs_local = fs.LocalFileSystem(use_mmap=True)
+        return self._fs_local
+    
+    def _ruta(self, *partes: str) -> str:
+        return os.path.join(self.directorio, *partes)
+    
+    @staticmethod
+    def _escribir_atomico(tabla: "pa.Table", ruta: str):
+        """Escribir un archivo Parquet sin dejar lecturas a medio escribir"""
+        import pyarrow.parquet as pq
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.tmp"
+        pq.write_table(tabla, temporal, compression='zstd')
+        os.replace(temporal, ruta)
+    
+    @staticmethod
+    def _normalizar(filas: List[Dict[str, Any]], esquema: "pa.Schema") -> "pd.DataFrame":
+        import pandas as pd
+        import pyarrow as pa
+        
+        df = pd.DataFrame(filas)
+        for campo in esquema:
+            if campo.name not in df.columns:
+                df[campo.name] = None
+        df = df[esquema.names]
+        df['fecha'] = pd.to_datetime(df['fecha']).dt.date
+        for campo in esquema:
+            if pa.types.is_floating(campo.type):
+                df[campo.name] = pd.to_numeric(df[campo.name], errors='coerce')
+            elif pa.types.is_integer(campo.type):
+                df[campo.name] = pd.to_numeric(df[campo.name], errors='coerce').fillna(0).astype('int64')
+        return df
+    
+    def _fusionar(self, ruta: str, nuevas: "pd.DataFrame", claves: List[str], esquema: "pa.Schema") -> int:
+        """Fusionar filas en un archivo Parquet (las nuevas reemplazan a las existentes con la misma clave)"""
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        if os.path.exists(ruta):
+            existentes = pq.read_table(ruta, memory_map=True).to_pandas()
+            nuevas = pd.concat([existentes, nuevas], ignore_index=True)
+        nuevas = nuevas.drop_duplicates(subset=claves, keep='last').sort_values(['fecha'] + [c for c in claves if c != 'fecha'])
+        self._escribir_atomico(pa.Table.from_pandas(nuevas, schema=esquema, preserve_index=False), ruta)
+        return len(nuevas)
+    
+    def escribir_precios(self, filas: List[Dict[str, Any]]) -> int:
+        """Insertar o actualizar filas de precios_bvc en sus particiones anuales"""
+        if not self.habilitado or not filas:
+            return 0
+        
+        import pandas as pd
+        
+        df = self._normalizar(filas, esquema_precios())
+        with self._lock:
+            for anio, grupo in df.groupby(pd.to_datetime(df['fecha']).dt.year):
+                self._fusionar(
+                    self._ruta('precios_bvc', f'anio={anio}', 'datos.parquet'),
+                    grupo, ['accion_codigo', 'fecha'], esquema_precios()
+                )
+        return len(df)
+    
+    def escribir_tasas(self, filas: List[Dict[str, Any]]) -> int:
+        """Insertar o actualizar filas de tasas_cambio"""
+        if not self.habilitado or not filas:
+            return 0
+        
+        df = self._normalizar(filas, esquema_tasas())
+        with self._lock:
+            self._fusionar(self._ruta('tasas_cambio', 'datos.parquet'), df, ['fecha'], esquema_tasas())
+        return len(df)
+    
+    @property
+    def version(self) -> Optional[datetime]:
+        """Momento hasta el que el espejo tiene aplicados los cambios de la base de datos"""
+        if not self.sincronizado:
+            return None
+        try:
+            with open(self._ruta(self.MARCA_SINCRONIZADO)) as f:
+                return datetime.fromisoformat(f.read().strip())
+        except ValueError:
+            return None
+    
+    def marcar_sincronizado(self, version: Optional[datetime] = None):
+        """Registrar que el espejo contiene una copia completa, al día hasta `version`"""
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(self._ruta(self.MARCA_SINCRONIZADO), 'w') as f:
+            f.write((version or datetime.now()).isoformat())
+    
+    @staticmethod
+    def _a_registros(tabla: "pa.Table") -> List[Dict[str, Any]]:
+        """Filas con las fechas como texto ISO, igual que las devuelve PostgREST"""
+        registros = tabla.to_pylist()
+        for registro in registros:
+            registro['fecha'] = registro['fecha'].isoformat()
+        return registros
+    
+    def leer_precios(
+        self,
+        accion_codigo: Optional[str] = None,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None,
+        limit: Optional[int] = None,
+        despues: Optional[Tuple[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Leer precios ordenados por fecha descendente, con poda de particiones por año.
+        
+        despues=(fecha, accion_codigo) devuelve solo las filas posteriores a esa
+        clave en el mismo orden (paginación por cursor). Las particiones se
+        recorren del año más reciente al más antiguo y la lectura se detiene
+        al completar `limit`: una página cuesta lo que el año (o los años) que
+        la contienen, no todo el rango.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        ruta = self._ruta('precios_bvc')
+        if not os.path.isdir(ruta):
+            return []
+        
+        filtro = None
+        condiciones = []
+        anio_min, anio_max = None, None
+        if accion_codigo:
+            condiciones.append(ds.field('accion_codigo') == accion_codigo)
+        if fecha_inicio:
+            condiciones.append(ds.field('fecha') >= fecha_inicio)
+            anio_min = fecha_inicio.year
+        if fecha_fin:
+            condiciones.append(ds.field('fecha') <= fecha_fin)
+            anio_max = fecha_fin.year
+        if despues:
+            fecha_cursor = date.fromisoformat(despues[0])
+            condiciones.append(
+                (ds.field('fecha') < fecha_cursor)
+                | ((ds.field('fecha') == fecha_cursor) & (ds.field('accion_codigo') > despues[1]))
+            )
+            anio_max = fecha_cursor.year if anio_max is None else min(anio_max, fecha_cursor.year)
+        for condicion in condiciones:
+            filtro = condicion if filtro is None else filtro & condicion
+        
+        anios = sorted(
+            (int(nombre.split('=', 1)[1]) for nombre in os.listdir(ruta) if nombre.startswith('anio=')),
+            reverse=True
+        )
+        tablas = []
+        restantes = limit
+        for anio in anios:
+            if (anio_max is not None and anio > anio_max) or (anio_min is not None and anio < anio_min):
+                continue
+            archivo = self._ruta('precios_bvc', f'anio={anio}', 'datos.parquet')
+            if not os.path.exists(archivo):
+                continue
+            tabla = ds.dataset(archivo, format='parquet', filesystem=self._fs).to_table(
+                columns=COLUMNAS_PRECIOS, filter=filtro
+            )
+            tabla = tabla.sort_by([('fecha', 'descending'), ('accion_codigo', 'ascending')])
+            if restantes is not None:
+                tabla = tabla.slice(0, restantes)
+                restantes -= tabla.num_rows
+            tablas.append(tabla)
+            if restantes == 0:
+                break
+        
+        if not tablas:
+            return []
+        return self._a_registros(pa.concat_tables(tablas))
+    
+    def leer_tasas(
+        self,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """Leer tasas de cambio ordenadas por fecha ascendente"""
+        import pyarrow.dataset as ds
+        
+        ruta = self._ruta('tasas_cambio', 'datos.parquet')
+        if not os.path.exists(ruta):
+            return []
+        
+        filtro = None
+        if fecha_inicio:
+            filtro = ds.field('fecha') >= fecha_inicio
+        if fecha_fin:
+            condicion = ds.field('fecha') <= fecha_fin
+            filtro = condicion if filtro is None else filtro & condicion
+        
+        tabla = ds.dataset(ruta, format='parquet', filesystem=self._fs).to_table(filter=filtro)
+        return self._a_registros(tabla.sort_by('fecha'))
+    
+    def estado(self) -> Dict[str, Any]:
+        """Información del espejo para /api/health"""
+        if not self.habilitado:
+            return {'habilitado': False}
+        
+        ruta = self._ruta('precios_bvc')
+        filas = 0
+        if os.path.isdir(ruta):
+            import pyarrow.dataset as ds
+            filas = ds.dataset(ruta, format='parquet', partitioning='hive', filesystem=self._fs).count_rows()
+        return {
+            'habilitado': True,
+            'sincronizado': self.sincronizado,
+            'filas_precios': filas
+        }
+
+
+# Instancia global del espejo local (deshabilitado si ALMACEN_LOCAL_DIR no está definido)
+almacen_local = AlmacenColumnar(settings.almacen_local_dir)
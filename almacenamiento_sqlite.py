@@ -0,0 +1,531 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sqlite_schema.sql")
+
+_IDENTIFICADOR = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+_OPERADORES = {'eq': '=', 'neq': '!=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+
+
+def _columna(nombre: str) -> str:
+    """Validar un nombre de columna o tabla antes de interpolarlo en SQL"""
+    nombre = nombre.strip()
+    if not _IDENTIFICADOR.match(nombre):
+        raise ValueError(f"Identificador no válido: {nombre!r}")
+    return nombre
+
+
+def _partir(texto: str) -> List[str]:
+    """Separar por comas de primer nivel (sin entrar en and(...)/or(...))"""
+    partes, nivel, actual = [], 0, ''
+    for caracter in texto:
+        if caracter == ',' and nivel == 0:
+            partes.append(actual)
+            actual = ''
+            continue
+        nivel += caracter == '('
+        nivel -= caracter == ')'
+        actual += caracter
+    return partes + [actual]
+
+
+def _filtro_logico(expresion: str, conector: str = 'OR') -> Tuple[str, List[Any]]:
+    """Traducir un filtro lógico de PostgREST (a.lt.1,and(b.eq.2,c.gt."x")) a SQL con parámetros"""
+    condiciones, parametros = [], []
+    for parte in _partir(expresion):
+        if parte.startswith(('and(', 'or(')):
+            logica, _, interior = parte.partition('(')
+            sql, params = _filtro_logico(interior[:-1], logica.upper())
+        else:
+            columna, operador, valor = parte.split('.', 2)
+            sql, params = f"{_columna(columna)} {_OPERADORES[operador]} ?", [valor.strip('"')]
+        condiciones.append(f"({sql})")
+        parametros.extend(params)
+    return f" {conector} ".join(condiciones), parametros
+
+
+class ConsultaSQLite:
+    """Consulta encadenable con la misma interfaz que el query builder de PostgREST.
+    
+    Cubre las operaciones que usa Database (select con filtros, orden,
+    límite y rango, insert y upsert) y las traduce a una sentencia SQL.
+    """
+    
+    def __init__(self, cliente: "ClienteSQLite", tabla: str):
+        self.cliente = cliente
+        self.tabla = _columna(tabla)
+        self.columnas = '*'
+        self.condiciones: List[str] = []
+        self.parametros: List[Any] = []
+        self.orden: List[str] = []
+        self.limite: Optional[int] = None
+        self.desplazamiento = 0
+        self.escritura: Optional[Tuple[List[Dict], Optional[List[str]], bool]] = None
+    
+    def select(self, columnas: str = '*', **kwargs):
+        if columnas.strip() != '*':
+            columnas = ', '.join(_columna(c) for c in columnas.split(','))
+        self.columnas = columnas
+        return self
+    
+    def _comparar(self, columna: str, operador: str, valor: Any):
+        self.condiciones.append(f"{_columna(columna)} {operador} ?")
+        self.parametros.append(self.cliente.adaptar(valor))
+        return self
+    
+    def eq(self, columna, valor):
+        return self._comparar(columna, '=', valor)
+    
+    def neq(self, columna, valor):
+        return self._comparar(columna, '!=', valor)
+    
+    def gt(self, columna, valor):
+        return self._comparar(columna, '>', valor)
+    
+    def gte(self, columna, valor):
+        return self._comparar(columna, '>=', valor)
+    
+    def lt(self, columna, valor):
+        return self._comparar(columna, '<', valor)
+    
+    def lte(self, columna, valor):
+        return self._comparar(columna, '<=', valor)
+    
+    def in_(self, columna, valores):
+        valores = list(valores)
+        if not valores:
+            self.condiciones.append("0")
+            return self
+        self.condiciones.append(f"{_columna(columna)} IN ({', '.join('?' * len(valores))})")
+        self.parametros.extend(self.cliente.adaptar(v) for v in valores)
+        return self
+    
+    def or_(self, expresion: str):
+        sql, parametros = _filtro_logico(expresion)
+        self.condiciones.append(f"({sql})")
+        self.parametros.extend(parametros)
+        return self
+    
+    def order(self, columna, desc=False):
+        self.orden.append(f"{_columna(columna)} {'DESC' if desc else 'ASC'}")
+        return self
+    
+    def limit(self, n):
+        self.limite = n
+        return self
+    
+    def range(self, inicio, fin):
+        self.desplazamiento = inicio
+        self.limite = fin - inicio + 1
+        return self
+    
+    def insert(self, filas, returning=None, **kwargs):
+        self.escritura = (filas if isinstance(filas, list) else [filas], None, returning is None)
+        return self
+    
+    def upsert(self, filas, on_conflict: str = 'id', returning=None, **kwargs):
+        claves = [_columna(c) for c in on_conflict.split(',')]
+        self.escritura = (filas if isinstance(filas, list) else [filas], claves, returning is None)
+        return self
+    
+    def _sql_lectura(self) -> Tuple[str, List[Any]]:
+        sql = f"SELECT {self.columnas} FROM {self.tabla}"
+        if self.condiciones:
+            sql += " WHERE " + " AND ".join(self.condiciones)
+        if self.orden:
+            sql += " ORDER BY " + ", ".join(self.orden)
+        if self.limite is not None or self.desplazamiento:
+            sql += f" LIMIT {int(self.limite if self.limite is not None else -1)} OFFSET {int(self.desplazamiento)}"
+        return sql, self.parametros
+    
+    def _escribir(self, conexion: sqlite3.Connection) -> List[Dict]:
+        filas, claves, devolver = self.escritura
+        # Las filas de un lote pueden traer columnas distintas: una sentencia por cada forma
+        grupos: Dict[Tuple[str, ...], List[Dict]] = {}
+        for fila in filas:
+            grupos.setdefault(tuple(fila), []).append(fila)
+        
+        for columnas, grupo in grupos.items():
+            columnas = [_columna(c) for c in columnas]
+            sql = (
+                f"INSERT INTO {self.tabla} ({', '.join(columnas)}) "
+                f"VALUES ({', '.join('?' * len(columnas))})"
+            )
+            if claves:
+                actualizar = [c for c in columnas if c not in claves]
+                sql += f" ON CONFLICT ({', '.join(claves)}) DO " + (
+                    "UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in actualizar)
+                    if actualizar else "NOTHING"
+                )
+            conexion.executemany(
+                sql, [[self.cliente.adaptar(f[c]) for c in columnas] for f in grupo]
+            )
+        return filas if devolver else []
+    
+    def _ejecutar_sync(self) -> List[Dict]:
+        with self.cliente.conexion() as conexion:
+            if self.escritura is not None:
+                return self._escribir(conexion)
+            sql, parametros = self._sql_lectura()
+            cursor = conexion.execute(sql, parametros)
+            return self.cliente.filas(self.tabla, cursor)
+    
+    async def execute(self):
+        return SimpleNamespace(data=await asyncio.to_thread(self._ejecutar_sync))
+
+
+class LlamadaSQLite:
+    """Llamada a una de las funciones de supabase_schema.sql, implementadas en SQL de SQLite"""
+    
+    def __init__(self, cliente: "ClienteSQLite", funcion, parametros: Dict[str, Any]):
+        self.cliente = cliente
+        self.funcion = funcion
+        self.parametros = parametros
+    
+    def _ejecutar_sync(self):
+        with self.cliente.conexion() as conexion:
+            return self.funcion(conexion, **self.parametros)
+    
+    async def execute(self):
+        return SimpleNamespace(data=await asyncio.to_thread(self._ejecutar_sync))
+
+
+class ClienteSQLite:
+    """Motor local embebido con la interfaz del cliente asíncrono de Supabase.
+    
+    Database lo usa igual que al cliente de Supabase (table(...) y rpc(...)),
+    así que las consultas no cambian al elegir ALMACENAMIENTO=sqlite. Las
+    sentencias corren en hilos sobre una conexión compartida con un lock;
+    el archivo usa WAL para que las lecturas no esperen a las escrituras.
+    """
+    
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode = WAL")
+        self._conexion.execute("PRAGMA synchronous = NORMAL")
+        with open(ESQUEMA, encoding="utf-8") as f:
+            self._conexion.executescript(f.read())
+        
+        # Columnas JSON y booleanas de cada tabla, para convertirlas al leer
+        self._tipos: Dict[str, Dict[str, str]] = {}
+        tablas = self._conexion.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"
+        ).fetchall()
+        for (tabla,) in tablas:
+            self._tipos[tabla] = {
+                columna[1]: columna[2].upper()
+                for columna in self._conexion.execute(f"PRAGMA table_info({tabla})")
+                if columna[2].upper() in ('JSON', 'BOOLEAN')
+            }
+        logger.info(f"💾 Almacenamiento SQLite en {os.path.abspath(ruta)}")
+    
+    def conexion(self):
+        """Conexión dentro de una transacción; el lock serializa el acceso entre hilos"""
+        cliente = self
+        
+        class _Transaccion:
+            def __enter__(self):
+                cliente._lock.acquire()
+                cliente._conexion.execute("BEGIN")
+                return cliente._conexion
+            
+            def __exit__(self, tipo, *exc):
+                try:
+                    cliente._conexion.execute("ROLLBACK" if tipo else "COMMIT")
+                finally:
+                    cliente._lock.release()
+        
+        return _Transaccion()
+    
+    @staticmethod
+    def adaptar(valor: Any) -> Any:
+        """Valor de Python a SQLite: listas y diccionarios se guardan como JSON"""
+        if isinstance(valor, (dict, list)):
+            return json.dumps(valor, ensure_ascii=False, default=str)
+        return valor
+    
+    def filas(self, tabla: str, cursor: sqlite3.Cursor) -> List[Dict]:
+        """Filas como diccionarios, con JSON y booleanos decodificados como en PostgREST"""
+        columnas = [d[0] for d in cursor.description]
+        tipos = self._tipos.get(tabla, {})
+        filas = [dict(zip(columnas, f)) for f in cursor.fetchall()]
+        if tipos:
+            for fila in filas:
+                for columna, tipo in tipos.items():
+                    valor = fila.get(columna)
+                    if valor is None:
+                        continue
+                    fila[columna] = json.loads(valor) if tipo == 'JSON' else bool(valor)
+        return filas
+    
+    def table(self, nombre: str) -> ConsultaSQLite:
+        return ConsultaSQLite(self, nombre)
+    
+    def rpc(self, nombre: str, parametros: Optional[Dict[str, Any]] = None) -> LlamadaSQLite:
+        funciones = {
+            'refrescar_agregados': refrescar_agregados,
+            'compactar_tasas_intradia': compactar_tasas_intradia,
+            'adquirir_bloqueo': adquirir_bloqueo
+        }
+        if nombre not in funciones:
+            raise ValueError(f"Función no disponible en SQLite: {nombre}")
+        return LlamadaSQLite(self, funciones[nombre], parametros or {})
+
+
+# ==================== FUNCIONES ====================
+
+def refrescar_agregados(
+    conexion: sqlite3.Connection,
+    p_fecha_inicio: str,
+    p_fecha_fin: str,
+    p_ventanas: Tuple[int, ...] = (7, 30, 90, 365)
+) -> int:
+    """Equivalente de refrescar_agregados() de supabase_schema.sql"""
+    cursor = conexion.execute("""
+        INSERT INTO agregados_mercado (
+            fecha, total_acciones, acciones_negociadas,
+            capitalizacion_total_oficial, capitalizacion_total_paralelo,
+            monto_efectivo_usd_oficial, monto_efectivo_usd_paralelo,
+            num_operaciones, titulos_negociados, updated_at
+        )
+        WITH dias AS (
+            SELECT fecha, COUNT(*) AS acciones_negociadas,
+                   SUM(monto_efectivo_usd_oficial) AS monto_oficial,
+                   SUM(monto_efectivo_usd_paralelo) AS monto_paralelo,
+                   SUM(num_operaciones) AS operaciones,
+                   SUM(titulos_negociados) AS titulos
+            FROM precios_bvc
+            WHERE fecha BETWEEN ? AND ?
+            GROUP BY fecha
+        ),
+        capitalizaciones AS (
+            SELECT d.fecha,
+                   COUNT(u.fecha) AS total_acciones,
+                   COALESCE(SUM(u.capitalizacion_oficial), 0) AS cap_oficial,
+                   COALESCE(SUM(u.capitalizacion_paralelo), 0) AS cap_paralelo
+            FROM dias d
+            CROSS JOIN acciones a
+            LEFT JOIN precios_bvc u
+              ON u.accion_codigo = a.codigo
+             AND u.fecha = (
+                SELECT MAX(p.fecha) FROM precios_bvc p
+                WHERE p.accion_codigo = a.codigo AND p.fecha <= d.fecha
+             )
+            WHERE a.activa = 1
+            GROUP BY d.fecha
+        )
+        SELECT d.fecha, c.total_acciones, d.acciones_negociadas,
+               c.cap_oficial, c.cap_paralelo,
+               d.monto_oficial, d.monto_paralelo,
+               d.operaciones, d.titulos, CURRENT_TIMESTAMP
+        FROM dias d
+        JOIN capitalizaciones c ON c.fecha = d.fecha
+        WHERE true
+        ON CONFLICT (fecha) DO UPDATE SET
+            total_acciones = excluded.total_acciones,
+            acciones_negociadas = excluded.acciones_negociadas,
+            capitalizacion_total_oficial = excluded.capitalizacion_total_oficial,
+            capitalizacion_total_paralelo = excluded.capitalizacion_total_paralelo,
+            monto_efectivo_usd_oficial = excluded.monto_efectivo_usd_oficial,
+            monto_efectivo_usd_paralelo = excluded.monto_efectivo_usd_paralelo,
+            num_operaciones = excluded.num_operaciones,
+            titulos_negociados = excluded.titulos_negociados,
+            updated_at = CURRENT_TIMESTAMP
+    """, (p_fecha_inicio, p_fecha_fin))
+    dias = cursor.rowcount
+    
+    ventanas = ", ".join(f"({int(v)})" for v in p_ventanas)
+    conexion.execute(f"""
+        INSERT INTO estadisticas_acciones (
+            accion_codigo, ventana_dias, fecha,
+            precio_actual_oficial, precio_actual_paralelo,
+            capitalizacion_oficial, capitalizacion_paralelo,
+            precio_minimo_oficial, precio_maximo_oficial, precio_promedio_oficial,
+            precio_minimo_paralelo, precio_maximo_paralelo, precio_promedio_paralelo,
+            titulos_negociados, monto_efectivo_usd_oficial,
+            retorno_oficial, retorno_paralelo, sesiones, updated_at
+        )
+        WITH v(dias) AS (VALUES {ventanas}),
+        ultimos AS (
+            SELECT u.* FROM precios_bvc u
+            WHERE u.fecha = (SELECT MAX(p.fecha) FROM precios_bvc p WHERE p.accion_codigo = u.accion_codigo)
+        ),
+        ventanas AS (
+            SELECT u.accion_codigo, v.dias, u.fecha,
+                   u.precio_cierre_usd_oficial, u.precio_cierre_usd_paralelo,
+                   u.capitalizacion_oficial, u.capitalizacion_paralelo,
+                   MIN(p.precio_cierre_usd_oficial) AS min_oficial,
+                   MAX(p.precio_cierre_usd_oficial) AS max_oficial,
+                   AVG(p.precio_cierre_usd_oficial) AS prom_oficial,
+                   MIN(p.precio_cierre_usd_paralelo) AS min_paralelo,
+                   MAX(p.precio_cierre_usd_paralelo) AS max_paralelo,
+                   AVG(p.precio_cierre_usd_paralelo) AS prom_paralelo,
+                   SUM(p.titulos_negociados) AS titulos,
+                   SUM(p.monto_efectivo_usd_oficial) AS monto_oficial,
+                   (SELECT i.precio_cierre_usd_oficial FROM precios_bvc i
+                    WHERE i.accion_codigo = u.accion_codigo AND i.precio_cierre_usd_oficial > 0
+                      AND i.fecha > date(u.fecha, '-' || v.dias || ' days') AND i.fecha <= u.fecha
+                    ORDER BY i.fecha LIMIT 1) AS inicial_oficial,
+                   (SELECT i.precio_cierre_usd_paralelo FROM precios_bvc i
+                    WHERE i.accion_codigo = u.accion_codigo AND i.precio_cierre_usd_paralelo > 0
+                      AND i.fecha > date(u.fecha, '-' || v.dias || ' days') AND i.fecha <= u.fecha
+                    ORDER BY i.fecha LIMIT 1) AS inicial_paralelo,
+                   COUNT(*) AS sesiones
+            FROM ultimos u
+            CROSS JOIN v
+            JOIN precios_bvc p
+              ON p.accion_codigo = u.accion_codigo
+             AND p.fecha > date(u.fecha, '-' || v.dias || ' days')
+             AND p.fecha <= u.fecha
+            GROUP BY u.accion_codigo, v.dias
+        )
+        SELECT accion_codigo, dias, fecha,
+               precio_cierre_usd_oficial, precio_cierre_usd_paralelo,
+               capitalizacion_oficial, capitalizacion_paralelo,
+               min_oficial, max_oficial, prom_oficial,
+               min_paralelo, max_paralelo, prom_paralelo,
+               titulos, monto_oficial,
+               precio_cierre_usd_oficial / NULLIF(inicial_oficial, 0) - 1,
+               precio_cierre_usd_paralelo / NULLIF(inicial_paralelo, 0) - 1,
+               sesiones, CURRENT_TIMESTAMP
+        FROM ventanas
+        WHERE true
+        ON CONFLICT (accion_codigo, ventana_dias) DO UPDATE SET
+            fecha = excluded.fecha,
+            precio_actual_oficial = excluded.precio_actual_oficial,
+            precio_actual_paralelo = excluded.precio_actual_paralelo,
+            capitalizacion_oficial = excluded.capitalizacion_oficial,
+            capitalizacion_paralelo = excluded.capitalizacion_paralelo,
+            precio_minimo_oficial = excluded.precio_minimo_oficial,
+            precio_maximo_oficial = excluded.precio_maximo_oficial,
+            precio_promedio_oficial = excluded.precio_promedio_oficial,
+            precio_minimo_paralelo = excluded.precio_minimo_paralelo,
+            precio_maximo_paralelo = excluded.precio_maximo_paralelo,
+            precio_promedio_paralelo = excluded.precio_promedio_paralelo,
+            titulos_negociados = excluded.titulos_negociados,
+            monto_efectivo_usd_oficial = excluded.monto_efectivo_usd_oficial,
+            retorno_oficial = excluded.retorno_oficial,
+            retorno_paralelo = excluded.retorno_paralelo,
+            sesiones = excluded.sesiones,
+            updated_at = CURRENT_TIMESTAMP
+    """)
+    return dias
+
+
+def _velas_sql(origen: str, apertura: str, cierre: str, maximo: str, minimo: str, muestras: str) -> str:
+    """SELECT de velas OHLC de la CTE `origen`_periodos agrupada por el inicio de cada periodo"""
+    def extremo(fuente: str, columna: str, orden: str) -> str:
+        return (
+            f"(SELECT x.{fuente}_{columna} FROM {origen}_periodos x "
+            f"WHERE x.periodo = o.periodo AND x.{fuente}_{columna} IS NOT NULL "
+            f"ORDER BY x.momento {orden} LIMIT 1)"
+        )
+    
+    columnas = []
+    for fuente in ('oficial', 'paralelo'):
+        columnas += [
+            extremo(fuente, apertura, 'ASC'),
+            f"MAX(o.{fuente}_{maximo})",
+            f"MIN(o.{fuente}_{minimo})",
+            extremo(fuente, cierre, 'DESC')
+        ]
+    return f"SELECT o.periodo, {', '.join(columnas)}, {muestras} FROM {origen}_periodos o GROUP BY o.periodo"
+
+
+def compactar_tasas_intradia(
+    conexion: sqlite3.Connection,
+    p_retencion_muestras: str = "7 days",
+    p_retencion_horaria: str = "90 days"
+) -> int:
+    """Equivalente de compactar_tasas_intradia() de supabase_schema.sql"""
+    referencia, desde = conexion.execute(
+        "SELECT MAX(capturado_en), MIN(capturado_en) FROM tasas_intradia"
+    ).fetchone()
+    if referencia is None:
+        return 0
+    
+    actualizar = """
+        ON CONFLICT (resolucion, inicio) DO UPDATE SET
+            oficial_apertura = excluded.oficial_apertura,
+            oficial_maximo = excluded.oficial_maximo,
+            oficial_minimo = excluded.oficial_minimo,
+            oficial_cierre = excluded.oficial_cierre,
+            paralelo_apertura = excluded.paralelo_apertura,
+            paralelo_maximo = excluded.paralelo_maximo,
+            paralelo_minimo = excluded.paralelo_minimo,
+            paralelo_cierre = excluded.paralelo_cierre,
+            muestras = excluded.muestras
+    """
+    
+    # 1. Velas horarias a partir de las muestras
+    conexion.execute(f"""
+        INSERT INTO tasas_intradia_ohlc
+        WITH muestras_periodos AS (
+            SELECT strftime('%Y-%m-%dT%H:00:00', capturado_en) AS periodo, capturado_en AS momento,
+                   tasa_oficial AS oficial_tasa, tasa_paralelo AS paralelo_tasa
+            FROM tasas_intradia
+        )
+        SELECT '1h', * FROM ({_velas_sql('muestras', 'tasa', 'tasa', 'tasa', 'tasa', 'COUNT(*)')})
+        WHERE true
+        {actualizar}
+    """)
+    
+    # 2. Velas diarias a partir de las horarias de los días que aún tienen muestras
+    conexion.execute(f"""
+        INSERT INTO tasas_intradia_ohlc
+        WITH horas_periodos AS (
+            SELECT strftime('%Y-%m-%dT00:00:00', inicio) AS periodo, inicio AS momento, *
+            FROM tasas_intradia_ohlc
+            WHERE resolucion = '1h' AND inicio >= strftime('%Y-%m-%dT00:00:00', ?)
+        )
+        SELECT '1d', * FROM ({_velas_sql('horas', 'apertura', 'cierre', 'maximo', 'minimo', 'SUM(o.muestras)')})
+        WHERE true
+        {actualizar}
+    """, (desde,))
+    
+    # 3. Retención (en límite de día para las muestras, como en PostgreSQL)
+    cursor = conexion.execute(
+        "DELETE FROM tasas_intradia WHERE capturado_en < strftime('%Y-%m-%dT00:00:00', ?, ?)",
+        (referencia, f"-{p_retencion_muestras}")
+    )
+    borradas = cursor.rowcount
+    conexion.execute(
+        "DELETE FROM tasas_intradia_ohlc WHERE resolucion = '1h' AND inicio < strftime('%Y-%m-%dT%H:%M:%S', ?, ?)",
+        (referencia, f"-{p_retencion_horaria}")
+    )
+    return borradas
+
+
+def adquirir_bloqueo(conexion: sqlite3.Connection, p_tarea: str, p_titular: str, p_segundos: int) -> bool:
+    """Equivalente de adquirir_bloqueo() de supabase_schema.sql (horas en UTC)"""
+    cursor = conexion.execute("""
+        INSERT INTO bloqueos_tareas (tarea, titular, adquirido_en, expira_en)
+        VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now'), strftime('%Y-%m-%dT%H:%M:%f', 'now', ?))
+        ON CONFLICT (tarea) DO UPDATE SET
+            titular = excluded.titular,
+            adquirido_en = CASE
+                WHEN bloqueos_tareas.titular = excluded.titular THEN bloqueos_tareas.adquirido_en
+                ELSE excluded.adquirido_en
+            END,
+            expira_en = excluded.expira_en
+        WHERE bloqueos_tareas.titular = excluded.titular
+           OR bloqueos_tareas.expira_en < strftime('%Y-%m-%dT%H:%M:%f', 'now')
+    """, (p_tarea, p_titular, f"+{int(p_segundos)} seconds"))
+    return cursor.rowcount > 0
+
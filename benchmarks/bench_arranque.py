@@ -0,0 +1,86 @@
+"""
+Benchmark del arranque: tiempo de importación de main y utils.
+
+Cada repetición importa el módulo en un proceso nuevo (arranque en frío del
+intérprete) con `python -X importtime` y mide:
+
+    total     tiempo de `import <módulo>` medido dentro del proceso
+    pesados   dependencias pesadas que quedaron cargadas (pandas, pyarrow,
+              supabase...); con la carga diferida no debería aparecer ninguna
+
+Con --detalle se listan los módulos con mayor tiempo acumulado según
+-X importtime en la primera repetición.
+
+Uso:
+    python benchmarks/bench_arranque.py [--modulos main utils] [--repeticiones 5] [--detalle 15]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+import comun
+
+# Dependencias que solo hacen falta para la ingesta, la exportación o el acceso a la base de datos
+PESADOS = ('pandas', 'numpy', 'pyarrow', 'bs4', 'lxml', 'supabase', 'postgrest', 'httpx', 'apscheduler')
+
+CODIGO = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+total = time.perf_counter() - inicio
+print(json.dumps({{'total_ms': total * 1000, 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def importar(modulo: str):
+    """Importar el módulo en un intérprete nuevo; devuelve la medición y la salida de -X importtime"""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO.format(modulo=modulo, pesados=PESADOS)],
+        cwd=comun.RAIZ, capture_output=True, text=True, check=True
+    )
+    return json.loads(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+
+def mas_lentos(importtime: str, cantidad: int):
+    """(acumulado en ms, módulo, profundidad) de los módulos con más tiempo acumulado"""
+    filas = []
+    for linea in importtime.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        profundidad = (len(nombre) - len(nombre.lstrip())) // 2
+        filas.append((int(acumulado) / 1000, nombre.strip(), profundidad))
+    return sorted(filas, reverse=True)[:cantidad]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulos', nargs='+', default=['main', 'utils'])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--detalle', type=int, default=0, help="módulos más lentos a listar")
+    args = parser.parse_args()
+    
+    print(f"{'Módulo':<10} {'mediana ms':>11} {'mín ms':>8}   pesados cargados")
+    print("-" * 60)
+    detalles = {}
+    for modulo in args.modulos:
+        tiempos, pesados = [], []
+        for i in range(args.repeticiones):
+            medicion, importtime = importar(modulo)
+            tiempos.append(medicion['total_ms'])
+            pesados = medicion['pesados']
+            if i == 0:
+                detalles[modulo] = importtime
+        print(f"{modulo:<10} {statistics.median(tiempos):>11.1f} {min(tiempos):>8.1f}   {', '.join(pesados) or '-'}")
+    
+    if args.detalle:
+        for modulo, importtime in detalles.items():
+            print(f"\nMódulos más lentos al importar {modulo} (acumulado):")
+            for acumulado, nombre, profundidad in mas_lentos(importtime, args.detalle):
+                print(f"  {acumulado:>8.1f} ms  {'  ' * profundidad}{nombre}")
+
+
+if __name__ == "__main__":
+    main()
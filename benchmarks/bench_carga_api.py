@@ -0,0 +1,119 @@
+"""
+Benchmark de carga de /api/precios/bvc con distintas capas de acceso a datos.
+
+Levanta un PostgREST local con latencia fija y lanza peticiones concurrentes
+contra la aplicación (en proceso, vía ASGI) para comparar peticiones/segundo:
+
+    bloqueante  cliente supabase síncrono ejecutado en el event loop (original)
+    hilos       cliente síncrono ejecutado con asyncio.to_thread
+    async       cliente supabase asíncrono (implementación actual)
+
+El PostgREST local comparte proceso con la API: con latencias bajas y
+respuestas grandes la medición queda limitada por CPU (serialización JSON),
+no por la capa de datos. Los valores por defecto favorecen la E/S.
+
+Uso:
+    python benchmarks/bench_carga_api.py [--concurrencia 50] [--segundos 5] [--latencia-ms 50] [--filas 20]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+
+from servidores import ServidorLocal, app_postgrest
+
+
+def generar_precios(n: int = 100):
+    hoy = date.today()
+    return [
+        {
+            'id': i,
+            'accion_codigo': f"ACC{i % 29:03d}",
+            'fecha': (hoy - timedelta(days=i // 29)).isoformat(),
+            'precio_cierre_bs': 100.0 + i,
+            'precio_cierre_usd_oficial': 2.5,
+            'precio_cierre_usd_paralelo': 2.0,
+            'monto_efectivo_usd_oficial': 1000.0,
+            'monto_efectivo_usd_paralelo': 800.0,
+            'num_operaciones': 10,
+            'titulos_negociados': 1000,
+            'capitalizacion_oficial': 1e6,
+            'capitalizacion_paralelo': 8e5
+        }
+        for i in range(n)
+    ]
+
+
+def crear_databases():
+    """Las tres variantes de la capa de datos sobre la misma URL"""
+    from supabase import create_client
+    from config import settings
+    from database import Database
+    
+    class DatabaseBloqueante(Database):
+        def __init__(self):
+            super().__init__()
+            self._cliente_sync = create_client(settings.supabase_url, settings.supabase_key)
+        
+        async def _tabla(self, nombre):
+            return self._cliente_sync.table(nombre)
+        
+        async def _ejecutar(self, query):
+            return query.execute()
+    
+    class DatabaseHilos(DatabaseBloqueante):
+        async def _ejecutar(self, query):
+            return await asyncio.to_thread(query.execute)
+    
+    return {'bloqueante': DatabaseBloqueante, 'hilos': DatabaseHilos, 'async': Database}
+
+
+async def medir(app, concurrencia: int, segundos: float, filas: int) -> float:
+    """Peticiones por segundo completadas durante la ventana de medición"""
+    import httpx
+    
+    completadas = 0
+    fin = time.perf_counter() + segundos
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as cliente:
+        async def trabajador():
+            nonlocal completadas
+            while time.perf_counter() < fin:
+                r = await cliente.get("/api/precios/bvc", params={"limit": filas})
+                r.raise_for_status()
+                completadas += 1
+        
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        return completadas / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrencia', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    parser.add_argument('--latencia-ms', type=float, default=50.0)
+    parser.add_argument('--filas', type=int, default=20)
+    args = parser.parse_args()
+    
+    with ServidorLocal(app_postgrest({'precios_bvc': generar_precios()}, args.latencia_ms / 1000)) as postgrest:
+        os.environ["SUPABASE_URL"] = postgrest.url
+        import comun  # noqa: F401  (rutas y credenciales ficticias)
+        import logging
+        logging.disable(logging.INFO)
+        import main as api
+        
+        print(f"PostgREST local con {args.latencia_ms:.0f} ms de latencia, {args.filas} filas por respuesta, "
+              f"{args.concurrencia} clientes concurrentes, {args.segundos:.0f}s por variante\n")
+        print(f"{'Variante':<12} {'req/s':>8}")
+        print("-" * 21)
+        
+        for nombre, clase in crear_databases().items():
+            api.db = clase()
+            rps = asyncio.run(medir(api.app, args.concurrencia, args.segundos, args.filas))
+            print(f"{nombre:<12} {rps:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
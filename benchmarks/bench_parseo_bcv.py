@@ -0,0 +1,80 @@
+"""
+Benchmark del parseo de la página del BCV: árbol completo vs extracción parcial.
+
+Sobre la página grabada en fixtures/ compara tiempo y memoria de:
+
+    html.parser  BeautifulSoup(..., 'html.parser') de toda la página (original)
+    lxml         lxml.html de toda la página + XPath
+    parcial      BCVService.parsear_tasa_oficial: lxml solo sobre el fragmento de la tabla
+
+La memoria es el pico de tracemalloc, que solo ve asignaciones de Python: el
+árbol de BeautifulSoup se cuenta completo, el de libxml2 (lxml) no. Por eso se
+informa también el tamaño de la entrada que recibe cada parser.
+
+Uso:
+    python benchmarks/bench_parseo_bcv.py [--repeticiones 50]
+"""
+import argparse
+import tracemalloc
+
+import comun
+import fixtures
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from services import BCVService
+
+
+def ruta_html_parser(contenido: bytes):
+    soup = BeautifulSoup(contenido, 'html.parser')
+    fila = soup.find('div', class_='view-content').find('table').find('tbody').find('tr')
+    return [c.get_text(strip=True) for c in fila.find_all('td')]
+
+
+def ruta_lxml(contenido: bytes):
+    arbol = lxml_html.fromstring(contenido)
+    fila = arbol.xpath('//div[contains(concat(" ", @class, " "), " view-content ")]//table//tbody/tr[1]')[0]
+    return [td.text_content().strip() for td in fila.xpath('./td')]
+
+
+def pico_memoria(funcion) -> float:
+    """Pico de memoria (KiB) asignada por Python durante una ejecución"""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+    
+    servicio = BCVService()
+    contenido = fixtures.cargar('bcv')
+    inicio = contenido.find(servicio.MARCA_CONTENEDOR)
+    fragmento = contenido.find(b'</table>', inicio) - contenido.rfind(b'<div', 0, inicio)
+    
+    celdas = ruta_html_parser(contenido)
+    assert ruta_lxml(contenido) == celdas
+    assert servicio._celdas_rapido(contenido) == celdas
+    print(f"Página: {len(contenido):,} bytes; fragmento de la tabla: {fragmento:,} bytes\n")
+    
+    rutas = {
+        'html.parser': (lambda: ruta_html_parser(contenido), len(contenido)),
+        'lxml': (lambda: ruta_lxml(contenido), len(contenido)),
+        'parcial': (lambda: servicio.parsear_tasa_oficial(contenido), fragmento)
+    }
+    
+    print(f"{'Parser':<12} {'ms':>8} {'pico KiB':>10} {'entrada':>10}")
+    print("-" * 43)
+    base = None
+    for nombre, (funcion, entrada) in rutas.items():
+        ms = comun.cronometrar(funcion, args.repeticiones)
+        base = base or ms
+        print(f"{nombre:<12} {ms:>8.2f} {pico_memoria(funcion):>10.1f} {entrada:>10,}   {base / ms:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
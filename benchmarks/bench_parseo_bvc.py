@@ -0,0 +1,133 @@
+"""
+Benchmark del procesamiento de históricos BVC: ruta por celda vs vectorizada.
+
+Genera un conjunto sintético con el formato de cur_hist_mov_emisora para los
+29 símbolos y varios años de sesiones, y compara:
+
+    anterior     limpiar_numero con apply por celda + iterrows
+    vectorizada  limpiar_columnas_numericas + convertir_a_registros
+
+Uso:
+    python benchmarks/bench_parseo_bvc.py [--anios 5] [--repeticiones 3]
+"""
+import argparse
+import math
+import random
+from datetime import date, timedelta
+
+import comun
+import pandas as pd
+from services import BVCService
+
+SESIONES_POR_ANIO = 252
+
+
+def numero_bvc(valor: float, decimales: int = 2) -> str:
+    """Formatear un número como lo publica la BVC (1.234,56)"""
+    entero, _, fraccion = f"{valor:,.{decimales}f}".partition(".")
+    return entero.replace(",", ".") + ("," + fraccion if fraccion else "")
+
+
+def generar_payloads(anios: int, semilla: int = 42):
+    """Payloads sintéticos de la API BVC para todos los símbolos"""
+    rnd = random.Random(semilla)
+    sesiones = anios * SESIONES_POR_ANIO
+    hoy = date.today()
+    payloads = {}
+    for simbolo in BVCService.SIMBOLOS:
+        precio = rnd.uniform(1, 500)
+        filas = []
+        for i in range(sesiones):
+            precio *= math.exp(rnd.gauss(0, 0.02))
+            titulos = rnd.randint(0, 50_000)
+            filas.append({
+                "FECHA": (hoy - timedelta(days=i)).strftime("%d-%m-%y"),
+                "PRECIO_APERT": numero_bvc(precio * 0.99),
+                "PRECIO_CIE": numero_bvc(precio),
+                "VAR_ABS": numero_bvc(precio * 0.01),
+                "VAR_REL": numero_bvc(1.0),
+                "PRECIO_MAX": numero_bvc(precio * 1.02),
+                "PRECIO_MIN": numero_bvc(precio * 0.98),
+                "N_OPERACIONES": str(rnd.randint(0, 200)),
+                "TITULOS_NEGOCIADOS": numero_bvc(titulos, 0),
+                "MONTO_EFECTIVO": numero_bvc(titulos * precio)
+            })
+        payloads[simbolo] = {"cur_hist_mov_emisora": filas}
+    return payloads
+
+
+def ruta_anterior(servicio: BVCService, payloads, tasa_oficial: float, tasa_paralelo: float):
+    """Reproducción del procesamiento original: apply por celda e iterrows"""
+    columnas = ["FECHA", "PRECIO_APERT", "PRECIO_CIE", "VAR_ABS", "VAR_REL",
+                "PRECIO_MAX", "PRECIO_MIN", "N_OPERACIONES", "TITULOS_NEGOCIADOS", "MONTO_EFECTIVO"]
+    dataframes = []
+    for simbolo, datos in payloads.items():
+        df = pd.DataFrame(datos['cur_hist_mov_emisora'])
+        df.columns = columnas
+        df['FECHA'] = pd.to_datetime(df['FECHA'], format='%d-%m-%y', errors='coerce')
+        for col in columnas[1:]:
+            df[col] = df[col].apply(servicio.limpiar_numero)
+        df['ACCION'] = simbolo
+        dataframes.append(df)
+    datos = pd.concat(dataframes, ignore_index=True)
+    
+    precios = []
+    for _, row in datos.iterrows():
+        precios.append({
+            'accion_codigo': row['ACCION'],
+            'fecha': row['FECHA'].date(),
+            'precio_cierre_bs': row['PRECIO_CIE'],
+            'precio_cierre_usd_oficial': row['PRECIO_CIE'] / tasa_oficial,
+            'precio_cierre_usd_paralelo': row['PRECIO_CIE'] / tasa_paralelo,
+            'monto_efectivo_usd_oficial': row['MONTO_EFECTIVO'] / tasa_oficial,
+            'monto_efectivo_usd_paralelo': row['MONTO_EFECTIVO'] / tasa_paralelo,
+            'num_operaciones': int(row['N_OPERACIONES']) if not pd.isna(row['N_OPERACIONES']) else 0,
+            'titulos_negociados': int(row['TITULOS_NEGOCIADOS']) if not pd.isna(row['TITULOS_NEGOCIADOS']) else 0,
+            'capitalizacion_oficial': None,
+            'capitalizacion_paralelo': None
+        })
+    return precios
+
+
+def ruta_vectorizada(servicio: BVCService, payloads, tasa_oficial: float, tasa_paralelo: float):
+    """Procesamiento actual del servicio"""
+    datos = pd.concat(
+        [servicio.procesar_datos_accion(simbolo, p) for simbolo, p in payloads.items()],
+        ignore_index=True
+    )
+    datos['Oficial'] = tasa_oficial
+    datos['Paralelo'] = tasa_paralelo
+    return servicio.convertir_a_registros(datos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anios', type=int, default=5)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+    
+    servicio = BVCService()
+    payloads = generar_payloads(args.anios)
+    total = sum(len(p['cur_hist_mov_emisora']) for p in payloads.values())
+    print(f"{len(payloads)} símbolos × {args.anios} años = {total:,} filas\n")
+    
+    anterior = ruta_anterior(servicio, payloads, 40.0, 55.0)
+    nueva = ruta_vectorizada(servicio, payloads, 40.0, 55.0)
+    assert len(anterior) == len(nueva)
+    for a, b in zip(anterior, nueva):
+        assert a['accion_codigo'] == b['accion_codigo'] and a['fecha'] == b['fecha']
+        assert a['titulos_negociados'] == b['titulos_negociados']
+        assert math.isclose(a['precio_cierre_usd_oficial'], b['precio_cierre_usd_oficial'])
+    
+    t_anterior = comun.cronometrar(lambda: ruta_anterior(servicio, payloads, 40.0, 55.0), args.repeticiones)
+    t_nueva = comun.cronometrar(lambda: ruta_vectorizada(servicio, payloads, 40.0, 55.0), args.repeticiones)
+    
+    print(f"{'Ruta':<12} {'ms':>10} {'filas/s':>12}")
+    print("-" * 36)
+    print(f"{'anterior':<12} {t_anterior:>10.1f} {total / t_anterior * 1000:>12,.0f}")
+    print(f"{'vectorizada':<12} {t_nueva:>10.1f} {total / t_nueva * 1000:>12,.0f}")
+    print(f"\nMejora: {t_anterior / t_nueva:.1f}x (resultados idénticos)")
+
+
+if __name__ == "__main__":
+    main()
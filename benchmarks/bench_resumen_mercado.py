@@ -0,0 +1,84 @@
+"""
+Benchmark de /api/resumen: consulta N+1 frente a la vista ultimos_precios_bvc.
+
+Simula la latencia de ida y vuelta a PostgREST y mide cómo escala el resumen
+del mercado con el número de acciones listadas.
+
+Uso:
+    python benchmarks/bench_resumen_mercado.py [--latencia-ms 20] [--repeticiones 3]
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+import comun
+from database import Database
+
+
+def generar_tablas(n_acciones: int, dias: int = 5):
+    """Generar acciones y precios sintéticos, más la vista de últimos precios"""
+    acciones = []
+    precios = []
+    hoy = date.today()
+    for i in range(n_acciones):
+        codigo = f"ACC{i:03d}"
+        acciones.append({'codigo': codigo, 'nombre': f"Acción {i}", 'acciones_circulacion': 1_000_000, 'activa': True})
+        for d in range(dias):
+            precios.append({
+                'accion_codigo': codigo,
+                'fecha': (hoy - timedelta(days=d)).isoformat(),
+                'precio_cierre_usd_oficial': 1.0 + i,
+                'precio_cierre_usd_paralelo': 0.8 + i,
+                'capitalizacion_oficial': 1_000_000.0 * (1 + i),
+                'capitalizacion_paralelo': 800_000.0 * (1 + i)
+            })
+    
+    ultimos = {}
+    for p in precios:
+        if p['accion_codigo'] not in ultimos or p['fecha'] > ultimos[p['accion_codigo']]['fecha']:
+            ultimos[p['accion_codigo']] = p
+    vista = [
+        {'codigo': a['codigo'], 'nombre': a['nombre'], **{k: v for k, v in ultimos[a['codigo']].items() if k != 'accion_codigo'}}
+        for a in acciones
+    ]
+    return {'acciones': acciones, 'precios_bvc': precios, 'ultimos_precios_bvc': vista}
+
+
+async def resumen_n_mas_1(db: Database):
+    """Ruta anterior: una consulta de acciones más una por cada acción"""
+    acciones = await db.get_acciones()
+    detalle = []
+    for accion in acciones:
+        ultimo = await db.get_ultimo_precio_bvc(accion['codigo'])
+        if ultimo:
+            detalle.append(ultimo)
+    return detalle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latencia-ms', type=float, default=20.0)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"Latencia simulada por consulta: {args.latencia_ms:.0f} ms\n")
+    print(f"{'Acciones':>9} {'N+1 (ms)':>10} {'consultas':>10} {'Vista (ms)':>11} {'consultas':>10} {'Mejora':>8}")
+    print("-" * 63)
+    
+    for n in (10, 30, 100, 300):
+        db = Database()
+        db._cliente = comun.ClienteSimulado(generar_tablas(n), latencia=args.latencia_ms / 1000)
+        
+        db._cliente.consultas = 0
+        t_anterior = comun.cronometrar(lambda: asyncio.run(resumen_n_mas_1(db)), args.repeticiones)
+        q_anterior = db._cliente.consultas // args.repeticiones
+        
+        db._cliente.consultas = 0
+        t_nuevo = comun.cronometrar(lambda: asyncio.run(db.get_resumen_mercado()), args.repeticiones)
+        q_nuevo = db._cliente.consultas // args.repeticiones
+        
+        print(f"{n:>9} {t_anterior:>10.1f} {q_anterior:>10} {t_nuevo:>11.1f} {q_nuevo:>10} {t_anterior / t_nuevo:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks se ejecutan desde la raíz del proyecto, por ejemplo:
+    python benchmarks/bench_resumen_mercado.py
+"""
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# Credenciales ficticias: los benchmarks nunca se conectan a Supabase
+os.environ.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.benchmark")
+
+
+def _filtro_postgrest(expresion: str) -> Callable[[Dict], bool]:
+    """Convertir un filtro lógico de PostgREST (a.lt.1,and(b.eq.2,c.gt."x")) en una función"""
+    operadores = {
+        'eq': lambda a, b: a == b, 'neq': lambda a, b: a != b,
+        'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+        'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b
+    }
+    
+    def partir(texto: str) -> List[str]:
+        partes, nivel, actual = [], 0, ''
+        for caracter in texto:
+            if caracter == ',' and nivel == 0:
+                partes.append(actual)
+                actual = ''
+                continue
+            nivel += caracter == '('
+            nivel -= caracter == ')'
+            actual += caracter
+        return partes + [actual]
+    
+    def compilar(texto: str, conjuncion) -> Callable[[Dict], bool]:
+        condiciones = []
+        for parte in partir(texto):
+            if parte.startswith(('and(', 'or(')):
+                logica, _, interior = parte.partition('(')
+                condiciones.append(compilar(interior[:-1], all if logica == 'and' else any))
+            else:
+                columna, operador, valor = parte.split('.', 2)
+                valor = valor.strip('"')
+                condiciones.append(
+                    lambda f, c=columna, o=operadores[operador], v=valor: f.get(c) is not None and o(str(f[c]), v)
+                )
+        return lambda f: conjuncion(c(f) for c in condiciones)
+    
+    return compilar(expresion, any)
+
+
+class ConsultaSimulada:
+    """Consulta encadenable que imita el query builder de PostgREST sobre listas en memoria"""
+    
+    def __init__(self, cliente: "ClienteSimulado", tabla: str):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.filtros: List[Callable[[Dict], bool]] = []
+        self.orden: List[tuple] = []
+        self.limite = None
+        self.desplazamiento = 0
+        self.escritura = None
+    
+    def select(self, *columnas, **kwargs):
+        return self
+    
+    def eq(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) == valor)
+        return self
+    
+    def gte(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) is not None and f[columna] >= valor)
+        return self
+    
+    def lte(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) is not None and f[columna] <= valor)
+        return self
+    
+    def in_(self, columna, valores):
+        valores = set(valores)
+        self.filtros.append(lambda f: f.get(columna) in valores)
+        return self
+    
+    def or_(self, expresion):
+        self.filtros.append(_filtro_postgrest(expresion))
+        return self
+    
+    def order(self, columna, desc=False):
+        self.orden.append((columna, desc))
+        return self
+    
+    def limit(self, n):
+        self.limite = n
+        return self
+    
+    def range(self, inicio, fin):
+        self.desplazamiento = inicio
+        self.limite = fin - inicio + 1
+        return self
+    
+    def insert(self, filas, **kwargs):
+        self.escritura = (filas if isinstance(filas, list) else [filas], None)
+        return self
+    
+    def upsert(self, filas, on_conflict='id', **kwargs):
+        self.escritura = (filas if isinstance(filas, list) else [filas], on_conflict.split(','))
+        return self
+    
+    def _escribir(self) -> List[Dict]:
+        filas, claves = self.escritura
+        tabla = self.cliente.tablas.setdefault(self.tabla, [])
+        if claves:
+            indice = {tuple(f.get(c) for c in claves): i for i, f in enumerate(tabla)}
+            for fila in filas:
+                posicion = indice.get(tuple(fila.get(c) for c in claves))
+                if posicion is None:
+                    tabla.append(dict(fila))
+                else:
+                    tabla[posicion] = {**tabla[posicion], **fila}
+        else:
+            tabla.extend(dict(f) for f in filas)
+        return []
+    
+    async def execute(self):
+        await asyncio.sleep(self.cliente.latencia)
+        self.cliente.consultas += 1
+        if self.escritura is not None:
+            return SimpleNamespace(data=self._escribir())
+        filas = [f for f in self.cliente.tablas.get(self.tabla, []) if all(c(f) for c in self.filtros)]
+        for columna, desc in reversed(self.orden):
+            filas.sort(key=lambda f: f.get(columna), reverse=desc)
+        filas = filas[self.desplazamiento:]
+        if self.limite is not None:
+            filas = filas[:self.limite]
+        return SimpleNamespace(data=filas)
+
+
+class LlamadaSimulada:
+    """Llamada RPC a una función de la base de datos: solo cuenta la ida y vuelta"""
+    
+    def __init__(self, cliente: "ClienteSimulado"):
+        self.cliente = cliente
+    
+    async def execute(self):
+        await asyncio.sleep(self.cliente.latencia)
+        self.cliente.consultas += 1
+        return SimpleNamespace(data=None)
+
+
+class ClienteSimulado:
+    """Cliente Supabase asíncrono en memoria con latencia fija por ida y vuelta"""
+    
+    def __init__(self, tablas: Dict[str, List[Dict[str, Any]]], latencia: float = 0.02):
+        self.tablas = tablas
+        self.latencia = latencia
+        self.consultas = 0
+    
+    def table(self, nombre: str) -> ConsultaSimulada:
+        return ConsultaSimulada(self, nombre)
+    
+    def rpc(self, nombre: str, parametros: Dict[str, Any]) -> LlamadaSimulada:
+        return LlamadaSimulada(self)
+
+
+def cronometrar(funcion: Callable[[], Any], repeticiones: int = 5) -> float:
+    """Mediana en milisegundos de varias ejecuciones de una función"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
@@ -0,0 +1,228 @@
+"""
+Fixtures de las fuentes externas para los benchmarks sin conexión.
+
+Cada fixture es el cuerpo HTTP tal como lo devuelve la fuente:
+
+    bvc_historico.json.gz    admin-ajax.php (action=getHistoricoSimbolo), un símbolo
+    bcv_tasa_de_cambio.html  página de estadísticas del BCV
+    binance_p2p.json         búsqueda de anuncios P2P USDT/VES (friendly/c2c/adv/search)
+
+Los archivos incluidos son sintéticos con el formato exacto de las respuestas
+(generados con `generar`), para que los resultados sean reproducibles. Para
+sustituirlos por respuestas reales:
+
+    python benchmarks/fixtures.py grabar     # descarga de las fuentes en vivo
+    python benchmarks/fixtures.py generar    # vuelve a los sintéticos
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+from datetime import date, timedelta
+
+import comun  # noqa: F401  (rutas y credenciales ficticias)
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ARCHIVOS = {
+    'bvc': "bvc_historico.json.gz",
+    'bcv': "bcv_tasa_de_cambio.html",
+    'p2p': "binance_p2p.json"
+}
+
+# Fecha fija de la última sesión sintética, para que los fixtures no cambien con el día
+FECHA_FIN = date(2025, 6, 30)
+
+
+def cargar(nombre: str) -> bytes:
+    """Cuerpo HTTP de un fixture ('bvc', 'bcv' o 'p2p')"""
+    ruta = os.path.join(DIRECTORIO, ARCHIVOS[nombre])
+    abrir = gzip.open if ruta.endswith(".gz") else open
+    with abrir(ruta, "rb") as f:
+        return f.read()
+
+
+def guardar(nombre: str, contenido: bytes):
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO, ARCHIVOS[nombre])
+    if ruta.endswith(".gz"):
+        with gzip.GzipFile(ruta, "wb", mtime=0) as f:
+            f.write(contenido)
+    else:
+        with open(ruta, "wb") as f:
+            f.write(contenido)
+    print(f"{ARCHIVOS[nombre]:<26} {len(contenido):>10,} bytes")
+
+
+# ==================== SINTÉTICOS ====================
+
+def numero_bvc(valor: float, decimales: int = 2) -> str:
+    """Formatear un número como lo publica la BVC (1.234,56)"""
+    entero, _, fraccion = f"{valor:,.{decimales}f}".partition(".")
+    return entero.replace(",", ".") + ("," + fraccion if fraccion else "")
+
+
+def generar_bvc(sesiones: int = 1260, semilla: int = 7) -> bytes:
+    """Histórico de un símbolo: ~5 años de sesiones de lunes a viernes, la más reciente primero"""
+    rnd = random.Random(semilla)
+    precio = 85.0
+    filas = []
+    fecha = FECHA_FIN
+    while len(filas) < sesiones:
+        if fecha.weekday() < 5:
+            precio *= math.exp(rnd.gauss(0, 0.02))
+            titulos = rnd.randint(0, 50_000)
+            filas.append({
+                "FECHA": fecha.strftime("%d-%m-%y"),
+                "PRECIO_APERT": numero_bvc(precio * 0.99),
+                "PRECIO_CIE": numero_bvc(precio),
+                "VAR_ABS": numero_bvc(precio * 0.01),
+                "VAR_REL": numero_bvc(rnd.uniform(-3, 3)),
+                "PRECIO_MAX": numero_bvc(precio * 1.02),
+                "PRECIO_MIN": numero_bvc(precio * 0.98),
+                "N_OPERACIONES": str(rnd.randint(0, 200)),
+                "TITULOS_NEGOCIADOS": numero_bvc(titulos, 0),
+                "MONTO_EFECTIVO": numero_bvc(titulos * precio)
+            })
+        fecha -= timedelta(days=1)
+    return json.dumps({"cur_hist_mov_emisora": filas}, separators=(",", ":")).encode()
+
+
+def generar_bcv(semilla: int = 7) -> bytes:
+    """Página de estadísticas con la estructura del sitio del BCV (Drupal: menús, bloques y view-content)"""
+    rnd = random.Random(semilla)
+    menu = "\n".join(
+        f'<li class="leaf menu-mlid-{i}"><a href="/seccion/{i}" title="Sección {i}">Sección {i}</a>'
+        f'<ul class="menu">' + "".join(
+            f'<li class="leaf"><a href="/seccion/{i}/{j}">Subsección {i}.{j}</a></li>' for j in range(12)
+        ) + "</ul></li>"
+        for i in range(40)
+    )
+    filas = []
+    fecha = FECHA_FIN
+    tasa = 103.5
+    for _ in range(20):
+        filas.append(
+            f'<tr class="odd"><td class="views-field views-field-field-fecha-del-indicador">'
+            f'<span class="date-display-single">{fecha.strftime("%d-%m-%Y")}</span></td>'
+            f'<td class="views-field views-field-field-tasa-de-cambio">{numero_bvc(tasa, 8)}</td>'
+            f'<td class="views-field views-field-field-moneda">USD</td></tr>'
+        )
+        fecha -= timedelta(days=1)
+        tasa *= 1 - rnd.uniform(0, 0.004)
+    scripts = "\n".join(
+        f'<script type="text/javascript">jQuery.extend(Drupal.settings, {{"bloque_{i}": "{"x" * 400}"}});</script>'
+        for i in range(30)
+    )
+    pagina = f"""<!DOCTYPE html>
+<html lang="es" dir="ltr">
+<head>
+<meta charset="utf-8" />
+<title>Tipo de Cambio | Banco Central de Venezuela</title>
+{scripts}
+</head>
+<body class="html not-front not-logged-in one-sidebar sidebar-first page-estadisticas">
+<div id="page-wrapper"><div id="page">
+<div id="header"><div class="section clearfix">
+<ul class="menu">{menu}</ul>
+</div></div>
+<div id="main-wrapper"><div id="main" class="clearfix">
+<div id="content" class="column"><div class="section">
+<h1 class="title" id="page-title">Tipo de Cambio de Referencia</h1>
+<div class="view view-tipo-de-cambio-oficial-del-bcv view-id-tipo_de_cambio_oficial_del_bcv">
+<div class="view-content">
+<table class="views-table cols-3">
+<thead><tr><th>Fecha</th><th>Tipo de cambio</th><th>Moneda</th></tr></thead>
+<tbody>
+{chr(10).join(filas)}
+</tbody>
+</table>
+</div>
+</div>
+</div></div>
+<div id="sidebar-first" class="column sidebar"><div class="section">
+<ul class="menu">{menu}</ul>
+</div></div>
+</div></div>
+<div id="footer"><div class="section">{"<p>Banco Central de Venezuela</p>" * 50}</div></div>
+</div></div>
+</body>
+</html>
+"""
+    return pagina.encode("utf-8")
+
+
+def generar_p2p(ofertas: int = 20, semilla: int = 7) -> bytes:
+    """Respuesta de friendly/c2c/adv/search: 20 anuncios USDT/VES ordenados por precio"""
+    rnd = random.Random(semilla)
+    precio = 142.0
+    data = []
+    for i in range(ofertas):
+        precio += rnd.uniform(0, 0.4)
+        data.append({
+            "adv": {
+                "advNo": f"1{i:019d}",
+                "tradeType": "BUY",
+                "asset": "USDT",
+                "fiatUnit": "VES",
+                "price": f"{precio:.3f}",
+                "surplusAmount": f"{rnd.uniform(50, 5000):.2f}",
+                "tradableQuantity": f"{rnd.uniform(50, 5000):.2f}",
+                "minSingleTransAmount": "1000.00",
+                "maxSingleTransAmount": f"{rnd.uniform(50_000, 500_000):.2f}",
+                "tradeMethods": [
+                    {"identifier": "BANK", "tradeMethodName": "Banco de Venezuela"},
+                    {"identifier": "PagoMovil", "tradeMethodName": "Pago Móvil"}
+                ][:rnd.randint(1, 2)]
+            },
+            "advertiser": {
+                "userNo": f"s{i:032x}",
+                "nickName": f"Comerciante{i}",
+                "monthOrderCount": rnd.randint(10, 3000),
+                "monthFinishRate": round(rnd.uniform(0.9, 1), 3),
+                "userType": "merchant" if i % 3 == 0 else "user"
+            }
+        })
+    respuesta = {"code": "000000", "message": None, "data": data, "total": 250, "success": True}
+    return json.dumps(respuesta, ensure_ascii=False).encode("utf-8")
+
+
+def generar():
+    guardar('bvc', generar_bvc())
+    guardar('bcv', generar_bcv())
+    guardar('p2p', generar_p2p())
+
+
+# ==================== GRABACIÓN ====================
+
+def grabar(simbolo: str = "BNC"):
+    """Grabar las respuestas reales de las fuentes (requiere conexión)"""
+    from services import BCVService, BinanceP2PService, BVCService
+    from http_cliente import cliente_http
+    
+    guardar('bvc', BVCService()._peticion_simbolo(simbolo).content)
+    guardar('bcv', cliente_http.get(BCVService.BCV_URL, timeout=30).content)
+    guardar('p2p', cliente_http.post(
+        BinanceP2PService.FRIENDLY_URL,
+        json={"asset": "USDT", "fiat": "VES", "tradeType": "BUY", "page": 1, "rows": 20, "payTypes": []},
+        headers=BinanceP2PService.HEADERS,
+        timeout=30
+    ).content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('accion', choices=['generar', 'grabar'])
+    parser.add_argument('--simbolo', default="BNC", help="símbolo a grabar de la BVC")
+    args = parser.parse_args()
+    
+    if args.accion == 'generar':
+        generar()
+    else:
+        grabar(args.simbolo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Servidores locales que sustituyen a las fuentes externas durante los benchmarks.
+
+Cada servidor corre con uvicorn en un hilo propio y en un puerto libre.
+"""
+import asyncio
+import hashlib
+import socket
+import threading
+import time
+from typing import Any, Dict, List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import fixtures
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServidorLocal:
+    """Ejecuta una aplicación ASGI con uvicorn en segundo plano"""
+    
+    def __init__(self, app):
+        self.puerto = puerto_libre()
+        self.url = f"http://127.0.0.1:{self.puerto}"
+        self._servidor = uvicorn.Server(uvicorn.Config(app, port=self.puerto, log_level="warning", access_log=False))
+        self._hilo = threading.Thread(target=self._servidor.run, daemon=True)
+    
+    def __enter__(self) -> "ServidorLocal":
+        self._hilo.start()
+        while not self._servidor.started:
+            time.sleep(0.01)
+        return self
+    
+    def __exit__(self, *exc):
+        self._servidor.should_exit = True
+        self._hilo.join(timeout=5)
+
+
+def app_postgrest(tablas: Dict[str, List[Dict[str, Any]]], latencia: float = 0.02) -> Starlette:
+    """PostgREST mínimo: GET /rest/v1/{tabla} devuelve las filas con latencia fija.
+    
+    Solo respeta el parámetro limit; basta para medir el coste de ida y
+    vuelta y de decodificación, no la semántica de los filtros.
+    """
+    async def leer_tabla(request: Request):
+        await asyncio.sleep(latencia)
+        filas = tablas.get(request.path_params["tabla"], [])
+        limite = request.query_params.get("limit")
+        if limite:
+            filas = filas[:int(limite)]
+        return JSONResponse(filas)
+    
+    return Starlette(routes=[Route("/rest/v1/{tabla}", leer_tabla, methods=["GET"])])
+
+
+def app_fuentes(latencia: float = 0.0) -> Starlette:
+    """BVC, BCV y Binance P2P servidos desde los fixtures grabados, en las mismas rutas.
+    
+    La BVC responde con ETag y atiende If-None-Match, como haría un servidor
+    con validadores, para medir también la ruta de ingesta sin cambios.
+    """
+    bvc, bcv, p2p = fixtures.cargar('bvc'), fixtures.cargar('bcv'), fixtures.cargar('p2p')
+    etag_bvc = '"' + hashlib.sha256(bvc).hexdigest()[:16] + '"'
+    
+    async def admin_ajax(request: Request):
+        await asyncio.sleep(latencia)
+        if request.headers.get("if-none-match") == etag_bvc:
+            return Response(status_code=304, headers={"ETag": etag_bvc})
+        return Response(bvc, media_type="application/json", headers={"ETag": etag_bvc})
+    
+    async def tasa_bcv(request: Request):
+        await asyncio.sleep(latencia)
+        return Response(bcv, media_type="text/html; charset=utf-8")
+    
+    async def busqueda_p2p(request: Request):
+        await asyncio.sleep(latencia)
+        return Response(p2p, media_type="application/json")
+    
+    return Starlette(routes=[
+        Route("/wp-admin/admin-ajax.php", admin_ajax, methods=["POST"]),
+        Route("/estadisticas/tasa-de-cambio", tasa_bcv, methods=["GET"]),
+        Route("/bapi/c2c/v2/friendly/c2c/adv/search", busqueda_p2p, methods=["POST"])
+    ])
+
+
+def apuntar_servicios(url: str, bvc=None, bcv=None, p2p=None):
+    """Dirigir instancias de los servicios de scraping al servidor local de fuentes.
+    
+    El servidor local no limita peticiones: su host se configura sin el ritmo
+    adaptativo por defecto del cliente HTTP para no medir esperas artificiales.
+    """
+    from http_cliente import cliente_http
+    
+    cliente_http.configurar_ritmo(url, 1000)
+    if bvc is not None:
+        bvc.BVC_URL = f"{url}/wp-admin/admin-ajax.php"
+    if bcv is not None:
+        bcv.BCV_URL = f"{url}/estadisticas/tasa-de-cambio"
+    if p2p is not None:
+        p2p.FRIENDLY_URL = f"{url}/bapi/c2c/v2/friendly/c2c/adv/search"
@@ -0,0 +1,278 @@
+"""
+Suite de benchmarks sin conexión sobre fixtures grabados.
+
+Mide las rutas calientes del proyecto contra respuestas grabadas de las
+fuentes (servidas localmente) y una base de datos en memoria, sin tocar la
+red ni Supabase:
+
+    parseo.bvc              procesar_datos_accion + convertir_a_registros sobre el histórico grabado
+    parseo.bcv              parsear_tasa_oficial sobre la página grabada del BCV
+    scraping.bvc            get_precios_cierre de los 29 símbolos contra el servidor de fixtures
+    scraping.bvc_sin_cambio get_precios_incrementales cuando la BVC responde 304 a todo
+    scraping.bcv            get_official_rate (descarga y parseo de la página del BCV)
+    scraping.p2p            get_precio_promedio_compra (Binance P2P)
+    api.*                   endpoints de lectura vía ASGI, con la caché de respuestas vaciada
+
+Con --sqlite los casos api.* leen de un archivo SQLite temporal
+(ALMACENAMIENTO=sqlite) en lugar de la base de datos simulada con latencia.
+
+Cada caso informa mediana y p95 en milisegundos. Con --guardar el resultado
+se agrega a benchmarks/historial.jsonl junto con el commit, y cada ejecución
+se compara con la última guardada para detectar regresiones.
+
+Uso:
+    python benchmarks/suite.py [--repeticiones 20] [--filtro api] [--latencia-ms 5] [--sqlite] [--guardar]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import comun
+import fixtures
+from servidores import ServidorLocal, app_fuentes, apuntar_servicios
+
+HISTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historial.jsonl")
+
+# Sesiones por acción en la base de datos en memoria de los casos api.*
+SESIONES_API = 250
+
+
+def medir(funcion: Callable[[], Any], repeticiones: int, calentamiento: int = 2) -> Dict[str, float]:
+    """Mediana y p95 en milisegundos, después de unas ejecuciones de calentamiento"""
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'mediana_ms': round(tiempos[len(tiempos) // 2], 3),
+        'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3)
+    }
+
+
+def precios_fixture(servicio, desplazamiento: timedelta = timedelta(0)) -> List[Dict]:
+    """Registros de precios_bvc de los 29 símbolos a partir del histórico grabado"""
+    import pandas as pd
+    
+    payload = json.loads(fixtures.cargar('bvc'))
+    payload['cur_hist_mov_emisora'] = payload['cur_hist_mov_emisora'][:SESIONES_API]
+    datos = pd.concat(
+        [servicio.procesar_datos_accion(simbolo, payload) for simbolo in servicio.SIMBOLOS],
+        ignore_index=True
+    )
+    datos['Oficial'] = 103.5
+    datos['Paralelo'] = 142.0
+    precios = servicio.convertir_a_registros(datos)
+    for i, precio in enumerate(precios):
+        precio['id'] = i
+        precio['fecha'] = (precio['fecha'] + desplazamiento).isoformat()
+    return precios
+
+
+def tablas_api(servicio) -> Dict[str, List[Dict[str, Any]]]:
+    """Base de datos en memoria con los datos del fixture movidos para terminar hoy"""
+    precios = precios_fixture(servicio, date.today() - fixtures.FECHA_FIN)
+    acciones = [
+        {'codigo': s, 'nombre': f"Acción {s}", 'acciones_circulacion': 1_000_000, 'activa': True}
+        for s in servicio.SIMBOLOS
+    ]
+    ultimos = {}
+    for precio in precios:
+        if precio['accion_codigo'] not in ultimos or precio['fecha'] > ultimos[precio['accion_codigo']]['fecha']:
+            ultimos[precio['accion_codigo']] = precio
+    vista = [
+        {'codigo': a['codigo'], 'nombre': a['nombre'], **{k: v for k, v in ultimos[a['codigo']].items() if k != 'accion_codigo'}}
+        for a in acciones
+    ]
+    tasas = [
+        {
+            'fecha': (date.today() - timedelta(days=d)).isoformat(),
+            'tasa_oficial': 103.5 - d * 0.1,
+            'tasa_paralelo': 142.0 - d * 0.1
+        }
+        for d in range(SESIONES_API * 2)
+    ]
+    return {
+        'acciones': acciones,
+        'precios_bvc': precios,
+        'ultimos_precios_bvc': vista,
+        'tasas_cambio': tasas
+    }
+
+
+# ==================== CASOS ====================
+
+def casos_parseo(servicio) -> Dict[str, Callable[[], Any]]:
+    payload = json.loads(fixtures.cargar('bvc'))
+    
+    def parseo_bvc():
+        datos = servicio.procesar_datos_accion('BNC', payload)
+        datos['Oficial'] = 103.5
+        datos['Paralelo'] = 142.0
+        return servicio.convertir_a_registros(datos)
+    
+    from services import BCVService
+    
+    bcv = BCVService()
+    pagina_bcv = fixtures.cargar('bcv')
+    
+    return {
+        'parseo.bvc': parseo_bvc,
+        'parseo.bcv': lambda: bcv.parsear_tasa_oficial(pagina_bcv)
+    }
+
+
+def casos_scraping(url: str) -> Dict[str, Callable[[], Any]]:
+    from services import BCVService, BinanceP2PService, BVCService
+    
+    bvc = BVCService(peticiones_por_segundo=1000, reintentos=0)
+    bcv = BCVService()
+    p2p = BinanceP2PService()
+    apuntar_servicios(url, bvc=bvc, bcv=bcv, p2p=p2p)
+    
+    # Estados de una ingesta previa, para que la BVC responda 304 a todos los símbolos
+    tasas = [{'fecha': fixtures.FECHA_FIN, 'tasa_oficial': 103.5, 'tasa_paralelo': 142.0}]
+    estados = {e['simbolo']: e for e in bvc.get_precios_incrementales(tasas, {})['estados']}
+    
+    def sin_cambios():
+        resultado = bvc.get_precios_incrementales(tasas, estados)
+        assert resultado['estadisticas']['sin_cambios'] == len(bvc.SIMBOLOS), resultado['estadisticas']
+        return resultado
+    
+    return {
+        'scraping.bvc': lambda: bvc.get_precios_cierre(103.5, 142.0),
+        'scraping.bvc_sin_cambio': sin_cambios,
+        'scraping.bcv': bcv.get_official_rate,
+        'scraping.p2p': p2p.get_precio_promedio_compra
+    }
+
+
+def cliente_sqlite(tablas: Dict[str, List[Dict[str, Any]]]):
+    """Archivo SQLite temporal con las tablas de la base de datos en memoria"""
+    import tempfile
+    from almacenamiento_sqlite import ClienteSQLite
+    
+    cliente = ClienteSQLite(os.path.join(tempfile.mkdtemp(prefix="suite_"), "suite.db"))
+    for tabla in ('acciones', 'precios_bvc', 'tasas_cambio'):
+        filas = tablas[tabla]
+        columnas = list(filas[0])
+        with cliente.conexion() as conexion:
+            conexion.executemany(
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                [[f[c] for c in columnas] for f in filas]
+            )
+    return cliente
+
+
+def casos_api(servicio, latencia: float, bucle: asyncio.AbstractEventLoop, sqlite: bool = False) -> Dict[str, Callable[[], Any]]:
+    import httpx
+    from cache import cache_respuestas
+    from database import db
+    from main import app
+    
+    tablas = tablas_api(servicio)
+    db._cliente = cliente_sqlite(tablas) if sqlite else comun.ClienteSimulado(tablas, latencia=latencia)
+    cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://suite")
+    
+    def peticion(ruta: str):
+        async def ejecutar():
+            cache_respuestas.invalidar()
+            respuesta = await cliente.get(ruta)
+            assert respuesta.status_code == 200, (ruta, respuesta.status_code, respuesta.text[:200])
+            return respuesta
+        return lambda: bucle.run_until_complete(ejecutar())
+    
+    return {
+        'api.resumen': peticion("/api/resumen"),
+        'api.resumen_accion': peticion("/api/resumen/BNC"),
+        'api.precios_bvc': peticion("/api/precios/bvc?limit=500"),
+        'api.historico': peticion("/api/precios/bvc/BNC/historico?dias=365"),
+        'api.tasas': peticion("/api/tasas")
+    }
+
+
+# ==================== HISTORIAL ====================
+
+def commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=comun.RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def ultima_entrada() -> Optional[Dict]:
+    if not os.path.exists(HISTORIAL):
+        return None
+    with open(HISTORIAL, encoding="utf-8") as f:
+        lineas = [linea for linea in f if linea.strip()]
+    return json.loads(lineas[-1]) if lineas else None
+
+
+def guardar_entrada(resultados: Dict[str, Dict[str, float]]):
+    entrada = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'resultados': resultados
+    }
+    with open(HISTORIAL, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+    print(f"\nGuardado en {os.path.relpath(HISTORIAL, comun.RAIZ)} (commit {entrada['commit']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--filtro', default="", help="solo los casos cuyo nombre empieza así (parseo, scraping, api.resumen...)")
+    parser.add_argument('--latencia-ms', type=float, default=5.0, help="latencia simulada por consulta a la base de datos")
+    parser.add_argument('--sqlite', action='store_true', help="casos api.* sobre un archivo SQLite local")
+    parser.add_argument('--guardar', action='store_true', help="agregar el resultado a historial.jsonl")
+    args = parser.parse_args()
+    
+    from services import BVCService
+    
+    # Los logs de cada descarga ensucian la tabla; solo se muestran advertencias y errores
+    logging.disable(logging.INFO)
+    servicio = BVCService()
+    bucle = asyncio.new_event_loop()
+    anterior = ultima_entrada()
+    resultados = {}
+    
+    with ServidorLocal(app_fuentes()) as fuentes:
+        casos = {
+            **casos_parseo(servicio),
+            **casos_scraping(fuentes.url),
+            **casos_api(servicio, args.latencia_ms / 1000, bucle, args.sqlite)
+        }
+        casos = {nombre: caso for nombre, caso in casos.items() if nombre.startswith(args.filtro)}
+        
+        referencia = f" vs {anterior['commit']}" if anterior else ""
+        print(f"{'Caso':<26} {'mediana ms':>11} {'p95 ms':>9} {'cambio' + referencia:>16}")
+        print("-" * 65)
+        for nombre, caso in casos.items():
+            resultados[nombre] = medir(caso, args.repeticiones)
+            cambio = ""
+            previo = (anterior or {}).get('resultados', {}).get(nombre)
+            if previo:
+                cambio = f"{(resultados[nombre]['mediana_ms'] / previo['mediana_ms'] - 1) * 100:+.1f}%"
+            print(f"{nombre:<26} {resultados[nombre]['mediana_ms']:>11.2f} {resultados[nombre]['p95_ms']:>9.2f} {cambio:>16}")
+    
+    if args.guardar:
+        guardar_entrada(resultados)
+
+
+if __name__ == "__main__":
+    main()
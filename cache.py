@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import settings
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CacheTTL:
+    """Caché en memoria con expiración por TTL y desalojo LRU"""
+    
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+    
+    def get(self, clave: str) -> Tuple[bool, Any]:
+        """Obtener un valor. Devuelve (encontrado, valor)"""
+        entrada = self._entradas.get(clave)
+        if entrada is None or entrada[0] < time.monotonic():
+            if entrada is not None:
+                del self._entradas[clave]
+            self.misses += 1
+            return False, None
+        
+        self._entradas.move_to_end(clave)
+        self.hits += 1
+        return True, entrada[1]
+    
+    def set(self, clave: str, valor: Any, ttl_segundos: Optional[float] = None):
+        """Guardar un valor, desalojando el menos usado si se supera el tamaño"""
+        expira = time.monotonic() + (ttl_segundos or self.ttl_segundos)
+        self._entradas[clave] = (expira, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+    
+    def invalidar(self, prefijo: Optional[str] = None):
+        """Eliminar todas las entradas, o solo las que empiezan por un prefijo"""
+        if prefijo is None:
+            self._entradas.clear()
+        else:
+            for clave in [c for c in self._entradas if c.startswith(prefijo)]:
+                del self._entradas[clave]
+        self.invalidaciones += 1
+        logger.info(f"🧹 Caché invalidada ({prefijo or 'todas las entradas'})")
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        total = self.hits + self.misses
+        return {
+            'entradas': len(self._entradas),
+            'max_entradas': self.max_entradas,
+            'ttl_segundos': self.ttl_segundos,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+            'desalojos': self.desalojos,
+            'invalidaciones': self.invalidaciones
+        }
+
+
+def cacheado(
+    prefijo: str,
+    ttl_segundos: Optional[float] = None,
+    vacio: Callable[[Any], bool] = lambda valor: not valor
+):
+    """Decorador para cachear el resultado de un endpoint async según sus argumentos.
+    
+    Las excepciones (p. ej. HTTPException 404) no se cachean. Tampoco los
+    resultados vacíos según `vacio`: las lecturas de la base de datos
+    devuelven {} o [] ante un error, y cachearlos dejaría el endpoint en
+    blanco durante todo el TTL.
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        async def envoltura(*args, **kwargs):
+            clave = f"{prefijo}:{args!r}:{sorted(kwargs.items())!r}"
+            encontrado, valor = cache_respuestas.get(clave)
+            if encontrado:
+                return valor
+            
+            valor = await funcion(*args, **kwargs)
+            if not vacio(valor):
+                cache_respuestas.set(clave, valor, ttl_segundos)
+            return valor
+        return envoltura
+    return decorador
+
+
+# Instancia global de la caché de respuestas
+cache_respuestas = CacheTTL(
+    max_entradas=settings.cache_max_entradas,
+    ttl_segundos=settings.cache_ttl_segundos
+)
@@ -1,13 +1,19 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 
 
 class Settings(BaseSettings):
     """Configuración de la aplicación"""
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
     
-    # Supabase (OBLIGATORIO)
-    supabase_url: str
-    supabase_key: str
+    # Motor de almacenamiento: "supabase" o "sqlite" (archivo local, sin servidor)
+    almacenamiento: str = "supabase"
+    sqlite_ruta: str = "renta_variable.db"
+    
+    # Supabase (OBLIGATORIO con ALMACENAMIENTO=supabase)
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
     
     # Configuración general
     timezone: str = "America/Caracas"
@@ -16,6 +22,82 @@ class Settings(BaseSettings):
     
     # Horarios de actualización
     hora_actualizacion_bvc: str = "17:00"
+    
+    # Extracción BVC (descarga concurrente)
+    bvc_max_workers: int = 4
+    bvc_peticiones_por_segundo: float = 3.0
+    bvc_reintentos: int = 3
+    bvc_backoff_segundos: float = 1.0
+    
+    # Ingesta incremental BVC: días ya ingeridos que se revisan en busca de
+    # correcciones y horas extra (HH:MM separadas por coma) para volver a revisar
+    bvc_dias_correccion: int = 5
+    bvc_revisiones: str = ""
+    
+    # Ingesta BVC por lotes de símbolos: cada lote se escribe y queda registrado
+    # en ejecuciones_simbolos, así una ejecución interrumpida se reanuda desde ahí
+    bvc_lote_simbolos: int = 10
+    
+    # Libro de Binance P2P: páginas por lado, métodos de pago (identificadores de
+    # Binance separados por coma, p. ej. PagoMovil,BANK) y método de agregación
+    # (top5, vwap_medio, media_recortada, profundidad)
+    p2p_paginas: int = 3
+    p2p_filas_por_pagina: int = 20
+    p2p_metodos_pago: str = ""
+    p2p_agregacion: str = "top5"
+    p2p_recorte: float = 0.1
+    p2p_profundidad_usdt: float = 1000.0
+    
+    # Cliente HTTP compartido por los servicios de scraping
+    http_max_conexiones: int = 20
+    http_max_keepalive: int = 10
+    http_timeout_segundos: float = 15.0
+    http_trust_env: bool = False
+    
+    # Circuit breaker por host: fallos seguidos (errores de red, timeouts, 429 y 5xx)
+    # que lo abren y segundos que rechaza peticiones antes de dejar pasar una de prueba
+    http_circuito_fallos: int = 5
+    http_circuito_espera_segundos: float = 60.0
+    
+    # Ritmo adaptativo por host (AIMD): sube de a poco mientras las respuestas son
+    # rápidas y se reduce a la mitad ante 429, 5xx o latencias sobre el objetivo
+    http_ritmo_maximo: float = 10.0
+    http_ritmo_minimo: float = 0.2
+    http_latencia_objetivo_segundos: float = 3.0
+    
+    # Caché de respuestas de lectura (se invalida al terminar cada actualización)
+    cache_ttl_segundos: int = 900
+    cache_max_entradas: int = 256
+    
+    # Espejo local en Parquet de precios_bvc y tasas_cambio (deshabilitado si no se define)
+    almacen_local_dir: Optional[str] = None
+    
+    # Refresco en segundo plano de las cotizaciones en vivo (BCV y Binance P2P)
+    tasas_refresco_segundos: int = 300
+    
+    # Serie intradía de las cotizaciones en vivo: cada cuánto se guarda una muestra
+    # (0 la deshabilita) y cuántos días se conservan las muestras y las velas horarias
+    tasas_intradia_muestreo_segundos: int = 300
+    tasas_intradia_retencion_dias: int = 7
+    tasas_intradia_retencion_horaria_dias: int = 90
+    
+    # Bloqueo de los trabajos programados entre instancias (varios workers o
+    # réplicas): lease en la tabla bloqueos_tareas, renovado mientras la tarea corre
+    bloqueo_tareas: bool = True
+    bloqueo_tareas_segundos: int = 600
+    
+    # Cada cuántos segundos cada instancia revisa las ejecuciones terminadas en otras
+    # (espejo local, caché y eventos SSE al día); 0 lo deshabilita
+    seguimiento_ejecuciones_segundos: int = 60
+    
+    @model_validator(mode="after")
+    def validar_almacenamiento(self):
+        self.almacenamiento = self.almacenamiento.lower()
+        if self.almacenamiento not in ("supabase", "sqlite"):
+            raise ValueError(f"ALMACENAMIENTO debe ser supabase o sqlite, no {self.almacenamiento!r}")
+        if self.almacenamiento == "supabase" and not (self.supabase_url and self.supabase_key):
+            raise ValueError("SUPABASE_URL y SUPABASE_KEY son obligatorias con ALMACENAMIENTO=supabase")
+        return self
 
 
 settings = Settings()
@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from services import binance_p2p_service, bcv_service
+from eventos import bus_eventos
+from config import settings
+import asyncio
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def _obtener_tasa_oficial() -> Optional[float]:
+    tasa_bcv = await asyncio.to_thread(bcv_service.get_official_rate)
+    return tasa_bcv['tasa_oficial'] if tasa_bcv else None
+
+
+async def _obtener_tasa_paralelo() -> Optional[float]:
+    return await asyncio.to_thread(binance_p2p_service.get_precio_promedio_compra)
+
+
+class MonitorCotizaciones:
+    """Mantiene en memoria las últimas cotizaciones de BCV y Binance P2P.
+    
+    Un refresco en segundo plano consulta ambas fuentes periódicamente. Las
+    peticiones concurrentes a una misma fuente comparten una única consulta
+    en vuelo, y los endpoints sirven el valor cacheado junto con su edad.
+    """
+    
+    FUENTES = {
+        'oficial': _obtener_tasa_oficial,
+        'paralelo': _obtener_tasa_paralelo
+    }
+    
+    def __init__(self, intervalo_segundos: float):
+        self.intervalo_segundos = intervalo_segundos
+        self._cotizaciones: Dict[str, Dict[str, Any]] = {}
+        self._en_vuelo: Dict[str, asyncio.Task] = {}
+        self._tarea_refresco: Optional[asyncio.Task] = None
+    
+    async def _consultar_fuente(self, fuente: str) -> Optional[Dict[str, Any]]:
+        """Consultar una fuente y guardar el resultado. Ante un fallo se conserva el valor anterior"""
+        try:
+            valor = await self.FUENTES[fuente]()
+        except Exception as e:
+            logger.error(f"Error al refrescar cotización {fuente}: {e}")
+            valor = None
+        
+        if valor is None:
+            logger.warning(f"⚠️  Sin cotización {fuente}, se mantiene el último valor conocido")
+            return self._cotizaciones.get(fuente)
+        
+        anterior = self._cotizaciones.get(fuente)
+        self._cotizaciones[fuente] = {
+            'valor': valor,
+            'actualizado': datetime.now(),
+            '_monotonic': time.monotonic()
+        }
+        if anterior is None or anterior['valor'] != valor:
+            bus_eventos.publicar('tasas', {
+                f'tasa_{fuente}': valor,
+                'timestamp': self._cotizaciones[fuente]['actualizado'].isoformat()
+            })
+        return self._cotizaciones[fuente]
+    
+    async def refrescar(self, fuente: str) -> Optional[Dict[str, Any]]:
+        """Refrescar una fuente; las llamadas concurrentes comparten la misma consulta"""
+        tarea = self._en_vuelo.get(fuente)
+        if tarea is None:
+            tarea = asyncio.create_task(self._consultar_fuente(fuente))
+            self._en_vuelo[fuente] = tarea
+            tarea.add_done_callback(lambda _: self._en_vuelo.pop(fuente, None))
+        # shield: si un cliente cancela su petición, la consulta sigue para los demás
+        return await asyncio.shield(tarea)
+    
+    async def refrescar_todas(self):
+        """Refrescar todas las fuentes en paralelo"""
+        await asyncio.gather(*(self.refrescar(fuente) for fuente in self.FUENTES))
+    
+    def _edad_segundos(self, cotizacion: Optional[Dict[str, Any]]) -> Optional[float]:
+        if not cotizacion:
+            return None
+        return round(time.monotonic() - cotizacion['_monotonic'], 1)
+    
+    async def get_actuales(self, max_edad_segundos: Optional[float] = None) -> Dict[str, Any]:
+        """Últimas cotizaciones conocidas.
+        
+        Solo se consulta la fuente si aún no hay valor o, con max_edad_segundos,
+        si el valor guardado es más antiguo que eso.
+        """
+        faltantes = [
+            f for f in self.FUENTES
+            if f not in self._cotizaciones or (
+                max_edad_segundos is not None
+                and self._edad_segundos(self._cotizaciones[f]) > max_edad_segundos
+            )
+        ]
+        if faltantes:
+            await asyncio.gather(*(self.refrescar(f) for f in faltantes))
+        
+        return {
+            fuente: {
+                'valor': cotizacion['valor'] if cotizacion else None,
+                'actualizado': cotizacion['actualizado'].isoformat() if cotizacion else None,
+                'edad_segundos': self._edad_segundos(cotizacion)
+            }
+            for fuente, cotizacion in ((f, self._cotizaciones.get(f)) for f in self.FUENTES)
+        }
+    
+    async def _bucle_refresco(self):
+        while True:
+            try:
+                await self.refrescar_todas()
+            except Exception as e:
+                logger.error(f"Error en el refresco de cotizaciones: {e}")
+            await asyncio.sleep(self.intervalo_segundos)
+    
+    def iniciar(self):
+        """Iniciar el refresco periódico en segundo plano"""
+        if self._tarea_refresco is None or self._tarea_refresco.done():
+            self._tarea_refresco = asyncio.create_task(self._bucle_refresco())
+            logger.info(f"💱 Refresco de cotizaciones cada {self.intervalo_segundos:.0f}s")
+    
+    async def detener(self):
+        """Detener el refresco periódico"""
+        if self._tarea_refresco is not None:
+            self._tarea_refresco.cancel()
+            try:
+                await self._tarea_refresco
+            except asyncio.CancelledError:
+                pass
+            self._tarea_refresco = None
+
+
+# Instancia global del monitor de cotizaciones
+monitor_cotizaciones = MonitorCotizaciones(settings.tasas_refresco_segundos)
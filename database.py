@@ -1,31 +1,107 @@
-from supabase import create_client, Client
 from config import settings
-from typing import List, Dict, Any, Optional
+from almacen_local import almacen_local
+from metricas import FILAS_ESCRITAS
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, date
+import asyncio
+import json
 import logging
+import math
+
+# supabase (y con él postgrest, gotrue, realtime...) se importa al crear el
+# cliente en el primer uso, no al importar el módulo
+if TYPE_CHECKING:
+    from supabase import AsyncClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class Database:
-    """Clase para manejar operaciones con Supabase"""
+    """Clase para manejar operaciones con la base de datos.
+    
+    El motor se elige con ALMACENAMIENTO: Supabase (PostgREST) o un archivo
+    SQLite local con la misma interfaz de consultas (almacenamiento_sqlite).
+    """
+    
+    # Filas por petición en escrituras masivas y máximo de filas que devuelve PostgREST
+    TAMANO_LOTE = 500
+    MAX_FILAS_CONSULTA = 1000
+    
+    # Prefer: return=minimal (ReturnMethod.minimal de postgrest): las escrituras no devuelven filas
+    RETORNO_MINIMO = "minimal"
     
     def __init__(self):
-        self.client: Client = create_client(
-            settings.supabase_url,
-            settings.supabase_key
-        )
+        self._cliente: Optional["AsyncClient"] = None
+        self._lock_cliente = asyncio.Lock()
+    
+    async def _get_cliente(self) -> "AsyncClient":
+        """Cliente asíncrono del motor configurado, creado en el primer uso"""
+        if self._cliente is None:
+            async with self._lock_cliente:
+                if self._cliente is None:
+                    if settings.almacenamiento == "sqlite":
+                        from almacenamiento_sqlite import ClienteSQLite
+                        self._cliente = await asyncio.to_thread(ClienteSQLite, settings.sqlite_ruta)
+                    else:
+                        from supabase import acreate_client
+                        self._cliente = await acreate_client(
+                            settings.supabase_url,
+                            settings.supabase_key
+                        )
+        return self._cliente
+    
+    async def _tabla(self, nombre: str):
+        """Query builder asíncrono de una tabla o vista"""
+        return (await self._get_cliente()).table(nombre)
+    
+    async def _ejecutar(self, query):
+        """Ejecutar una consulta sin bloquear el event loop"""
+        return await query.execute()
+    
+    @staticmethod
+    def _serializar_fila(fila: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir fechas y NaN a valores serializables en JSON"""
+        serializada = {}
+        for clave, valor in fila.items():
+            if isinstance(valor, (date, datetime)):
+                valor = valor.isoformat()
+            elif isinstance(valor, float) and math.isnan(valor):
+                valor = None
+            serializada[clave] = valor
+        return serializada
+    
+    async def leer_paginado(
+        self,
+        tabla: str,
+        columnas: str = '*',
+        orden: Tuple[str, ...] = ('fecha',),
+        desde: Optional[date] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """Recorrer una tabla completa (o desde una fecha) en páginas de MAX_FILAS_CONSULTA filas"""
+        inicio = 0
+        while True:
+            query = (await self._tabla(tabla)).select(columnas)
+            if desde:
+                query = query.gte('fecha', desde.isoformat())
+            for columna in orden:
+                query = query.order(columna)
+            response = await self._ejecutar(query.range(inicio, inicio + self.MAX_FILAS_CONSULTA - 1))
+            if response.data:
+                yield response.data
+            if len(response.data) < self.MAX_FILAS_CONSULTA:
+                return
+            inicio += self.MAX_FILAS_CONSULTA
     
     # ==================== ACCIONES ====================
     
     async def get_acciones(self, activas_solo: bool = True) -> List[Dict]:
         """Obtener lista de acciones"""
         try:
-            query = self.client.table('acciones').select('*')
+            query = (await self._tabla('acciones')).select('*')
             if activas_solo:
                 query = query.eq('activa', True)
-            response = query.execute()
+            response = await self._ejecutar(query)
             return response.data
         except Exception as e:
             logger.error(f"Error al obtener acciones: {e}")
@@ -39,7 +115,7 @@ class Database:
                 'nombre': nombre,
                 'acciones_circulacion': acciones_circulacion
             }
-            self.client.table('acciones').insert(data).execute()
+            await self._ejecutar((await self._tabla('acciones')).insert(data))
             return True
         except Exception as e:
             logger.error(f"Error al insertar acción {codigo}: {e}")
@@ -50,120 +126,571 @@ class Database:
     async def insert_precio_bvc(self, data: Dict[str, Any]) -> bool:
         """Insertar precio de BVC"""
         try:
-            self.client.table('precios_bvc').insert(data).execute()
+            await self._ejecutar((await self._tabla('precios_bvc')).insert(self._serializar_fila(data)))
             logger.info(f"Precio BVC insertado: {data['accion_codigo']} - {data['fecha']}")
             return True
         except Exception as e:
             logger.error(f"Error al insertar precio BVC: {e}")
             return False
     
+    async def _claves_precios_existentes(self, filas: List[Dict[str, Any]]) -> Set[Tuple[str, str]]:
+        """Obtener las claves (accion_codigo, fecha) de un lote que ya existen en precios_bvc"""
+        codigos = sorted({f['accion_codigo'] for f in filas})
+        fechas = [f['fecha'] for f in filas]
+        claves = set()
+        inicio = 0
+        
+        while True:
+            response = await self._ejecutar(
+                (await self._tabla('precios_bvc'))
+                .select('accion_codigo,fecha')
+                .in_('accion_codigo', codigos)
+                .gte('fecha', min(fechas))
+                .lte('fecha', max(fechas))
+                .order('fecha')
+                .order('accion_codigo')
+                .range(inicio, inicio + self.MAX_FILAS_CONSULTA - 1)
+            )
+            claves.update((r['accion_codigo'], r['fecha']) for r in response.data)
+            if len(response.data) < self.MAX_FILAS_CONSULTA:
+                return claves
+            inicio += self.MAX_FILAS_CONSULTA
+    
+    async def _codigos_acciones(self) -> Optional[Set[str]]:
+        """Códigos registrados en acciones (activas o no), o None si no se pudieron leer"""
+        try:
+            response = await self._ejecutar((await self._tabla('acciones')).select('codigo'))
+            return {fila['codigo'] for fila in response.data}
+        except Exception as e:
+            logger.error(f"Error al obtener códigos de acciones: {e}")
+            return None
+    
+    async def upsert_precios_bvc(
+        self,
+        filas: List[Dict[str, Any]],
+        tamano_lote: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Insertar o actualizar precios de BVC en lotes (ON CONFLICT accion_codigo, fecha).
+        
+        Devuelve cuántas filas se insertaron, cuántas se actualizaron y cuántas
+        fallaron. Volver a ejecutar el mismo día actualiza en lugar de fallar.
+        
+        Las filas de símbolos que no están en acciones se descartan antes de
+        escribir (la clave foránea rechazaría el lote entero) y sus códigos se
+        devuelven en 'sin_accion'.
+        """
+        tamano_lote = tamano_lote or self.TAMANO_LOTE
+        resultado = {'insertados': 0, 'actualizados': 0, 'errores': 0, 'descartados': 0, 'sin_accion': []}
+        
+        # Un lote no puede tocar dos veces la misma fila: se conserva la última versión
+        unicas = {}
+        for fila in filas:
+            serializada = self._serializar_fila(fila)
+            unicas[(serializada['accion_codigo'], serializada['fecha'])] = serializada
+        filas_unicas = list(unicas.values())
+        
+        codigos = await self._codigos_acciones()
+        if codigos is not None:
+            sin_accion = sorted({f['accion_codigo'] for f in filas_unicas} - codigos)
+            if sin_accion:
+                filas_unicas = [f for f in filas_unicas if f['accion_codigo'] in codigos]
+                resultado['sin_accion'] = sin_accion
+                resultado['descartados'] = len(unicas) - len(filas_unicas)
+                FILAS_ESCRITAS.labels('precios_bvc', 'descartados').inc(resultado['descartados'])
+                logger.warning(
+                    f"Se descartan {resultado['descartados']} precios de símbolos que no están en acciones: "
+                    f"{', '.join(sin_accion)}"
+                )
+        
+        for i in range(0, len(filas_unicas), tamano_lote):
+            lote = filas_unicas[i:i + tamano_lote]
+            try:
+                existentes = await self._claves_precios_existentes(lote)
+                await self._ejecutar(
+                    (await self._tabla('precios_bvc')).upsert(
+                        lote,
+                        on_conflict='accion_codigo,fecha',
+                        returning=self.RETORNO_MINIMO
+                    )
+                )
+                actualizados = sum(1 for f in lote if (f['accion_codigo'], f['fecha']) in existentes)
+                resultado['actualizados'] += actualizados
+                resultado['insertados'] += len(lote) - actualizados
+                FILAS_ESCRITAS.labels('precios_bvc', 'insertados').inc(len(lote) - actualizados)
+                FILAS_ESCRITAS.labels('precios_bvc', 'actualizados').inc(actualizados)
+                
+                if almacen_local.habilitado:
+                    await asyncio.to_thread(almacen_local.escribir_precios, lote)
+            except Exception as e:
+                logger.error(f"Error en upsert de precios BVC (lote {i // tamano_lote + 1}): {e}")
+                resultado['errores'] += len(lote)
+                FILAS_ESCRITAS.labels('precios_bvc', 'errores').inc(len(lote))
+        
+        logger.info(
+            f"Upsert precios BVC: {resultado['insertados']} insertados, "
+            f"{resultado['actualizados']} actualizados, {resultado['errores']} errores, "
+            f"{resultado['descartados']} descartados"
+        )
+        return resultado
+    
+    async def _pagina_precios_bvc(
+        self,
+        accion_codigo: Optional[str],
+        fecha_inicio: Optional[date],
+        fecha_fin: Optional[date],
+        limit: int,
+        despues: Optional[Tuple[str, str]],
+        columnas: str = '*'
+    ) -> List[Dict]:
+        """Una página de precios ordenada por (fecha desc, accion_codigo), posterior a la clave despues"""
+        if almacen_local.sincronizado:
+            return await asyncio.to_thread(
+                almacen_local.leer_precios, accion_codigo, fecha_inicio, fecha_fin, limit, despues
+            )
+        
+        query = (await self._tabla('precios_bvc')).select(columnas)
+        
+        if accion_codigo:
+            query = query.eq('accion_codigo', accion_codigo)
+        if fecha_inicio:
+            query = query.gte('fecha', fecha_inicio.isoformat())
+        if fecha_fin:
+            query = query.lte('fecha', fecha_fin.isoformat())
+        if despues:
+            fecha_cursor, codigo_cursor = despues
+            query = query.lte('fecha', fecha_cursor).or_(
+                f'fecha.lt.{fecha_cursor},and(fecha.eq.{fecha_cursor},accion_codigo.gt."{codigo_cursor}")'
+            )
+        
+        response = await self._ejecutar(
+            query.order('fecha', desc=True).order('accion_codigo').limit(limit)
+        )
+        return response.data
+    
     async def get_precios_bvc(
         self,
         accion_codigo: Optional[str] = None,
         fecha_inicio: Optional[date] = None,
         fecha_fin: Optional[date] = None,
-        limit: int = 100
+        limit: int = 100,
+        despues: Optional[Tuple[str, str]] = None
     ) -> List[Dict]:
-        """Obtener precios históricos de BVC"""
+        """Obtener precios históricos de BVC (desde el espejo local si está sincronizado).
+        
+        Con despues=(fecha, accion_codigo) devuelve la página siguiente a esa
+        clave (paginación por cursor).
+        """
         try:
-            query = self.client.table('precios_bvc').select('*')
-            
-            if accion_codigo:
-                query = query.eq('accion_codigo', accion_codigo)
-            if fecha_inicio:
-                query = query.gte('fecha', fecha_inicio.isoformat())
-            if fecha_fin:
-                query = query.lte('fecha', fecha_fin.isoformat())
-            
-            response = query.order('fecha', desc=True).limit(limit).execute()
-            return response.data
+            return await self._pagina_precios_bvc(accion_codigo, fecha_inicio, fecha_fin, limit, despues)
         except Exception as e:
             logger.error(f"Error al obtener precios BVC: {e}")
             return []
     
+    async def iterar_precios_bvc(
+        self,
+        accion_codigo: Optional[str] = None,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None,
+        columnas: str = '*'
+    ) -> AsyncIterator[List[Dict]]:
+        """Recorrer todos los precios de un rango en páginas por cursor, sin cargarlos a la vez.
+        
+        A diferencia de get_precios_bvc, los errores se propagan para no
+        entregar un resultado truncado como si estuviera completo.
+        """
+        despues = None
+        while True:
+            pagina = await self._pagina_precios_bvc(
+                accion_codigo, fecha_inicio, fecha_fin, self.MAX_FILAS_CONSULTA, despues, columnas
+            )
+            if pagina:
+                yield pagina
+            if len(pagina) < self.MAX_FILAS_CONSULTA:
+                return
+            despues = (pagina[-1]['fecha'], pagina[-1]['accion_codigo'])
+    
     async def get_ultimo_precio_bvc(self, accion_codigo: str) -> Optional[Dict]:
         """Obtener el último precio registrado de una acción"""
         try:
-            response = self.client.table('precios_bvc')\
-                .select('*')\
-                .eq('accion_codigo', accion_codigo)\
-                .order('fecha', desc=True)\
-                .limit(1)\
-                .execute()
+            response = await self._ejecutar(
+                (await self._tabla('precios_bvc'))
+                .select('*')
+                .eq('accion_codigo', accion_codigo)
+                .order('fecha', desc=True)
+                .limit(1)
+            )
             
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error al obtener último precio BVC: {e}")
             return None
     
+    # ==================== ESTADO DE INGESTA ====================
+    
+    async def get_estados_ingesta(self) -> Dict[str, Dict]:
+        """Obtener el estado de la ingesta incremental de cada símbolo"""
+        try:
+            response = await self._ejecutar((await self._tabla('estado_ingesta')).select('*'))
+            return {fila['simbolo']: fila for fila in response.data}
+        except Exception as e:
+            logger.error(f"Error al obtener estado de ingesta: {e}")
+            return {}
+    
+    async def upsert_estados_ingesta(self, estados: List[Dict[str, Any]]) -> bool:
+        """Guardar el estado de ingesta de varios símbolos"""
+        if not estados:
+            return True
+        try:
+            filas = [{**e, 'updated_at': datetime.now().isoformat()} for e in estados]
+            await self._ejecutar(
+                (await self._tabla('estado_ingesta')).upsert(
+                    filas,
+                    on_conflict='simbolo',
+                    returning=self.RETORNO_MINIMO
+                )
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar estado de ingesta: {e}")
+            return False
+    
     # ==================== TASAS DE CAMBIO ====================
     
     async def insert_tasa_cambio(self, fecha: date, tasa_oficial: float, tasa_paralelo: float) -> bool:
-        """Insertar tasa de cambio"""
+        """Insertar tasa de cambio (o actualizarla si ya existe para esa fecha)"""
         try:
             data = {
                 'fecha': fecha.isoformat(),
                 'tasa_oficial': tasa_oficial,
                 'tasa_paralelo': tasa_paralelo
             }
-            self.client.table('tasas_cambio').insert(data).execute()
+            await self._ejecutar((await self._tabla('tasas_cambio')).upsert(data, on_conflict='fecha'))
+            FILAS_ESCRITAS.labels('tasas_cambio', 'upsert').inc()
+            if almacen_local.habilitado:
+                await asyncio.to_thread(almacen_local.escribir_tasas, [data])
             return True
         except Exception as e:
             logger.error(f"Error al insertar tasa de cambio: {e}")
             return False
     
+    async def insert_libro_p2p(self, resultado: Dict[str, Any]) -> bool:
+        """Guardar un snapshot del libro de Binance P2P con las tasas calculadas"""
+        try:
+            libro = resultado['libro']
+            data = {
+                'capturado_en': libro['capturado_en'].isoformat(),
+                'metodos_pago': libro['metodos_pago'],
+                'paginas': libro['paginas'],
+                'tasa': resultado['tasa'],
+                'metodo': resultado['metodo'],
+                'tasas': resultado['tasas'],
+                'volumen_compra_usdt': round(sum(o['volume_usdt'] or 0 for o in libro['BUY']), 2),
+                'volumen_venta_usdt': round(sum(o['volume_usdt'] or 0 for o in libro['SELL']), 2),
+                'ofertas_compra': libro['BUY'],
+                'ofertas_venta': libro['SELL']
+            }
+            await self._ejecutar((await self._tabla('libro_p2p')).insert(data, returning=self.RETORNO_MINIMO))
+            FILAS_ESCRITAS.labels('libro_p2p', 'insert').inc()
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar libro P2P: {e}")
+            return False
+    
+    async def get_ultimo_libro_p2p(self) -> Optional[Dict]:
+        """Obtener el snapshot más reciente del libro de Binance P2P"""
+        try:
+            response = await self._ejecutar(
+                (await self._tabla('libro_p2p'))
+                .select('*')
+                .order('capturado_en', desc=True)
+                .limit(1)
+            )
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error al obtener libro P2P: {e}")
+            return None
+    
     async def get_tasa_cambio(self, fecha: Optional[date] = None) -> Optional[Dict]:
         """Obtener tasa de cambio de una fecha específica o la más reciente"""
         try:
-            query = self.client.table('tasas_cambio').select('*')
+            query = (await self._tabla('tasas_cambio')).select('*')
             
             if fecha:
                 query = query.eq('fecha', fecha.isoformat())
             else:
                 query = query.order('fecha', desc=True).limit(1)
             
-            response = query.execute()
+            response = await self._ejecutar(query)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error al obtener tasa de cambio: {e}")
             return None
     
+    async def get_tasas_cambio(
+        self,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None
+    ) -> List[Dict]:
+        """Obtener todas las tasas de cambio de un rango, paginando por bloques"""
+        try:
+            if almacen_local.sincronizado:
+                return await asyncio.to_thread(almacen_local.leer_tasas, fecha_inicio, fecha_fin)
+            
+            tasas = []
+            inicio = 0
+            
+            while True:
+                query = (await self._tabla('tasas_cambio')).select('fecha,tasa_oficial,tasa_paralelo')
+                if fecha_inicio:
+                    query = query.gte('fecha', fecha_inicio.isoformat())
+                if fecha_fin:
+                    query = query.lte('fecha', fecha_fin.isoformat())
+                
+                response = await self._ejecutar(
+                    query.order('fecha').range(inicio, inicio + self.MAX_FILAS_CONSULTA - 1)
+                )
+                tasas.extend(response.data)
+                if len(response.data) < self.MAX_FILAS_CONSULTA:
+                    return tasas
+                inicio += self.MAX_FILAS_CONSULTA
+        except Exception as e:
+            logger.error(f"Error al obtener tasas de cambio: {e}")
+            return []
+    
+    # ==================== TASAS INTRADÍA ====================
+    
+    RESOLUCIONES_VELAS = {'1h': 'hour', '1d': 'day'}
+    
+    async def insert_tasa_intradia(
+        self,
+        capturado_en: datetime,
+        tasa_oficial: Optional[float],
+        tasa_paralelo: Optional[float]
+    ) -> bool:
+        """Guardar una muestra de las cotizaciones en vivo"""
+        try:
+            data = {
+                'capturado_en': capturado_en.replace(microsecond=0).isoformat(),
+                'tasa_oficial': tasa_oficial,
+                'tasa_paralelo': tasa_paralelo
+            }
+            await self._ejecutar(
+                (await self._tabla('tasas_intradia')).upsert(
+                    data,
+                    on_conflict='capturado_en',
+                    returning=self.RETORNO_MINIMO
+                )
+            )
+            FILAS_ESCRITAS.labels('tasas_intradia', 'upsert').inc()
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar tasa intradía: {e}")
+            return False
+    
+    async def compactar_tasas_intradia(self) -> Optional[int]:
+        """Resumir las muestras en velas horarias y diarias y aplicar la retención.
+        
+        Devuelve el número de muestras crudas eliminadas.
+        """
+        try:
+            response = await self._ejecutar(
+                (await self._get_cliente()).rpc('compactar_tasas_intradia', {
+                    'p_retencion_muestras': f"{settings.tasas_intradia_retencion_dias} days",
+                    'p_retencion_horaria': f"{settings.tasas_intradia_retencion_horaria_dias} days"
+                })
+            )
+            return response.data or 0
+        except Exception as e:
+            logger.error(f"Error al compactar tasas intradía: {e}")
+            return None
+    
+    async def _leer_intradia(self, tabla: str, columna: str, desde: datetime, hasta: datetime, **filtros) -> List[Dict]:
+        """Filas de una tabla intradía en un rango de tiempo, paginando por bloques"""
+        filas = []
+        inicio = 0
+        while True:
+            query = (await self._tabla(tabla)).select('*')
+            for campo, valor in filtros.items():
+                query = query.eq(campo, valor)
+            query = query.gte(columna, desde.isoformat()).lte(columna, hasta.isoformat())
+            response = await self._ejecutar(
+                query.order(columna).range(inicio, inicio + self.MAX_FILAS_CONSULTA - 1)
+            )
+            filas.extend(response.data)
+            if len(response.data) < self.MAX_FILAS_CONSULTA:
+                return filas
+            inicio += self.MAX_FILAS_CONSULTA
+    
+    async def get_tasas_intradia(self, desde: datetime, hasta: datetime) -> List[Dict]:
+        """Obtener las muestras intradía de un rango"""
+        try:
+            return await self._leer_intradia('tasas_intradia', 'capturado_en', desde, hasta)
+        except Exception as e:
+            logger.error(f"Error al obtener tasas intradía: {e}")
+            return []
+    
+    @classmethod
+    def _velas_desde_muestras(cls, muestras: List[Dict], resolucion: str) -> List[Dict]:
+        """Agrupar muestras ordenadas por tiempo en velas OHLC de una resolución"""
+        unidad = cls.RESOLUCIONES_VELAS[resolucion]
+        velas: Dict[datetime, Dict[str, Any]] = {}
+        for muestra in muestras:
+            momento = datetime.fromisoformat(muestra['capturado_en'])
+            inicio = momento.replace(minute=0, second=0, microsecond=0)
+            if unidad == 'day':
+                inicio = inicio.replace(hour=0)
+            vela = velas.get(inicio)
+            if vela is None:
+                vela = velas[inicio] = {
+                    'resolucion': resolucion,
+                    'inicio': inicio.isoformat(),
+                    **{f'{f}_{c}': None for f in ('oficial', 'paralelo') for c in ('apertura', 'maximo', 'minimo', 'cierre')},
+                    'muestras': 0
+                }
+            vela['muestras'] += 1
+            for fuente in ('oficial', 'paralelo'):
+                valor = muestra.get(f'tasa_{fuente}')
+                if valor is None:
+                    continue
+                valor = float(valor)
+                if vela[f'{fuente}_apertura'] is None:
+                    vela[f'{fuente}_apertura'] = vela[f'{fuente}_maximo'] = vela[f'{fuente}_minimo'] = valor
+                vela[f'{fuente}_maximo'] = max(vela[f'{fuente}_maximo'], valor)
+                vela[f'{fuente}_minimo'] = min(vela[f'{fuente}_minimo'], valor)
+                vela[f'{fuente}_cierre'] = valor
+        return list(velas.values())
+    
+    async def get_velas_intradia(self, resolucion: str, desde: datetime, hasta: datetime) -> List[Dict]:
+        """Obtener velas OHLC de un rango.
+        
+        Las velas guardadas se completan con las calculadas al vuelo desde las
+        muestras crudas a partir de la última vela compactada, que puede estar
+        incompleta si la compactación aún no pasó por ella.
+        """
+        try:
+            velas = await self._leer_intradia(
+                'tasas_intradia_ohlc', 'inicio', desde, hasta, resolucion=resolucion
+            )
+            pendiente_desde = datetime.fromisoformat(velas[-1]['inicio']) if velas else desde
+            muestras = await self._leer_intradia('tasas_intradia', 'capturado_en', max(pendiente_desde, desde), hasta)
+            recientes = self._velas_desde_muestras(muestras, resolucion)
+            
+            reemplazadas = {v['inicio'] for v in recientes}
+            return [v for v in velas if v['inicio'] not in reemplazadas] + recientes
+        except Exception as e:
+            logger.error(f"Error al obtener velas intradía: {e}")
+            return []
+    
     # ==================== RESUMEN Y ESTADÍSTICAS ====================
     
+    async def refrescar_agregados(
+        self,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None
+    ) -> bool:
+        """Materializar agregados_mercado y estadisticas_acciones (función refrescar_agregados).
+        
+        Recalcula los totales diarios del rango y las estadísticas móviles de
+        cada acción a su último cierre. Se llama al terminar cada ingesta.
+        """
+        try:
+            fecha_fin = fecha_fin or date.today()
+            parametros = {
+                'p_fecha_inicio': (fecha_inicio or fecha_fin).isoformat(),
+                'p_fecha_fin': fecha_fin.isoformat()
+            }
+            response = await self._ejecutar((await self._get_cliente()).rpc('refrescar_agregados', parametros))
+            logger.info(f"Agregados del mercado recalculados: {response.data} días")
+            return True
+        except Exception as e:
+            logger.error(f"Error al refrescar agregados: {e}")
+            return False
+    
+    async def get_agregado_mercado(self, fecha: Optional[date] = None) -> Optional[Dict]:
+        """Obtener los totales precalculados de un día (o del más reciente)"""
+        try:
+            query = (await self._tabla('agregados_mercado')).select('*')
+            if fecha:
+                query = query.eq('fecha', fecha.isoformat())
+            else:
+                query = query.order('fecha', desc=True).limit(1)
+            
+            response = await self._ejecutar(query)
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error al obtener agregados del mercado: {e}")
+            return None
+    
+    async def get_estadisticas_accion(self, accion_codigo: str) -> List[Dict]:
+        """Obtener las estadísticas precalculadas de una acción, una fila por ventana"""
+        try:
+            response = await self._ejecutar(
+                (await self._tabla('estadisticas_acciones'))
+                .select('*')
+                .eq('accion_codigo', accion_codigo)
+                .order('ventana_dias')
+            )
+            return response.data
+        except Exception as e:
+            logger.error(f"Error al obtener estadísticas de {accion_codigo}: {e}")
+            return []
+    
     async def get_resumen_mercado(self) -> Dict[str, Any]:
-        """Obtener resumen general del mercado"""
+        """Obtener resumen general del mercado.
+        
+        Usa la vista ultimos_precios_bvc, que devuelve el último precio de
+        cada acción activa en una sola consulta, y los totales precalculados
+        de agregados_mercado.
+        """
         try:
-            # Obtener todas las acciones activas
-            acciones = await self.get_acciones()
+            response, agregado = await asyncio.gather(
+                self._ejecutar(
+                    (await self._tabla('ultimos_precios_bvc'))
+                    .select('*')
+                    .order('codigo')
+                ),
+                self.get_agregado_mercado()
+            )
+            filas = response.data
             
             resumen = {
-                'total_acciones': len(acciones),
+                'total_acciones': len(filas),
                 'fecha_actualizacion': None,
                 'capitalizacion_total_oficial': 0,
                 'capitalizacion_total_paralelo': 0,
                 'acciones_detalle': []
             }
             
-            for accion in acciones:
-                ultimo_precio = await self.get_ultimo_precio_bvc(accion['codigo'])
-                if ultimo_precio:
-                    resumen['acciones_detalle'].append({
-                        'codigo': accion['codigo'],
-                        'nombre': accion['nombre'],
-                        'precio_oficial': ultimo_precio.get('precio_cierre_usd_oficial'),
-                        'precio_paralelo': ultimo_precio.get('precio_cierre_usd_paralelo'),
-                        'capitalizacion_oficial': ultimo_precio.get('capitalizacion_oficial'),
-                        'capitalizacion_paralelo': ultimo_precio.get('capitalizacion_paralelo'),
-                        'fecha': ultimo_precio.get('fecha')
-                    })
-                    
-                    if ultimo_precio.get('capitalizacion_oficial'):
-                        resumen['capitalizacion_total_oficial'] += float(ultimo_precio['capitalizacion_oficial'])
-                    if ultimo_precio.get('capitalizacion_paralelo'):
-                        resumen['capitalizacion_total_paralelo'] += float(ultimo_precio['capitalizacion_paralelo'])
-                    
-                    if not resumen['fecha_actualizacion'] or ultimo_precio['fecha'] > resumen['fecha_actualizacion']:
-                        resumen['fecha_actualizacion'] = ultimo_precio['fecha']
+            for fila in filas:
+                if not fila.get('fecha'):
+                    continue
+                
+                resumen['acciones_detalle'].append({
+                    'codigo': fila['codigo'],
+                    'nombre': fila['nombre'],
+                    'precio_oficial': fila.get('precio_cierre_usd_oficial'),
+                    'precio_paralelo': fila.get('precio_cierre_usd_paralelo'),
+                    'capitalizacion_oficial': fila.get('capitalizacion_oficial'),
+                    'capitalizacion_paralelo': fila.get('capitalizacion_paralelo'),
+                    'fecha': fila['fecha']
+                })
+                
+                if not resumen['fecha_actualizacion'] or fila['fecha'] > resumen['fecha_actualizacion']:
+                    resumen['fecha_actualizacion'] = fila['fecha']
+            
+            # Totales materializados en la ingesta; si no corresponden al último
+            # cierre (agregados aún no refrescados) se suman aquí
+            if agregado and agregado['fecha'] == resumen['fecha_actualizacion']:
+                resumen['capitalizacion_total_oficial'] = float(agregado['capitalizacion_total_oficial'] or 0)
+                resumen['capitalizacion_total_paralelo'] = float(agregado['capitalizacion_total_paralelo'] or 0)
+                resumen['monto_efectivo_usd_oficial'] = agregado.get('monto_efectivo_usd_oficial')
+                resumen['num_operaciones'] = agregado.get('num_operaciones')
+            else:
+                for detalle in resumen['acciones_detalle']:
+                    if detalle['capitalizacion_oficial']:
+                        resumen['capitalizacion_total_oficial'] += float(detalle['capitalizacion_oficial'])
+                    if detalle['capitalizacion_paralelo']:
+                        resumen['capitalizacion_total_paralelo'] += float(detalle['capitalizacion_paralelo'])
             
             return resumen
         except Exception as e:
@@ -175,10 +702,11 @@ class Database:
     async def get_config(self, clave: str) -> Optional[str]:
         """Obtener valor de configuración"""
         try:
-            response = self.client.table('configuracion')\
-                .select('valor')\
-                .eq('clave', clave)\
-                .execute()
+            response = await self._ejecutar(
+                (await self._tabla('configuracion'))
+                .select('valor')
+                .eq('clave', clave)
+            )
             
             return response.data[0]['valor'] if response.data else None
         except Exception as e:
@@ -186,16 +714,157 @@ class Database:
             return None
     
     async def update_config(self, clave: str, valor: str) -> bool:
-        """Actualizar valor de configuración"""
+        """Actualizar valor de configuración (se crea la clave si no existe)"""
         try:
-            self.client.table('configuracion')\
-                .update({'valor': valor, 'updated_at': datetime.now().isoformat()})\
-                .eq('clave', clave)\
-                .execute()
+            await self._ejecutar(
+                (await self._tabla('configuracion')).upsert(
+                    {'clave': clave, 'valor': valor, 'updated_at': datetime.now().isoformat()},
+                    on_conflict='clave',
+                    returning=self.RETORNO_MINIMO
+                )
+            )
             return True
         except Exception as e:
             logger.error(f"Error al actualizar configuración {clave}: {e}")
             return False
+    
+    # ==================== HISTORIAL DE EJECUCIONES ====================
+    
+    COLUMNAS_EJECUCION = (
+        'id', 'tarea', 'instancia', 'estado', 'parametros', 'inicio', 'fin', 'duracion_segundos',
+        'etapas', 'progreso', 'resultado', 'puntos_control', 'reanuda'
+    )
+    
+    async def guardar_ejecucion(self, ejecucion: Dict[str, Any]) -> bool:
+        """Guardar (o actualizar) el registro de una ejecución con sus puntos de control"""
+        try:
+            # Parámetros y resultados pueden traer fechas: se pasan por JSON como texto
+            fila = json.loads(json.dumps(
+                {clave: ejecucion.get(clave) for clave in self.COLUMNAS_EJECUCION}, default=str
+            ))
+            fila['updated_at'] = datetime.now().isoformat()
+            await self._ejecutar(
+                (await self._tabla('ejecuciones')).upsert(
+                    fila,
+                    on_conflict='id',
+                    returning=self.RETORNO_MINIMO
+                )
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar ejecución {ejecucion.get('id')}: {e}")
+            return False
+    
+    async def upsert_simbolos_ejecucion(self, ejecucion_id: str, simbolos: List[Dict[str, Any]]) -> bool:
+        """Guardar el estado de varios símbolos de una ejecución"""
+        if not simbolos:
+            return True
+        try:
+            actualizado = datetime.now().isoformat()
+            filas = [{**s, 'ejecucion_id': ejecucion_id, 'updated_at': actualizado} for s in simbolos]
+            await self._ejecutar(
+                (await self._tabla('ejecuciones_simbolos')).upsert(
+                    filas,
+                    on_conflict='ejecucion_id,simbolo',
+                    returning=self.RETORNO_MINIMO
+                )
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar símbolos de la ejecución {ejecucion_id}: {e}")
+            return False
+    
+    async def get_ejecuciones(
+        self,
+        tarea: Optional[str] = None,
+        estado: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """Obtener las ejecuciones más recientes, opcionalmente filtradas"""
+        try:
+            query = (await self._tabla('ejecuciones')).select('*')
+            if tarea:
+                query = query.eq('tarea', tarea)
+            if estado:
+                query = query.in_('estado', estado.split(','))
+            if desde:
+                query = query.gte('inicio', desde.isoformat())
+            response = await self._ejecutar(query.order('inicio', desc=True).limit(limit))
+            return response.data
+        except Exception as e:
+            logger.error(f"Error al obtener ejecuciones: {e}")
+            return []
+    
+    async def get_ejecucion(self, ejecucion_id: str) -> Optional[Dict]:
+        """Obtener una ejecución con el estado de cada símbolo"""
+        try:
+            ejecucion, simbolos = await asyncio.gather(
+                self._ejecutar((await self._tabla('ejecuciones')).select('*').eq('id', ejecucion_id)),
+                self._ejecutar(
+                    (await self._tabla('ejecuciones_simbolos'))
+                    .select('simbolo,estado,filas,updated_at')
+                    .eq('ejecucion_id', ejecucion_id)
+                    .order('simbolo')
+                )
+            )
+            if not ejecucion.data:
+                return None
+            return {**ejecucion.data[0], 'simbolos': simbolos.data}
+        except Exception as e:
+            logger.error(f"Error al obtener ejecución {ejecucion_id}: {e}")
+            return None
+    
+    async def get_ejecuciones_terminadas(self, desde: datetime) -> List[Dict]:
+        """Ejecuciones que escriben datos (bvc, tasas, backfill) terminadas después de `desde`, por orden de fin"""
+        try:
+            response = await self._ejecutar(
+                (await self._tabla('ejecuciones'))
+                .select('id,tarea,instancia,estado,parametros,fin,puntos_control')
+                .in_('tarea', ['bvc', 'tasas', 'backfill'])
+                .in_('estado', ['completada', 'parcial', 'fallida'])
+                .gt('fin', desde.isoformat())
+                .order('fin')
+                .limit(self.MAX_FILAS_CONSULTA)
+            )
+            return response.data
+        except Exception as e:
+            logger.error(f"Error al obtener ejecuciones terminadas: {e}")
+            return []
+    
+    # ==================== BLOQUEOS DE TAREAS ====================
+    
+    async def adquirir_bloqueo(self, tarea: str, titular: str, segundos: int) -> bool:
+        """Tomar, renovar o acortar el lease de una tarea programada (función adquirir_bloqueo).
+        
+        Devuelve True si el bloqueo queda a nombre de `titular` durante
+        `segundos` a partir de ahora: estaba libre, había expirado o ya era
+        suyo. Ante un error devuelve False, así que la tarea no corre sin bloqueo.
+        """
+        try:
+            response = await self._ejecutar((await self._get_cliente()).rpc('adquirir_bloqueo', {
+                'p_tarea': tarea,
+                'p_titular': titular,
+                'p_segundos': int(segundos)
+            }))
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error al adquirir bloqueo de {tarea}: {e}")
+            return False
+    
+    async def get_bloqueo(self, tarea: str) -> Optional[Dict]:
+        """Titular y vencimiento actuales del lease de una tarea (None si nunca se tomó)"""
+        try:
+            response = await self._ejecutar(
+                (await self._tabla('bloqueos_tareas'))
+                .select('titular,expira_en')
+                .eq('tarea', tarea)
+                .limit(1)
+            )
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error al obtener bloqueo de {tarea}: {e}")
+            return None
 
 
 # Instancia global de la base de datos
@@ -0,0 +1,98 @@
+from typing import Any, Dict, Optional, Set
+from database import db
+import asyncio
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BusEventos:
+    """Difusión de eventos a los clientes suscritos (Server-Sent Events).
+    
+    Cada suscriptor recibe una cola propia. Si un cliente lento llena su cola,
+    se descartan sus eventos más antiguos; al reconectar, el dashboard vuelve
+    a cargar el estado completo.
+    """
+    
+    CAMPOS_TOTALES = ['total_acciones', 'capitalizacion_total_oficial',
+                      'capitalizacion_total_paralelo', 'fecha_actualizacion']
+    
+    def __init__(self, max_cola: int = 100):
+        self.max_cola = max_cola
+        self._suscriptores: Set[asyncio.Queue] = set()
+        self._resumen: Optional[Dict[str, Any]] = None
+        self.eventos_publicados = 0
+    
+    def suscribir(self) -> asyncio.Queue:
+        """Registrar un nuevo suscriptor"""
+        cola = asyncio.Queue(maxsize=self.max_cola)
+        self._suscriptores.add(cola)
+        return cola
+    
+    def desuscribir(self, cola: asyncio.Queue):
+        """Eliminar un suscriptor"""
+        self._suscriptores.discard(cola)
+    
+    @property
+    def total_suscriptores(self) -> int:
+        return len(self._suscriptores)
+    
+    def publicar(self, tipo: str, datos: Dict[str, Any]):
+        """Enviar un evento a todos los suscriptores"""
+        mensaje = self.formatear(tipo, datos)
+        for cola in list(self._suscriptores):
+            if cola.full():
+                cola.get_nowait()
+            cola.put_nowait(mensaje)
+        self.eventos_publicados += 1
+    
+    @staticmethod
+    def formatear(tipo: str, datos: Dict[str, Any]) -> str:
+        """Formatear un evento según el protocolo SSE"""
+        return f"event: {tipo}\ndata: {json.dumps(datos, default=str, separators=(',', ':'))}\n\n"
+    
+    @classmethod
+    def diff_resumen(cls, anterior: Optional[Dict[str, Any]], nuevo: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcular los cambios entre dos resúmenes del mercado.
+        
+        Devuelve solo los totales que cambiaron, las acciones nuevas o
+        modificadas y los códigos que desaparecieron.
+        """
+        anterior = anterior or {}
+        totales = {
+            campo: nuevo.get(campo)
+            for campo in cls.CAMPOS_TOTALES
+            if nuevo.get(campo) != anterior.get(campo)
+        }
+        
+        previas = {a['codigo']: a for a in anterior.get('acciones_detalle', [])}
+        actuales = {a['codigo']: a for a in nuevo.get('acciones_detalle', [])}
+        acciones = [a for codigo, a in actuales.items() if previas.get(codigo) != a]
+        eliminadas = [codigo for codigo in previas if codigo not in actuales]
+        
+        diff: Dict[str, Any] = {}
+        if totales:
+            diff['totales'] = totales
+        if acciones:
+            diff['acciones'] = acciones
+        if eliminadas:
+            diff['eliminadas'] = eliminadas
+        return diff
+    
+    async def publicar_resumen(self):
+        """Publicar los cambios del resumen del mercado respecto al último publicado"""
+        resumen = await db.get_resumen_mercado()
+        if not resumen:
+            return
+        
+        diff = self.diff_resumen(self._resumen, resumen)
+        self._resumen = resumen
+        if diff:
+            self.publicar('resumen', diff)
+            logger.info(f"📡 Resumen publicado a {self.total_suscriptores} clientes")
+
+
+# Instancia global del bus de eventos
+bus_eventos = BusEventos()
@@ -0,0 +1,79 @@
+from typing import AsyncIterator, Dict, List
+from almacen_local import COLUMNAS_PRECIOS, esquema_precios, tabla_arrow
+import csv
+import io
+import json
+
+
+# Tipo de contenido y extensión de cada formato de exportación
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+class _SalidaIncremental(io.BytesIO):
+    """Buffer que se vacía después de cada bloque sin perder la posición absoluta.
+    
+    ParquetWriter guarda en el pie del archivo los desplazamientos de cada
+    grupo de filas, así que tell() debe contar también los bytes ya enviados.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.enviados = 0
+    
+    def tell(self) -> int:
+        return self.enviados + super().tell()
+    
+    def vaciar(self) -> bytes:
+        datos = self.getvalue()
+        self.enviados += len(datos)
+        self.seek(0)
+        self.truncate()
+        return datos
+
+
+async def _csv(paginas: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    columnas = COLUMNAS_PRECIOS
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=columnas, extrasaction='ignore', lineterminator='\n')
+    escritor.writeheader()
+    async for pagina in paginas:
+        escritor.writerows(pagina)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def _ndjson(paginas: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    columnas = COLUMNAS_PRECIOS
+    async for pagina in paginas:
+        yield ''.join(
+            json.dumps({c: fila.get(c) for c in columnas}, ensure_ascii=False, default=str) + '\n'
+            for fila in pagina
+        ).encode('utf-8')
+
+
+async def _parquet(paginas: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    import pyarrow.parquet as pq
+    
+    salida = _SalidaIncremental()
+    with pq.ParquetWriter(salida, esquema_precios(), compression='zstd') as escritor:
+        async for pagina in paginas:
+            escritor.write_table(tabla_arrow(pagina, esquema_precios()))
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def exportar_precios(paginas: AsyncIterator[List[Dict]], formato: str) -> AsyncIterator[bytes]:
+    """Serializar páginas de precios_bvc en bloques, sin acumular el resultado completo.
+    
+    Cada página se convierte y se envía en cuanto llega: en CSV y NDJSON como
+    filas de texto y en Parquet como un grupo de filas por página.
+    """
+    serializadores = {'csv': _csv, 'ndjson': _ndjson, 'parquet': _parquet}
+    return serializadores[formato](paginas)
@@ -0,0 +1,403 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlsplit
+from config import settings
+from metricas import (
+    HTTP_CIRCUITO_ESTADO, HTTP_CIRCUITO_RECHAZADAS, HTTP_RITMO, HTTP_SALIDA_BYTES, HTTP_SALIDA_DURACION
+)
+import asyncio
+import threading
+import time
+import logging
+
+# httpx se importa al crear el primer cliente, no al arrancar la API
+if TYPE_CHECKING:
+    import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CircuitoAbierto(Exception):
+    """La petición no se envió porque el circuito del host está abierto"""
+    
+    def __init__(self, host: str, reintento_en: float):
+        super().__init__(f"Circuito abierto para {host}: se reintenta en {reintento_en:.0f}s")
+        self.host = host
+        self.reintento_en = reintento_en
+
+
+class LimitadorTasa:
+    """Limitador de peticiones tipo token bucket, seguro entre hilos"""
+    
+    def __init__(self, peticiones_por_segundo: float, capacidad: Optional[int] = None):
+        self.tasa = peticiones_por_segundo
+        self.capacidad = capacidad or max(1, int(peticiones_por_segundo))
+        self._tokens = float(self.capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reservar(self) -> float:
+        """Tomar un token y devolver los segundos a esperar antes de usarlo (0 si había uno libre).
+        
+        Los tokens pueden quedar en negativo: cada reserva espera su turno,
+        así sirve igual para hilos (time.sleep) y para el event loop.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.tasa)
+    
+    def adquirir(self):
+        """Bloquear hasta que haya un token disponible"""
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+
+class RitmoAdaptativo(LimitadorTasa):
+    """Token bucket cuya tasa se ajusta con AIMD según las respuestas del host.
+    
+    Cada respuesta rápida suma maximo/10 peticiones por segundo (hasta el
+    máximo); un 429, un 5xx, un error de red o una latencia sobre el objetivo
+    la reduce a la mitad (hasta el mínimo). Solo se reduce una vez por ida y
+    vuelta: las respuestas a peticiones enviadas antes de la última reducción
+    no vuelven a reducir. Un Retry-After pausa el host durante ese tiempo.
+    """
+    
+    def __init__(self, maximo: float, minimo: float, latencia_objetivo: float):
+        super().__init__(maximo)
+        self.maximo = maximo
+        self.minimo = min(minimo, maximo)
+        self.latencia_objetivo = latencia_objetivo
+        self.reducciones = 0
+        self._ultima_reduccion = 0.0
+        self._pausa_hasta = 0.0
+    
+    def reservar(self) -> float:
+        return max(super().reservar(), self._pausa_hasta - time.monotonic())
+    
+    def ajustar(self, inicio: float, latencia: float, sobrecarga: bool, retry_after: Optional[float] = None):
+        """Actualizar la tasa con el resultado de una petición enviada en `inicio` (time.monotonic)"""
+        with self._lock:
+            if retry_after:
+                self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + retry_after)
+            if sobrecarga or latencia > self.latencia_objetivo:
+                if inicio < self._ultima_reduccion:
+                    return
+                self.tasa = max(self.minimo, self.tasa / 2)
+                self._ultima_reduccion = time.monotonic()
+                self.reducciones += 1
+            else:
+                self.tasa = min(self.maximo, self.tasa + self.maximo / 10)
+            self.capacidad = max(1, int(self.tasa))
+            self._tokens = min(self._tokens, self.capacidad)
+    
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            'peticiones_por_segundo': round(self.tasa, 2),
+            'maximo': self.maximo,
+            'reducciones': self.reducciones,
+            'pausa_segundos': round(max(0.0, self._pausa_hasta - time.monotonic()), 1)
+        }
+
+
+class Circuito:
+    """Circuit breaker de un host: cerrado, abierto o semiabierto.
+    
+    Tras `umbral` fallos seguidos se abre y rechaza las peticiones durante
+    `espera_segundos`. Pasado ese tiempo queda semiabierto y deja salir una
+    sola petición de prueba: si responde bien se cierra, si falla se vuelve
+    a abrir. No es seguro entre hilos por sí mismo; lo protege ClienteHTTP.
+    """
+    
+    ESTADOS = {'cerrado': 0, 'semiabierto': 1, 'abierto': 2}
+    
+    def __init__(self, umbral: int, espera_segundos: float):
+        self.umbral = umbral
+        self.espera_segundos = espera_segundos
+        self.estado = 'cerrado'
+        self.fallos_seguidos = 0
+        self.aperturas = 0
+        self.rechazadas = 0
+        self._abierto_desde = 0.0
+        self._sonda_en_curso = False
+    
+    def reintento_en(self) -> float:
+        """Segundos que faltan para dejar pasar la petición de prueba"""
+        return max(0.0, self._abierto_desde + self.espera_segundos - time.monotonic())
+    
+    def permitir(self) -> bool:
+        """Decidir si una petición puede salir"""
+        if self.estado == 'abierto' and self.reintento_en() == 0:
+            self.estado = 'semiabierto'
+        if self.estado == 'semiabierto':
+            if self._sonda_en_curso:
+                return False
+            self._sonda_en_curso = True
+            return True
+        return self.estado == 'cerrado'
+    
+    def registrar(self, exito: bool) -> bool:
+        """Anotar el resultado de una petición; devuelve True si el estado cambió"""
+        anterior = self.estado
+        if self.estado == 'semiabierto':
+            self._sonda_en_curso = False
+        if exito:
+            self.fallos_seguidos = 0
+            self.estado = 'cerrado'
+        else:
+            self.fallos_seguidos += 1
+            if self.estado == 'semiabierto' or self.fallos_seguidos >= self.umbral:
+                self.estado = 'abierto'
+                self._abierto_desde = time.monotonic()
+                if anterior != 'abierto':
+                    self.aperturas += 1
+        return self.estado != anterior
+    
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            'estado': self.estado,
+            'fallos_seguidos': self.fallos_seguidos,
+            'aperturas': self.aperturas,
+            'rechazadas': self.rechazadas,
+            'reintento_en_segundos': round(self.reintento_en(), 1) if self.estado == 'abierto' else None
+        }
+
+
+class MetricasHost:
+    """Latencias y volumen acumulados de las peticiones a un host"""
+    
+    def __init__(self):
+        self.peticiones = 0
+        self.errores = 0
+        self.bytes_recibidos = 0
+        self.latencia_total = 0.0
+        self.latencia_min: Optional[float] = None
+        self.latencia_max = 0.0
+        self.ultima_latencia: Optional[float] = None
+    
+    def registrar(self, latencia: float, bytes_recibidos: int = 0, error: bool = False):
+        self.peticiones += 1
+        self.errores += int(error)
+        self.bytes_recibidos += bytes_recibidos
+        self.latencia_total += latencia
+        self.latencia_min = latencia if self.latencia_min is None else min(self.latencia_min, latencia)
+        self.latencia_max = max(self.latencia_max, latencia)
+        self.ultima_latencia = latencia
+    
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            'peticiones': self.peticiones,
+            'errores': self.errores,
+            'bytes_recibidos': self.bytes_recibidos,
+            'latencia_media_ms': round(1000 * self.latencia_total / self.peticiones, 1) if self.peticiones else None,
+            'latencia_min_ms': round(1000 * self.latencia_min, 1) if self.latencia_min is not None else None,
+            'latencia_max_ms': round(1000 * self.latencia_max, 1),
+            'ultima_latencia_ms': round(1000 * self.ultima_latencia, 1) if self.ultima_latencia is not None else None
+        }
+
+
+class ClienteHTTP:
+    """Cliente HTTP compartido con pool de conexiones keep-alive y métricas por host.
+    
+    Los servicios de scraping reutilizan las conexiones TCP/TLS en lugar de
+    abrir una nueva por petición. Ofrece una variante síncrona (para hilos)
+    y otra asíncrona (para el event loop) con la misma configuración.
+    
+    Cada host (BVC, BCV, Binance P2P) tiene su circuit breaker y su ritmo
+    adaptativo: con la fuente caída las peticiones fallan al instante con
+    CircuitoAbierto en lugar de esperar el timeout completo.
+    """
+    
+    def __init__(
+        self,
+        max_conexiones: int,
+        max_keepalive: int,
+        timeout_segundos: float,
+        trust_env: bool = False
+    ):
+        self.max_conexiones = max_conexiones
+        self.max_keepalive = max_keepalive
+        self.timeout_segundos = timeout_segundos
+        self.trust_env = trust_env
+        self._cliente: Optional["httpx.Client"] = None
+        self._cliente_async: Optional["httpx.AsyncClient"] = None
+        self._metricas: Dict[str, MetricasHost] = {}
+        self._circuitos: Dict[str, Circuito] = {}
+        self._ritmos: Dict[str, RitmoAdaptativo] = {}
+        self._lock = threading.Lock()
+    
+    def _opciones(self) -> Dict[str, Any]:
+        """Configuración común de los clientes síncrono y asíncrono"""
+        import httpx
+        
+        return {
+            'limits': httpx.Limits(
+                max_connections=self.max_conexiones,
+                max_keepalive_connections=self.max_keepalive
+            ),
+            'timeout': httpx.Timeout(self.timeout_segundos),
+            'trust_env': self.trust_env,
+            'follow_redirects': True
+        }
+    
+    @property
+    def cliente(self) -> "httpx.Client":
+        """Cliente síncrono, creado en el primer uso"""
+        with self._lock:
+            if self._cliente is None:
+                import httpx
+                self._cliente = httpx.Client(**self._opciones())
+            return self._cliente
+    
+    @property
+    def cliente_async(self) -> "httpx.AsyncClient":
+        """Cliente asíncrono, creado en el primer uso"""
+        if self._cliente_async is None:
+            import httpx
+            self._cliente_async = httpx.AsyncClient(**self._opciones())
+        return self._cliente_async
+    
+    # ==================== CIRCUITOS Y RITMO POR HOST ====================
+    
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlsplit(url).hostname or url
+    
+    def _ritmo(self, host: str) -> RitmoAdaptativo:
+        """Ritmo del host (con el lock tomado), creado con los valores por defecto"""
+        if host not in self._ritmos:
+            self._ritmos[host] = RitmoAdaptativo(
+                settings.http_ritmo_maximo,
+                settings.http_ritmo_minimo,
+                settings.http_latencia_objetivo_segundos
+            )
+            HTTP_RITMO.labels(host).set(settings.http_ritmo_maximo)
+        return self._ritmos[host]
+    
+    def configurar_ritmo(self, url: str, maximo: float):
+        """Fijar el máximo de peticiones por segundo hacia el host de `url`"""
+        host = self._host(url)
+        with self._lock:
+            self._ritmos[host] = RitmoAdaptativo(
+                maximo,
+                settings.http_ritmo_minimo,
+                settings.http_latencia_objetivo_segundos
+            )
+        HTTP_RITMO.labels(host).set(maximo)
+    
+    def disponible(self, url: str) -> bool:
+        """False si el circuito del host está abierto (las peticiones fallarían al instante)"""
+        with self._lock:
+            circuito = self._circuitos.get(self._host(url))
+            return circuito is None or circuito.estado != 'abierto' or circuito.reintento_en() == 0
+    
+    def _antes_de_enviar(self, url: str) -> float:
+        """Pasar por el circuito y reservar turno en el ritmo del host; devuelve la espera"""
+        host = self._host(url)
+        with self._lock:
+            circuito = self._circuitos.setdefault(
+                host, Circuito(settings.http_circuito_fallos, settings.http_circuito_espera_segundos)
+            )
+            if not circuito.permitir():
+                circuito.rechazadas += 1
+                HTTP_CIRCUITO_RECHAZADAS.labels(host).inc()
+                raise CircuitoAbierto(host, circuito.reintento_en())
+            ritmo = self._ritmo(host)
+        return ritmo.reservar()
+    
+    def _registrar(self, url: str, inicio: float, respuesta: Optional["httpx.Response"]):
+        host = self._host(url)
+        latencia = time.perf_counter() - inicio
+        error = respuesta is None or respuesta.status_code >= 400
+        # Para el circuito y el ritmo solo cuentan los fallos de la fuente, no los 4xx de la petición
+        sobrecarga = respuesta is None or respuesta.status_code == 429 or respuesta.status_code >= 500
+        retry_after = None
+        if respuesta is not None and respuesta.status_code in (429, 503):
+            try:
+                retry_after = min(float(respuesta.headers.get('retry-after', '')), settings.http_circuito_espera_segundos)
+            except ValueError:
+                pass
+        bytes_recibidos = len(respuesta.content) if respuesta is not None else 0
+        with self._lock:
+            metricas = self._metricas.setdefault(host, MetricasHost())
+            metricas.registrar(latencia, bytes_recibidos, error)
+            circuito = self._circuitos[host]
+            if circuito.registrar(not sobrecarga):
+                HTTP_CIRCUITO_ESTADO.labels(host).set(Circuito.ESTADOS[circuito.estado])
+                if circuito.estado == 'abierto':
+                    logger.warning(f"Circuito de {host} abierto tras {circuito.fallos_seguidos} fallos seguidos")
+                else:
+                    logger.info(f"Circuito de {host}: {circuito.estado}")
+            ritmo = self._ritmo(host)
+        ritmo.ajustar(time.monotonic() - latencia, latencia, sobrecarga, retry_after)
+        HTTP_RITMO.labels(host).set(ritmo.tasa)
+        estado = str(respuesta.status_code) if respuesta is not None else 'error'
+        HTTP_SALIDA_DURACION.labels(host, estado).observe(latencia)
+        HTTP_SALIDA_BYTES.labels(host).inc(bytes_recibidos)
+    
+    # ==================== PETICIONES ====================
+    
+    def request(self, metodo: str, url: str, **kwargs) -> "httpx.Response":
+        """Petición síncrona a través del pool compartido. Lanza CircuitoAbierto si el host está caído"""
+        espera = self._antes_de_enviar(url)
+        if espera > 0:
+            time.sleep(espera)
+        inicio = time.perf_counter()
+        respuesta = None
+        try:
+            respuesta = self.cliente.request(metodo, url, **kwargs)
+            return respuesta
+        finally:
+            self._registrar(url, inicio, respuesta)
+    
+    def get(self, url: str, **kwargs) -> "httpx.Response":
+        return self.request("GET", url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> "httpx.Response":
+        return self.request("POST", url, **kwargs)
+    
+    async def arequest(self, metodo: str, url: str, **kwargs) -> "httpx.Response":
+        """Petición asíncrona a través del pool compartido. Lanza CircuitoAbierto si el host está caído"""
+        espera = self._antes_de_enviar(url)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        inicio = time.perf_counter()
+        respuesta = None
+        try:
+            respuesta = await self.cliente_async.request(metodo, url, **kwargs)
+            return respuesta
+        finally:
+            self._registrar(url, inicio, respuesta)
+    
+    def metricas(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas acumuladas, estado del circuito y ritmo actual por host"""
+        with self._lock:
+            return {
+                host: {
+                    **m.resumen(),
+                    'circuito': self._circuitos[host].resumen() if host in self._circuitos else None,
+                    'ritmo': self._ritmos[host].resumen() if host in self._ritmos else None
+                }
+                for host, m in self._metricas.items()
+            }
+    
+    async def cerrar(self):
+        """Cerrar los pools de conexiones"""
+        if self._cliente is not None:
+            self._cliente.close()
+            self._cliente = None
+        if self._cliente_async is not None:
+            await self._cliente_async.aclose()
+            self._cliente_async = None
+
+
+# Instancia global compartida por todos los servicios
+cliente_http = ClienteHTTP(
+    max_conexiones=settings.http_max_conexiones,
+    max_keepalive=settings.http_max_keepalive,
+    timeout_segundos=settings.http_timeout_segundos,
+    trust_env=settings.http_trust_env
+)
@@ -1,15 +1,25 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from typing import Optional, List
 from datetime import date, datetime, timedelta
 from database import db
 from scheduler import scheduler
-from services import binance_p2p_service, bcv_service
+from cache import cache_respuestas, cacheado
+from cotizaciones import monitor_cotizaciones
+from eventos import bus_eventos
+from http_cliente import cliente_http
+from almacen_local import almacen_local, COLUMNAS_PRECIOS
+from exportacion import FORMATOS, exportar_precios
 from pydantic import BaseModel
+import asyncio
+import base64
+import json
 import logging
+import metricas
 import os
+import re
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,6 +34,10 @@ class AccionCreate(BaseModel):
 class ActualizarManual(BaseModel):
     tarea: str = "bvc"  # "bvc" o "tasas"
 
+class BackfillHistorico(BaseModel):
+    fecha_inicio: Optional[date] = None
+    fecha_fin: Optional[date] = None
+
 
 # ==================== APLICACIÓN ====================
 
@@ -33,6 +47,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Latencia, estado y bytes por endpoint para /metrics
+app.add_middleware(metricas.MiddlewareMetricas)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,13 +66,16 @@ async def startup_event():
     """Ejecutar al iniciar la aplicación"""
     logger.info("🚀 Iniciando aplicación...")
     scheduler.start()
+    monitor_cotizaciones.iniciar()
     logger.info("✅ Aplicación iniciada correctamente")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Ejecutar al cerrar la aplicación"""
     logger.info("🛑 Cerrando aplicación...")
+    await monitor_cotizaciones.detener()
     scheduler.shutdown()
+    await cliente_http.cerrar()
 
 # ==================== ENDPOINTS PRINCIPALES ====================
 
@@ -79,11 +99,17 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Verificar estado de la API"""
+    """Verificar estado de la API (en `http`, circuito y ritmo de cada fuente externa)"""
     return {
         "estado": "activo",
         "timestamp": datetime.now().isoformat(),
-        "scheduler_running": scheduler.scheduler.running
+        "scheduler_running": scheduler.scheduler.running,
+        "instancia": scheduler.instancia,
+        "bloqueos": scheduler.bloqueos,
+        "cache": cache_respuestas.estadisticas(),
+        "clientes_eventos": bus_eventos.total_suscriptores,
+        "http": cliente_http.metricas(),
+        "almacen_local": almacen_local.estado()
     }
 
 # ==================== ACCIONES ====================
@@ -107,32 +133,89 @@ async def crear_accion(accion: AccionCreate):
     )
     
     if success:
+        cache_respuestas.invalidar()
         return {"mensaje": "Acción creada exitosamente", "codigo": accion.codigo}
     else:
         raise HTTPException(status_code=400, detail="Error al crear acción")
 
 # ==================== PRECIOS BVC ====================
 
+def _codificar_cursor(fila: dict) -> str:
+    """Cursor opaco con la clave (fecha, accion_codigo) de la última fila entregada"""
+    return base64.urlsafe_b64encode(f"{fila['fecha']}|{fila['accion_codigo']}".encode()).decode()
+
+# El código del cursor va dentro de un filtro de PostgREST: no puede traer comillas, comas ni paréntesis
+CODIGO_CURSOR = re.compile(r'[A-Za-z0-9._-]+')
+
+def _decodificar_cursor(cursor: str) -> tuple:
+    try:
+        fecha, accion_codigo = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        if not CODIGO_CURSOR.fullmatch(accion_codigo):
+            raise ValueError(f"Código de acción inválido en el cursor: {accion_codigo!r}")
+        return date.fromisoformat(fecha).isoformat(), accion_codigo
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
 @app.get("/api/precios/bvc")
 async def get_precios_bvc(
     accion: Optional[str] = None,
     fecha_inicio: Optional[date] = None,
     fecha_fin: Optional[date] = None,
-    limit: int = Query(100, ge=1, le=1000)
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
 ):
-    """Obtener precios históricos de BVC"""
+    """Obtener precios históricos de BVC.
+    
+    Paginación por cursor sobre (fecha desc, accion_codigo): si hay más filas,
+    la respuesta incluye siguiente_cursor para pedir la página siguiente.
+    """
+    despues = _decodificar_cursor(cursor) if cursor else None
     precios = await db.get_precios_bvc(
         accion_codigo=accion,
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
-        limit=limit
+        limit=limit + 1,
+        despues=despues
     )
     
+    siguiente_cursor = None
+    if len(precios) > limit:
+        precios = precios[:limit]
+        siguiente_cursor = _codificar_cursor(precios[-1])
+    
     return {
         "total": len(precios),
-        "precios": precios
+        "precios": precios,
+        "siguiente_cursor": siguiente_cursor
     }
 
+@app.get("/api/precios/bvc/exportar")
+async def exportar_precios_bvc(
+    formato: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    accion: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+):
+    """Exportar precios históricos completos en CSV, NDJSON o Parquet.
+    
+    El resultado se recorre por cursor y se envía en bloques, así que el
+    tamaño del rango no afecta la memoria del servidor.
+    """
+    tipo_contenido, extension = FORMATOS[formato]
+    paginas = db.iterar_precios_bvc(
+        accion_codigo=accion,
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        columnas=','.join(COLUMNAS_PRECIOS)
+    )
+    nombre = f"precios_bvc_{accion or 'todas'}_{fecha_inicio or 'inicio'}_{fecha_fin or date.today()}.{extension}"
+    
+    return StreamingResponse(
+        exportar_precios(paginas, formato),
+        media_type=tipo_contenido,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
+
 @app.get("/api/precios/bvc/{accion_codigo}/ultimo")
 async def get_ultimo_precio_bvc(accion_codigo: str):
     """Obtener último precio de una acción"""
@@ -144,6 +227,7 @@ async def get_ultimo_precio_bvc(accion_codigo: str):
     return precio
 
 @app.get("/api/precios/bvc/{accion_codigo}/historico")
+@cacheado("historico", vacio=lambda respuesta: not respuesta["precios"])
 async def get_historico_accion(
     accion_codigo: str,
     dias: int = Query(30, ge=1, le=365)
@@ -167,6 +251,7 @@ async def get_historico_accion(
 # ==================== TASAS DE CAMBIO ====================
 
 @app.get("/api/tasas")
+@cacheado("tasas")
 async def get_tasas_cambio(fecha: Optional[date] = None):
     """Obtener tasa de cambio"""
     tasa = await db.get_tasa_cambio(fecha)
@@ -178,40 +263,107 @@ async def get_tasas_cambio(fecha: Optional[date] = None):
 
 @app.get("/api/tasas/actual")
 async def get_tasa_actual():
-    """Obtener tasas actuales en tiempo real (BCV y Binance P2P)"""
+    """Obtener las últimas tasas en vivo (BCV y Binance P2P).
+    
+    Se sirven desde memoria; un refresco en segundo plano las mantiene al día.
+    """
     try:
-        # Obtener tasa oficial BCV
-        tasa_bcv = bcv_service.get_official_rate()
-        
-        # Obtener tasa paralelo Binance P2P
-        tasa_paralelo = binance_p2p_service.get_precio_promedio_compra()
+        cotizaciones = await monitor_cotizaciones.get_actuales()
         
         return {
             "timestamp": datetime.now().isoformat(),
-            "tasa_oficial": tasa_bcv['tasa_oficial'] if tasa_bcv else None,
-            "tasa_paralelo": tasa_paralelo,
+            "tasa_oficial": cotizaciones['oficial']['valor'],
+            "tasa_paralelo": cotizaciones['paralelo']['valor'],
             "fuente_oficial": "BCV",
-            "fuente_paralelo": "Binance P2P"
+            "fuente_paralelo": "Binance P2P",
+            "actualizado": {
+                "oficial": cotizaciones['oficial']['actualizado'],
+                "paralelo": cotizaciones['paralelo']['actualizado']
+            },
+            "edad_segundos": {
+                "oficial": cotizaciones['oficial']['edad_segundos'],
+                "paralelo": cotizaciones['paralelo']['edad_segundos']
+            }
         }
     except Exception as e:
         logger.error(f"Error al obtener tasas actuales: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/tasas/intradia")
+async def get_tasas_intradia(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    resolucion: str = Query("muestras", pattern="^(muestras|1h|1d)$")
+):
+    """Serie intradía de las tasas oficial y paralelo en hora de Caracas.
+    
+    Con resolucion=muestras devuelve cada muestra guardada (últimos días);
+    con 1h o 1d, velas OHLC de cada tasa. Por defecto, las últimas 24 horas.
+    """
+    hasta = hasta or datetime.now(scheduler.timezone).replace(tzinfo=None)
+    desde = desde or hasta - timedelta(days=1)
+    if desde >= hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+    
+    if resolucion == "muestras":
+        serie = await db.get_tasas_intradia(desde, hasta)
+    else:
+        serie = await db.get_velas_intradia(resolucion, desde, hasta)
+    
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "resolucion": resolucion,
+        "total": len(serie),
+        "serie": serie
+    }
+
+@app.get("/api/tasas/p2p/libro")
+@cacheado("libro_p2p")
+async def get_libro_p2p(incluir_ofertas: bool = True):
+    """Último snapshot guardado del libro de Binance P2P y la tasa con cada agregación"""
+    libro = await db.get_ultimo_libro_p2p()
+    
+    if not libro:
+        raise HTTPException(status_code=404, detail="No hay snapshots del libro P2P")
+    
+    if not incluir_ofertas:
+        libro = {k: v for k, v in libro.items() if k not in ('ofertas_compra', 'ofertas_venta')}
+    
+    return libro
+
 # ==================== RESUMEN Y ESTADÍSTICAS ====================
 
 @app.get("/api/resumen")
+@cacheado("resumen")
 async def get_resumen_mercado():
     """Obtener resumen general del mercado"""
     resumen = await db.get_resumen_mercado()
     return resumen
 
-@app.get("/api/resumen/{accion_codigo}")
-async def get_resumen_accion(accion_codigo: str):
-    """Obtener resumen de una acción específica"""
+def _formatear_estadisticas(fila: dict) -> dict:
+    """Estadísticas de una ventana tal como las guarda estadisticas_acciones"""
+    return {
+        "fecha": fila.get('fecha'),
+        "sesiones": fila.get('sesiones'),
+        "precio_minimo": fila.get('precio_minimo_oficial'),
+        "precio_maximo": fila.get('precio_maximo_oficial'),
+        "precio_promedio": fila.get('precio_promedio_oficial'),
+        "precio_minimo_paralelo": fila.get('precio_minimo_paralelo'),
+        "precio_maximo_paralelo": fila.get('precio_maximo_paralelo'),
+        "precio_promedio_paralelo": fila.get('precio_promedio_paralelo'),
+        "titulos_negociados": fila.get('titulos_negociados'),
+        "monto_efectivo_usd_oficial": fila.get('monto_efectivo_usd_oficial'),
+        "retorno_oficial": fila.get('retorno_oficial'),
+        "retorno_paralelo": fila.get('retorno_paralelo')
+    }
+
+async def _resumen_accion_calculado(accion_codigo: str) -> Optional[dict]:
+    """Resumen calculado al vuelo, para acciones sin estadísticas materializadas"""
     precio_actual = await db.get_ultimo_precio_bvc(accion_codigo)
     
     if not precio_actual:
-        raise HTTPException(status_code=404, detail="Acción no encontrada")
+        return None
     
     fecha_inicio = date.today() - timedelta(days=30)
     historico = await db.get_precios_bvc(
@@ -231,6 +383,11 @@ async def get_resumen_accion(accion_codigo: str):
     else:
         precio_min = precio_max = precio_promedio = None
     
+    estadisticas_30d = {
+        "precio_minimo": precio_min,
+        "precio_maximo": precio_max,
+        "precio_promedio": precio_promedio
+    }
     return {
         "codigo": accion_codigo,
         "precio_actual_oficial": precio_actual.get('precio_cierre_usd_oficial'),
@@ -238,38 +395,183 @@ async def get_resumen_accion(accion_codigo: str):
         "capitalizacion_oficial": precio_actual.get('capitalizacion_oficial'),
         "capitalizacion_paralelo": precio_actual.get('capitalizacion_paralelo'),
         "fecha": precio_actual.get('fecha'),
+        "estadisticas_30d": estadisticas_30d,
+        "estadisticas": {"30d": estadisticas_30d}
+    }
+
+@app.get("/api/resumen/{accion_codigo}")
+@cacheado("resumen_accion")
+async def get_resumen_accion(accion_codigo: str):
+    """Obtener resumen de una acción específica.
+    
+    Lee las estadísticas de 7/30/90/365 días materializadas en cada ingesta;
+    si la acción aún no las tiene, las calcula sobre los últimos 30 días.
+    """
+    filas = await db.get_estadisticas_accion(accion_codigo)
+    
+    if not filas:
+        resumen = await _resumen_accion_calculado(accion_codigo)
+        if not resumen:
+            raise HTTPException(status_code=404, detail="Acción no encontrada")
+        return resumen
+    
+    actual = filas[-1]
+    estadisticas = {f"{f['ventana_dias']}d": _formatear_estadisticas(f) for f in filas}
+    estadisticas_30d = estadisticas.get("30d", {})
+    
+    return {
+        "codigo": accion_codigo,
+        "precio_actual_oficial": actual.get('precio_actual_oficial'),
+        "precio_actual_paralelo": actual.get('precio_actual_paralelo'),
+        "capitalizacion_oficial": actual.get('capitalizacion_oficial'),
+        "capitalizacion_paralelo": actual.get('capitalizacion_paralelo'),
+        "fecha": actual.get('fecha'),
         "estadisticas_30d": {
-            "precio_minimo": precio_min,
-            "precio_maximo": precio_max,
-            "precio_promedio": precio_promedio
-        }
+            "precio_minimo": estadisticas_30d.get("precio_minimo"),
+            "precio_maximo": estadisticas_30d.get("precio_maximo"),
+            "precio_promedio": estadisticas_30d.get("precio_promedio")
+        },
+        "estadisticas": estadisticas
     }
 
+# ==================== EVENTOS EN VIVO ====================
+
+@app.get("/api/eventos")
+async def stream_eventos():
+    """Flujo Server-Sent Events con los cambios del mercado y de las tasas.
+    
+    Eventos: 'resumen' (diff del resumen del mercado), 'tasas' (cotización que
+    cambió) y 'actualizacion' (fin de una actualización BVC).
+    """
+    async def generador():
+        cola = bus_eventos.suscribir()
+        try:
+            yield "retry: 10000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(cola.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield ": keepalive\n\n"
+        finally:
+            bus_eventos.desuscribir(cola)
+    
+    return StreamingResponse(
+        generador(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== ACTUALIZACIONES MANUALES ====================
 
-@app.post("/api/actualizar")
+@app.post("/api/actualizar", status_code=202)
 async def actualizar_manual(datos: ActualizarManual):
-    """Ejecutar actualización manual de precios"""
+    """Lanzar actualización manual de precios en segundo plano.
+    
+    Responde de inmediato con el identificador de la ejecución; su estado se
+    consulta en /api/actualizar/{ejecucion_id}.
+    """
     try:
-        await scheduler.ejecutar_ahora(datos.tarea)
+        ejecucion = scheduler.lanzar(datos.tarea)
         return {
-            "mensaje": f"Actualización '{datos.tarea}' ejecutada exitosamente",
-            "timestamp": datetime.now().isoformat()
+            "mensaje": f"Actualización '{ejecucion['tarea']}' en curso",
+            "timestamp": datetime.now().isoformat(),
+            "ejecucion": ejecucion
         }
     except Exception as e:
         logger.error(f"Error en actualización manual: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/backfill", status_code=202)
+async def backfill_historico(datos: BackfillHistorico):
+    """Reconstruir el histórico de precios BVC en segundo plano.
+    
+    Cada fila se convierte con la tasa de cambio de su propia fecha. El
+    progreso se consulta en /api/actualizar/{ejecucion_id}.
+    """
+    if datos.fecha_inicio and datos.fecha_fin and datos.fecha_inicio > datos.fecha_fin:
+        raise HTTPException(status_code=400, detail="fecha_inicio debe ser anterior a fecha_fin")
+    
+    ejecucion = scheduler.lanzar(
+        "backfill",
+        fecha_inicio=datos.fecha_inicio,
+        fecha_fin=datos.fecha_fin
+    )
+    return {
+        "mensaje": "Backfill histórico en curso",
+        "timestamp": datetime.now().isoformat(),
+        "ejecucion": ejecucion
+    }
+
+@app.get("/api/actualizar/{ejecucion_id}")
+async def get_estado_actualizacion(ejecucion_id: str):
+    """Consultar el estado de una actualización lanzada (de esta instancia o del historial)"""
+    ejecucion = scheduler.get_ejecucion(ejecucion_id) or await db.get_ejecucion(ejecucion_id)
+    
+    if not ejecucion:
+        raise HTTPException(status_code=404, detail="Ejecución no encontrada")
+    
+    return ejecucion
+
+@app.get("/api/ejecuciones")
+async def get_ejecuciones(
+    tarea: Optional[str] = Query(None, pattern="^(bvc|tasas|backfill|espejo)$"),
+    estado: Optional[str] = Query(None, description="uno o varios separados por coma"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """Historial persistido de ejecuciones (todas las instancias), de la más reciente a la más antigua"""
+    ejecuciones = await db.get_ejecuciones(tarea=tarea, estado=estado, limit=limit)
+    return {
+        "total": len(ejecuciones),
+        "ejecuciones": [
+            {
+                clave: e.get(clave)
+                for clave in ('id', 'tarea', 'estado', 'instancia', 'inicio', 'fin',
+                              'duracion_segundos', 'progreso', 'reanuda')
+            }
+            for e in ejecuciones
+        ]
+    }
+
+@app.get("/api/ejecuciones/{ejecucion_id}")
+async def get_detalle_ejecucion(ejecucion_id: str):
+    """Ejecución del historial con etapas, puntos de control y el estado de cada símbolo"""
+    ejecucion = await db.get_ejecucion(ejecucion_id)
+    
+    if not ejecucion:
+        raise HTTPException(status_code=404, detail="Ejecución no encontrada")
+    
+    return ejecucion
+
 @app.get("/api/ultima-actualizacion")
 async def get_ultima_actualizacion():
-    """Obtener información de última actualización"""
-    ultima_bvc = await db.get_config('ultima_actualizacion_bvc')
+    """Obtener información de última actualización, con duración y desglose por etapa"""
+    ultima_bvc, ultima_ejecucion = await asyncio.gather(
+        db.get_config('ultima_actualizacion_bvc'),
+        db.get_config('ultima_ejecucion_bvc')
+    )
+    
+    historial = [
+        {clave: e[clave] for clave in ('id', 'tarea', 'estado', 'inicio', 'fin', 'duracion_segundos', 'etapas')}
+        for e in reversed(scheduler.ejecuciones.values())
+        if e['tarea'] == 'bvc' and e['fin']
+    ]
     
     return {
         "ultima_actualizacion_bvc": ultima_bvc,
+        "ultima_ejecucion": json.loads(ultima_ejecucion) if ultima_ejecucion else None,
+        "historial": historial,
         "proxima_actualizacion": "Lunes a Viernes 17:00 (America/Caracas)"
     }
 
+# ==================== MÉTRICAS ====================
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metricas():
+    """Métricas en formato Prometheus"""
+    cuerpo, tipo_contenido = metricas.exportar()
+    return Response(content=cuerpo, headers={"Content-Type": tipo_contenido})
+
 # ==================== CONFIGURACIÓN ====================
 
 @app.get("/api/config")
@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from starlette.routing import Match
+import time
+
+
+# ==================== MÉTRICAS ====================
+
+ETAPA_DURACION = Histogram(
+    'renta_variable_etapa_segundos',
+    'Duración de cada etapa de las tareas de actualización',
+    ['tarea', 'etapa'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+ETAPA_ERRORES = Counter(
+    'renta_variable_etapa_errores_total',
+    'Etapas de actualización que terminaron con excepción',
+    ['tarea', 'etapa']
+)
+EJECUCIONES = Counter(
+    'renta_variable_ejecuciones_total',
+    'Ejecuciones de tareas por estado final',
+    ['tarea', 'estado']
+)
+EJECUCION_DURACION = Histogram(
+    'renta_variable_ejecucion_segundos',
+    'Duración total de las ejecuciones de tareas',
+    ['tarea'],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+SIMBOLO_DURACION = Histogram(
+    'renta_variable_bvc_simbolo_segundos',
+    'Descarga de un símbolo de la BVC, incluidos los reintentos',
+    ['simbolo', 'resultado'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 45)
+)
+FILAS_ESCRITAS = Counter(
+    'renta_variable_filas_escritas_total',
+    'Filas escritas en la base de datos',
+    ['tabla', 'operacion']
+)
+HTTP_SALIDA_DURACION = Histogram(
+    'renta_variable_http_salida_segundos',
+    'Latencia de las peticiones a fuentes externas',
+    ['host', 'estado'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20)
+)
+HTTP_SALIDA_BYTES = Counter(
+    'renta_variable_http_salida_bytes_total',
+    'Bytes recibidos de fuentes externas',
+    ['host']
+)
+HTTP_CIRCUITO_ESTADO = Gauge(
+    'renta_variable_http_circuito_estado',
+    'Circuit breaker de cada fuente externa (0 cerrado, 1 semiabierto, 2 abierto)',
+    ['host']
+)
+HTTP_CIRCUITO_RECHAZADAS = Counter(
+    'renta_variable_http_circuito_rechazadas_total',
+    'Peticiones rechazadas sin salir porque el circuito del host estaba abierto',
+    ['host']
+)
+HTTP_RITMO = Gauge(
+    'renta_variable_http_ritmo_peticiones_por_segundo',
+    'Ritmo adaptativo de peticiones permitido por host',
+    ['host']
+)
+API_DURACION = Histogram(
+    'renta_variable_api_segundos',
+    'Latencia de los endpoints de la API',
+    ['metodo', 'ruta', 'estado'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+API_BYTES = Counter(
+    'renta_variable_api_bytes_total',
+    'Bytes enviados por los endpoints de la API',
+    ['metodo', 'ruta']
+)
+
+
+@contextmanager
+def medir_etapa(tarea: str, etapa: str, etapas: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Medir una etapa en el histograma y, opcionalmente, en el desglose de la ejecución"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ETAPA_ERRORES.labels(tarea, etapa).inc()
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        ETAPA_DURACION.labels(tarea, etapa).observe(duracion)
+        if etapas is not None:
+            etapas[etapa] = round(etapas.get(etapa, 0) + duracion, 3)
+
+
+def exportar() -> tuple:
+    """Cuerpo y tipo de contenido del endpoint /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mide latencia, estado y bytes enviados por endpoint.
+    
+    La ruta se etiqueta con la plantilla (/api/precios/bvc/{accion_codigo}/ultimo)
+    y no con la URL concreta, para no crear una serie por cada acción. Las
+    conexiones de larga duración (SSE) y el propio /metrics no se miden.
+    """
+    
+    EXCLUIDAS = {'/api/eventos', '/metrics'}
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def _plantilla(self, scope) -> str:
+        for ruta in scope['app'].routes:
+            coincidencia, _ = ruta.matches(scope)
+            if coincidencia == Match.FULL:
+                return getattr(ruta, 'path', scope['path'])
+        return 'sin_ruta'
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.EXCLUIDAS:
+            await self.app(scope, receive, send)
+            return
+        
+        inicio = time.perf_counter()
+        respuesta = {'estado': 500, 'bytes': 0}
+        
+        async def send_medido(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                respuesta['estado'] = mensaje['status']
+            elif mensaje['type'] == 'http.response.body':
+                respuesta['bytes'] += len(mensaje.get('body', b''))
+            await send(mensaje)
+        
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            ruta = self._plantilla(scope)
+            API_DURACION.labels(scope['method'], ruta, str(respuesta['estado'])).observe(time.perf_counter() - inicio)
+            API_BYTES.labels(scope['method'], ruta).inc(respuesta['bytes'])
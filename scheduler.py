@@ -1,11 +1,26 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
 from database import db
 from services import binance_p2p_service, bcv_service, bvc_service
+from cache import cache_respuestas
+from cotizaciones import monitor_cotizaciones
+from eventos import bus_eventos
+from almacen_local import almacen_local
+from metricas import EJECUCION_DURACION, EJECUCIONES, medir_etapa
 from config import settings
+import asyncio
+import json
 import logging
+import os
 import pytz
+import socket
+import time
+
+# APScheduler se importa al iniciar el programador, no al importar el módulo
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,120 +29,753 @@ logger = logging.getLogger(__name__)
 class UpdateScheduler:
     """Programador de actualizaciones automáticas"""
     
+    MAX_EJECUCIONES_REGISTRADAS = 20
+    
+    # Tareas que escriben en la base de datos compartida: con varias instancias
+    # solo la que toma el bloqueo las ejecuta. El espejo local es de cada instancia
+    TAREAS_CON_BLOQUEO = ('bvc', 'tasas', 'backfill')
+    
+    # Segundos que se conserva el bloqueo al terminar una tarea, para que las
+    # instancias que disparan el mismo horario un poco más tarde no la repitan
+    RETENCION_BLOQUEO_SEGUNDOS = 60
+    
+    # Al seguir las ejecuciones de otras instancias se vuelve a consultar este
+    # margen hacia atrás, por si sus relojes o sus escrituras van algo retrasados
+    MARGEN_SEGUIMIENTO_SEGUNDOS = 300
+    
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        self._programador: Optional["AsyncIOScheduler"] = None
         self.timezone = pytz.timezone(settings.timezone)
+        self.ejecuciones: "OrderedDict[str, Dict]" = OrderedDict()
+        self._tareas: Dict[str, asyncio.Task] = {}
+        self.instancia = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self.bloqueos: Dict[str, str] = {}
+        self._reanudacion: Optional[asyncio.Task] = None
+        self._seguimiento_hasta: Optional[datetime] = None
+        self._ejecuciones_aplicadas: Dict[str, datetime] = {}
         
-    async def actualizar_precios_bvc(self):
-        """Actualizar precios de la BVC"""
+    @property
+    def scheduler(self) -> "AsyncIOScheduler":
+        """Programador de APScheduler, creado en el primer uso"""
+        if self._programador is None:
+            from apscheduler.schedulers.asyncio import AsyncIOScheduler
+            self._programador = AsyncIOScheduler()
+        return self._programador
+    
+    # ==================== BLOQUEOS ENTRE INSTANCIAS ====================
+    
+    async def _tomar_bloqueo(self, tarea: str, segundos: int) -> bool:
+        """Tomar o renovar el lease de una tarea a nombre de esta instancia"""
+        if not settings.bloqueo_tareas:
+            return True
+        if await db.adquirir_bloqueo(tarea, self.instancia, segundos):
+            self.bloqueos[tarea] = (datetime.now() + timedelta(seconds=segundos)).isoformat()
+            return True
+        self.bloqueos.pop(tarea, None)
+        return False
+    
+    async def _renovar_bloqueo(self, tarea: str, segundos: int):
+        """Renovar el lease cada tercio de su duración mientras la tarea sigue en curso"""
+        while True:
+            await asyncio.sleep(segundos / 3)
+            if not await self._tomar_bloqueo(tarea, segundos):
+                logger.warning(f"⚠️  No se pudo renovar el bloqueo de {tarea}; otra instancia podría tomarlo")
+    
+    async def _calcular_capitalizaciones(self, precios: List[Dict]):
+        """Calcular capitalización de mercado con las acciones en circulación"""
+        acciones = await db.get_acciones()
+        acciones_dict = {a['codigo']: a['acciones_circulacion'] for a in acciones}
+        
+        for precio in precios:
+            codigo = precio['accion_codigo']
+            if codigo in acciones_dict and acciones_dict[codigo]:
+                acc_circ = acciones_dict[codigo]
+                precio['capitalizacion_oficial'] = precio['precio_cierre_usd_oficial'] * acc_circ
+                precio['capitalizacion_paralelo'] = precio['precio_cierre_usd_paralelo'] * acc_circ
+    
+    async def _ejecucion_reanudable(self, excluir: Optional[str] = None) -> Optional[Dict]:
+        """Última ejecución BVC de hoy si quedó interrumpida, fallida o parcial tras su punto de control de tasas.
+        
+        La actualización BVC la consulta con el bloqueo de la tarea tomado, así
+        que una ejecución que sigue 'en_curso' murió sin terminar. Al arrancar,
+        _reanudar_interrumpida la consulta sin el bloqueo: ahí una ejecución
+        'en_curso' puede ser de otra instancia viva.
+        """
+        hoy = datetime.combine(date.today(), datetime.min.time())
+        for previa in await db.get_ejecuciones(tarea='bvc', desde=hoy, limit=5):
+            if previa['id'] == excluir:
+                continue
+            if previa['estado'] in ('en_curso', 'interrumpida', 'fallida', 'parcial') and \
+                    (previa.get('puntos_control') or {}).get('tasas'):
+                return previa
+            return None
+        return None
+    
+    async def actualizar_precios_bvc(self, ejecucion: Optional[Dict] = None) -> Optional[Dict]:
+        """Actualizar precios de la BVC.
+        
+        El scraping y las consultas a la base de datos se ejecutan en hilos,
+        por lo que el event loop de la API sigue atendiendo peticiones.
+        
+        Los símbolos se procesan en lotes de BVC_LOTE_SIMBOLOS; tras cada lote
+        se guardan los precios, el estado de ingesta y un punto de control en
+        el historial de ejecuciones. Si la última ejecución del día quedó
+        interrumpida, fallida o parcial, se reanuda: se reutilizan sus tasas y
+        solo se descargan los símbolos que no llegó a completar.
+        """
+        if ejecucion is None:
+            ejecucion = self._registrar_ejecucion('bvc', {})
+        etapas = ejecucion['etapas']
+        puntos_control = ejecucion.setdefault('puntos_control', {})
         try:
             logger.info("🔄 Iniciando actualización de precios BVC...")
             
-            # 1. Obtener tasa oficial del BCV
-            logger.info("📊 Obteniendo tasa oficial BCV...")
-            tasa_bcv = bcv_service.get_official_rate()
-            if not tasa_bcv:
-                logger.error("❌ No se pudo obtener tasa oficial BCV")
-                return
-            
-            tasa_oficial = tasa_bcv['tasa_oficial']
-            logger.info(f"✅ Tasa oficial BCV: {tasa_oficial:.2f} Bs/USD")
+            previa = await self._ejecucion_reanudable(excluir=ejecucion['id'])
+            completados = []
+            if previa is not None:
+                if previa['estado'] == 'en_curso':
+                    await db.guardar_ejecucion({**previa, 'estado': 'interrumpida'})
+                detalle = await db.get_ejecucion(previa['id']) or {'simbolos': []}
+                completados = [
+                    {'simbolo': s['simbolo'], 'estado': s['estado'], 'filas': s['filas']}
+                    for s in detalle['simbolos'] if s['estado'] in ('escrito', 'sin_cambios')
+                ]
+                puntos_control.update(previa['puntos_control'])
+                ejecucion['reanuda'] = previa['id']
+                logger.info(
+                    f"⏯️  Reanudando la ejecución {previa['id']} ({previa['estado']}): "
+                    f"{len(completados)} símbolos ya completados"
+                )
             
-            # 2. Obtener tasa paralelo de Binance P2P
-            logger.info("📊 Obteniendo tasa paralelo Binance P2P...")
-            tasa_paralelo = binance_p2p_service.get_precio_promedio_compra()
-            if not tasa_paralelo:
-                logger.error("❌ No se pudo obtener tasa paralelo Binance P2P")
-                return
+            if 'tasas' in puntos_control:
+                tasa_oficial = puntos_control['tasas']['tasa_oficial']
+                tasa_paralelo = puntos_control['tasas']['tasa_paralelo']
+            else:
+                # 1. Obtener tasa oficial del BCV
+                logger.info("📊 Obteniendo tasa oficial BCV...")
+                with medir_etapa('bvc', 'tasa_bcv', etapas):
+                    tasa_bcv = await asyncio.to_thread(bcv_service.get_official_rate)
+                if not tasa_bcv:
+                    logger.error("❌ No se pudo obtener tasa oficial BCV")
+                    return None
+                
+                tasa_oficial = tasa_bcv['tasa_oficial']
+                logger.info(f"✅ Tasa oficial BCV: {tasa_oficial:.2f} Bs/USD")
+                
+                # 2. Obtener tasa paralelo de Binance P2P
+                logger.info("📊 Obteniendo tasa paralelo Binance P2P...")
+                with medir_etapa('bvc', 'tasa_p2p', etapas):
+                    p2p = await asyncio.to_thread(binance_p2p_service.get_tasa_paralelo)
+                if not p2p:
+                    logger.error("❌ No se pudo obtener tasa paralelo Binance P2P")
+                    return None
+                
+                tasa_paralelo = p2p['tasa']
+                logger.info(f"✅ Tasa paralelo P2P ({p2p['metodo']}): {tasa_paralelo:.2f} Bs/USD")
+                
+                # 3. Guardar tasas y snapshot del libro P2P en la base de datos
+                with medir_etapa('bvc', 'guardar_tasas', etapas):
+                    await asyncio.gather(
+                        db.insert_tasa_cambio(
+                            fecha=date.today(),
+                            tasa_oficial=tasa_oficial,
+                            tasa_paralelo=tasa_paralelo
+                        ),
+                        db.insert_libro_p2p(p2p)
+                    )
+                puntos_control['tasas'] = {'tasa_oficial': tasa_oficial, 'tasa_paralelo': tasa_paralelo}
             
-            logger.info(f"✅ Tasa paralelo P2P: {tasa_paralelo:.2f} Bs/USD")
+            # 4. Estado de ingesta y tasas para convertir las filas nuevas o corregidas
+            with medir_etapa('bvc', 'estado_ingesta', etapas):
+                estados = await db.get_estados_ingesta()
+                fechas_estado = [date.fromisoformat(e['ultima_fecha']) for e in estados.values() if e.get('ultima_fecha')]
+                desde = min(fechas_estado, default=date.today()) - timedelta(
+                    days=settings.bvc_dias_correccion + bvc_service.DIAS_TOLERANCIA_TASA
+                )
+                tasas = await db.get_tasas_cambio(fecha_inicio=desde)
+            if not any(t['fecha'] == date.today().isoformat() for t in tasas):
+                tasas.append({
+                    'fecha': date.today().isoformat(),
+                    'tasa_oficial': tasa_oficial,
+                    'tasa_paralelo': tasa_paralelo
+                })
             
-            # 3. Guardar tasas en la base de datos
-            await db.insert_tasa_cambio(
-                fecha=date.today(),
-                tasa_oficial=tasa_oficial,
-                tasa_paralelo=tasa_paralelo
+            hechos = {s['simbolo'] for s in completados}
+            pendientes = [s for s in bvc_service.SIMBOLOS if s not in hechos]
+            await db.upsert_simbolos_ejecucion(
+                ejecucion['id'],
+                completados + [{'simbolo': s, 'estado': 'pendiente', 'filas': 0} for s in pendientes]
             )
+            await db.guardar_ejecucion(ejecucion)
             
-            # 4. Obtener precios de cierre de BVC con conversión a USD
-            logger.info("📊 Obteniendo precios de cierre BVC...")
-            precios = bvc_service.get_precios_cierre(tasa_oficial, tasa_paralelo)
+            resultado = {
+                'tasa_oficial': tasa_oficial,
+                'tasa_paralelo': tasa_paralelo,
+                'exitos': 0,
+                'insertados': 0,
+                'actualizados': 0,
+                'errores': 0,
+                'simbolos_sin_cambios': 0,
+                'simbolos_actualizados': 0,
+                'simbolos_fallidos': [],
+                'simbolos_reanudados': len(completados),
+                'filas_nuevas': 0,
+                'filas_corregidas': 0,
+                'agregados': False
+            }
+            descargados = 0
+            fecha_mercado = puntos_control.get('fecha_mercado')
+            tamano_lote = max(settings.bvc_lote_simbolos, 1)
             
-            if not precios:
+            # 5. Descargar, convertir y escribir cada lote de símbolos
+            logger.info(f"📊 Obteniendo precios de cierre BVC (incremental, {len(pendientes)} símbolos)...")
+            for i in range(0, len(pendientes), tamano_lote):
+                lote = pendientes[i:i + tamano_lote]
+                ingesta = await asyncio.to_thread(
+                    bvc_service.get_precios_incrementales, tasas, estados, None, lote,
+                    date.fromisoformat(fecha_mercado) if fecha_mercado else None
+                )
+                if ingesta is None:
+                    simbolos = {simbolo: 'fallido' for simbolo in lote}
+                    resultado['simbolos_fallidos'].extend(lote)
+                    precios = []
+                else:
+                    descargados += 1
+                    for etapa, duracion in ingesta['etapas'].items():
+                        etapas[etapa] = round(etapas.get(etapa, 0) + duracion, 3)
+                    if ingesta['fecha_mercado'] is not None:
+                        fecha_mercado = ingesta['fecha_mercado'].isoformat()
+                    estadisticas = ingesta['estadisticas']
+                    resultado['simbolos_sin_cambios'] += estadisticas['sin_cambios']
+                    resultado['simbolos_actualizados'] += estadisticas['actualizados']
+                    resultado['simbolos_fallidos'].extend(estadisticas['fallidos'])
+                    resultado['filas_nuevas'] += estadisticas['filas_nuevas']
+                    resultado['filas_corregidas'] += estadisticas['filas_corregidas']
+                    # Los símbolos con filas sin tasa quedan pendientes: una reanudación los vuelve a descargar
+                    sin_tasa = [simbolo for simbolo, estado in ingesta['simbolos'].items() if estado == 'sin_tasa']
+                    resultado['simbolos_fallidos'].extend(sin_tasa)
+                    simbolos = {
+                        simbolo: 'escrito' if estado == 'cambiado' else 'fallido' if estado == 'sin_tasa' else estado
+                        for simbolo, estado in ingesta['simbolos'].items()
+                    }
+                    precios = ingesta['precios']
+                    estados_nuevos = ingesta['estados']
+                    
+                    if precios:
+                        # Capitalización con acciones en circulación
+                        with medir_etapa('bvc', 'capitalizacion', etapas):
+                            await self._calcular_capitalizaciones(precios)
+                        
+                        # Insertar o actualizar precios en lote (idempotente por acción y fecha)
+                        with medir_etapa('bvc', 'escritura_db', etapas):
+                            escritura = await db.upsert_precios_bvc(precios)
+                        for clave in ('insertados', 'actualizados', 'errores'):
+                            resultado[clave] += escritura[clave]
+                        resultado['exitos'] += escritura['insertados'] + escritura['actualizados']
+                        
+                        # Si falló la escritura, los símbolos con filas conservan su estado y se reintentan;
+                        # los que no están en acciones también, para escribirlos cuando se den de alta
+                        no_escritos = set(escritura['sin_accion'])
+                        if escritura['errores']:
+                            no_escritos |= {p['accion_codigo'] for p in precios}
+                        if no_escritos:
+                            estados_nuevos = [e for e in estados_nuevos if e['simbolo'] not in no_escritos]
+                            simbolos.update({simbolo: 'fallido' for simbolo in no_escritos})
+                        
+                        fechas = [p['fecha'].isoformat() for p in precios] + puntos_control.get('fechas', [])
+                        puntos_control['fechas'] = [min(fechas), max(fechas)]
+                    await db.upsert_estados_ingesta(estados_nuevos)
+                
+                # Punto de control del lote: estado de cada símbolo y progreso de la ejecución
+                filas = {}
+                for precio in precios:
+                    filas[precio['accion_codigo']] = filas.get(precio['accion_codigo'], 0) + 1
+                puntos_control['fecha_mercado'] = fecha_mercado
+                procesados = min(i + tamano_lote, len(pendientes))
+                ejecucion['progreso'] = {
+                    'simbolos_procesados': len(completados) + procesados,
+                    'simbolos_totales': len(bvc_service.SIMBOLOS),
+                    'porcentaje': round(100 * (len(completados) + procesados) / len(bvc_service.SIMBOLOS), 1)
+                }
+                await db.upsert_simbolos_ejecucion(ejecucion['id'], [
+                    {'simbolo': simbolo, 'estado': estado, 'filas': filas.get(simbolo, 0)}
+                    for simbolo, estado in simbolos.items()
+                ])
+                await db.guardar_ejecucion(ejecucion)
+                logger.info(f"📦 BVC: {procesados}/{len(pendientes)} símbolos procesados")
+            
+            if pendientes and not descargados:
                 logger.warning("⚠️  No se obtuvieron precios de la BVC")
-                return
+                return None
             
-            # 5. Calcular capitalización con acciones en circulación
-            logger.info("💹 Calculando capitalizaciones...")
-            acciones = await db.get_acciones()
-            acciones_dict = {a['codigo']: a['acciones_circulacion'] for a in acciones}
-            
-            for precio in precios:
-                codigo = precio['accion_codigo']
-                if codigo in acciones_dict and acciones_dict[codigo]:
-                    acc_circ = acciones_dict[codigo]
-                    precio['capitalizacion_oficial'] = precio['precio_cierre_usd_oficial'] * acc_circ
-                    precio['capitalizacion_paralelo'] = precio['precio_cierre_usd_paralelo'] * acc_circ
-            
-            # 6. Insertar precios en la base de datos
-            exitos = 0
-            errores = 0
-            
-            for precio in precios:
-                success = await db.insert_precio_bvc(precio)
-                if success:
-                    exitos += 1
-                else:
-                    errores += 1
+            logger.info(
+                f"✅ Actualización BVC completada: {resultado['insertados']} insertados, "
+                f"{resultado['actualizados']} actualizados, {resultado['errores']} errores, "
+                f"{resultado['simbolos_sin_cambios']} símbolos sin cambios"
+            )
+            if 'fechas' not in puntos_control:
+                return resultado
             
-            logger.info(f"✅ Actualización BVC completada: {exitos} exitosos, {errores} errores")
+            # 6. Materializar agregados del mercado y estadísticas por acción
+            # (incluye las fechas escritas antes de la interrupción, si se reanudó)
+            fecha_inicio, fecha_fin = map(date.fromisoformat, puntos_control['fechas'])
+            with medir_etapa('bvc', 'agregados', etapas):
+                resultado['agregados'] = await db.refrescar_agregados(fecha_inicio, fecha_fin)
             
             # 7. Actualizar configuración de última actualización
             await db.update_config('ultima_actualizacion_bvc', datetime.now().isoformat())
             
+            return resultado
+            
         except Exception as e:
             logger.error(f"❌ Error en actualización de precios BVC: {e}")
+            return None
     
-    async def actualizar_tasa_cambio(self):
+    async def actualizar_tasa_cambio(self, ejecucion: Optional[Dict] = None) -> Optional[Dict]:
         """Actualizar solo las tasas de cambio (ejecutar antes de actualizar BVC)"""
+        etapas = ejecucion['etapas'] if ejecucion is not None else {}
         try:
             logger.info("🔄 Actualizando tasas de cambio...")
             
             # Obtener tasa oficial BCV
-            tasa_bcv = bcv_service.get_official_rate()
+            with medir_etapa('tasas', 'tasa_bcv', etapas):
+                tasa_bcv = await asyncio.to_thread(bcv_service.get_official_rate)
             if not tasa_bcv:
                 logger.error("❌ No se pudo obtener tasa oficial BCV")
-                return
+                return None
             
             # Obtener tasa paralelo Binance P2P
-            tasa_paralelo = binance_p2p_service.get_precio_promedio_compra()
-            if not tasa_paralelo:
+            with medir_etapa('tasas', 'tasa_p2p', etapas):
+                p2p = await asyncio.to_thread(binance_p2p_service.get_tasa_paralelo)
+            if not p2p:
                 logger.error("❌ No se pudo obtener tasa paralelo Binance P2P")
+                return None
+            tasa_paralelo = p2p['tasa']
+            
+            # Guardar tasas y snapshot del libro P2P
+            with medir_etapa('tasas', 'guardar_tasas', etapas):
+                success, _ = await asyncio.gather(
+                    db.insert_tasa_cambio(
+                        fecha=date.today(),
+                        tasa_oficial=tasa_bcv['tasa_oficial'],
+                        tasa_paralelo=tasa_paralelo
+                    ),
+                    db.insert_libro_p2p(p2p)
+                )
+            
+            if not success:
+                return None
+            
+            logger.info(f"✅ Tasas actualizadas - Oficial: {tasa_bcv['tasa_oficial']:.2f}, Paralelo: {tasa_paralelo:.2f}")
+            return {
+                'tasa_oficial': tasa_bcv['tasa_oficial'],
+                'tasa_paralelo': tasa_paralelo,
+                'metodo_paralelo': p2p['metodo'],
+                'tasas_paralelo': p2p['tasas']
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Error al actualizar tasas de cambio: {e}")
+            return None
+    
+    async def muestrear_tasas_intradia(self):
+        """Guardar una muestra de las cotizaciones en vivo en la serie intradía.
+        
+        Reutiliza los valores del monitor de cotizaciones y solo consulta las
+        fuentes si son más antiguos que el intervalo de muestreo. Una fuente
+        que no se pudo refrescar se guarda como nula, no con el último valor.
+        """
+        try:
+            intervalo = settings.tasas_intradia_muestreo_segundos
+            # Cada instancia tiene su propio intervalo; la que conserva el lease
+            # (1,5 intervalos, se renueva en cada muestra) es la única que muestrea
+            if not await self._tomar_bloqueo('muestreo_intradia', int(intervalo * 1.5)):
                 return
             
-            # Guardar tasas
-            success = await db.insert_tasa_cambio(
-                fecha=date.today(),
-                tasa_oficial=tasa_bcv['tasa_oficial'],
-                tasa_paralelo=tasa_paralelo
+            cotizaciones = await monitor_cotizaciones.get_actuales(max_edad_segundos=intervalo)
+            valores = {
+                fuente: c['valor'] if c['edad_segundos'] is not None and c['edad_segundos'] <= intervalo else None
+                for fuente, c in cotizaciones.items()
+            }
+            if all(v is None for v in valores.values()):
+                logger.warning("⚠️  Sin cotizaciones recientes, no se guarda muestra intradía")
+                return
+            
+            await db.insert_tasa_intradia(
+                capturado_en=datetime.now(self.timezone).replace(tzinfo=None),
+                tasa_oficial=valores['oficial'],
+                tasa_paralelo=valores['paralelo']
             )
+        except Exception as e:
+            logger.error(f"❌ Error al muestrear tasas intradía: {e}")
+    
+    async def compactar_tasas_intradia(self):
+        """Resumir la serie intradía en velas OHLC y aplicar la retención"""
+        if not await self._tomar_bloqueo('compactacion_intradia', 30 * 60):
+            return
+        borradas = await db.compactar_tasas_intradia()
+        if borradas is not None:
+            logger.info(f"🗜️  Tasas intradía compactadas ({borradas} muestras fuera de retención)")
+    
+    async def backfill_historico(
+        self,
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None,
+        ejecucion: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """Reconstruir el histórico completo de precios BVC.
+        
+        Conserva todas las filas descargadas de la BVC, convierte cada una con
+        la tasa de cambio de su propia fecha y las escribe en lotes, informando
+        el progreso en el registro de la ejecución.
+        """
+        etapas = ejecucion['etapas'] if ejecucion is not None else {}
+        try:
+            logger.info(f"🔄 Iniciando backfill histórico BVC ({fecha_inicio or 'inicio'} → {fecha_fin or 'hoy'})...")
+            
+            # 1. Tasas de cambio registradas para el rango, con margen hacia atrás para que
+            # las primeras sesiones (tras un fin de semana o feriado) encuentren la tasa anterior
+            desde = fecha_inicio - timedelta(days=bvc_service.DIAS_TOLERANCIA_TASA) if fecha_inicio else None
+            with medir_etapa('backfill', 'tasas', etapas):
+                tasas = await db.get_tasas_cambio(desde, fecha_fin)
+            if not tasas:
+                logger.error("❌ No hay tasas de cambio registradas para el rango solicitado")
+                return None
+            logger.info(f"📊 {len(tasas)} tasas de cambio disponibles")
+            
+            # 2. Histórico completo de la BVC, convertido con la tasa de cada fecha
+            with medir_etapa('backfill', 'descarga_bvc', etapas):
+                precios = await asyncio.to_thread(
+                    bvc_service.get_precios_historicos, tasas, fecha_inicio, fecha_fin
+                )
+            if not precios:
+                logger.warning("⚠️  No se obtuvieron precios históricos de la BVC")
+                return None
+            
+            # 3. Capitalizaciones
+            with medir_etapa('backfill', 'capitalizacion', etapas):
+                await self._calcular_capitalizaciones(precios)
+            
+            # 4. Escritura en lotes con progreso
+            resultado = {
+                'filas_totales': len(precios), 'insertados': 0, 'actualizados': 0, 'errores': 0, 'descartados': 0
+            }
+            tamano_lote = db.TAMANO_LOTE
             
-            if success:
-                logger.info(f"✅ Tasas actualizadas - Oficial: {tasa_bcv['tasa_oficial']:.2f}, Paralelo: {tasa_paralelo:.2f}")
+            for i in range(0, len(precios), tamano_lote):
+                with medir_etapa('backfill', 'escritura_db', etapas):
+                    escritura = await db.upsert_precios_bvc(precios[i:i + tamano_lote])
+                for clave in ('insertados', 'actualizados', 'errores', 'descartados'):
+                    resultado[clave] += escritura[clave]
+                
+                procesadas = min(i + tamano_lote, len(precios))
+                if ejecucion is not None:
+                    ejecucion['progreso'] = {
+                        'filas_procesadas': procesadas,
+                        'filas_totales': len(precios),
+                        'porcentaje': round(100 * procesadas / len(precios), 1)
+                    }
+                logger.info(f"📦 Backfill: {procesadas}/{len(precios)} filas ({100 * procesadas / len(precios):.0f}%)")
+            
+            # 5. Agregados diarios de todo el rango reconstruido
+            fechas = [p['fecha'] for p in precios]
+            with medir_etapa('backfill', 'agregados', etapas):
+                resultado['agregados'] = await db.refrescar_agregados(min(fechas), max(fechas))
+            
+            logger.info(
+                f"✅ Backfill completado: {resultado['insertados']} insertados, "
+                f"{resultado['actualizados']} actualizados, {resultado['errores']} errores"
+            )
+            return resultado
             
         except Exception as e:
-            logger.error(f"❌ Error al actualizar tasas de cambio: {e}")
+            logger.error(f"❌ Error en backfill histórico BVC: {e}")
+            return None
+    
+    async def sincronizar_espejo(
+        self,
+        ejecucion: Optional[Dict] = None,
+        desde: Optional[date] = None
+    ) -> Optional[Dict]:
+        """Copiar precios_bvc y tasas_cambio al espejo local en Parquet.
+        
+        Sin `desde` se copian las tablas completas y el espejo queda marcado
+        como sincronizado; con `desde` solo se refrescan las filas a partir de
+        esa fecha (lo usan las instancias que siguen ejecuciones ajenas).
+        """
+        if not almacen_local.habilitado:
+            logger.warning("⚠️  Espejo local deshabilitado (ALMACEN_LOCAL_DIR no definido)")
+            return None
+        
+        try:
+            logger.info(f"🗄️  Sincronizando espejo local en {almacen_local.directorio} desde {desde or 'el inicio'}...")
+            resultado = {'precios': 0, 'tasas': 0}
+            version = datetime.now()
+            
+            # Cada archivo del espejo se escribe una sola vez: las tasas completas y los
+            # precios año por año (las páginas llegan ordenadas por fecha)
+            tasas = []
+            async for pagina in db.leer_paginado('tasas_cambio', 'fecha,tasa_oficial,tasa_paralelo', desde=desde):
+                tasas.extend(pagina)
+            resultado['tasas'] = await asyncio.to_thread(almacen_local.escribir_tasas, tasas)
+            
+            filas_anio = []
+            leidas = 0
+            async for pagina in db.leer_paginado('precios_bvc', orden=('fecha', 'accion_codigo'), desde=desde):
+                for fila in pagina:
+                    if filas_anio and fila['fecha'][:4] != filas_anio[0]['fecha'][:4]:
+                        resultado['precios'] += await asyncio.to_thread(almacen_local.escribir_precios, filas_anio)
+                        filas_anio = []
+                    filas_anio.append(fila)
+                leidas += len(pagina)
+                if ejecucion is not None:
+                    ejecucion['progreso'] = {'filas_procesadas': leidas}
+            resultado['precios'] += await asyncio.to_thread(almacen_local.escribir_precios, filas_anio)
+            
+            if desde is None:
+                almacen_local.marcar_sincronizado(version)
+                # El seguimiento de otras instancias continúa desde el inicio de esta copia
+                self._seguimiento_hasta = None
+                self._ejecuciones_aplicadas = {}
+            logger.info(f"✅ Espejo local sincronizado: {resultado['precios']} precios, {resultado['tasas']} tasas")
+            return resultado
+            
+        except Exception as e:
+            logger.error(f"❌ Error al sincronizar el espejo local: {e}")
+            return None
+    
+    # ==================== EJECUCIONES EN SEGUNDO PLANO ====================
+    
+    def _funciones_tareas(self) -> Dict[str, Callable[..., Awaitable[Optional[Dict]]]]:
+        """Corrutinas de actualización disponibles por nombre de tarea"""
+        return {
+            'bvc': self.actualizar_precios_bvc,
+            'tasas': self.actualizar_tasa_cambio,
+            'backfill': self.backfill_historico,
+            'espejo': self.sincronizar_espejo
+        }
+    
+    def _registrar_ejecucion(self, tarea: str, parametros: Dict) -> Dict:
+        """Crear el registro de estado de una ejecución"""
+        ejecucion = {
+            'id': uuid4().hex[:12],
+            'tarea': tarea,
+            'parametros': parametros,
+            'instancia': self.instancia,
+            'estado': 'en_curso',
+            'inicio': datetime.now().isoformat(),
+            'fin': None,
+            'duracion_segundos': None,
+            'etapas': {},
+            'progreso': None,
+            'resultado': None,
+            'puntos_control': {},
+            'reanuda': None
+        }
+        self.ejecuciones[ejecucion['id']] = ejecucion
+        while len(self.ejecuciones) > self.MAX_EJECUCIONES_REGISTRADAS:
+            self.ejecuciones.popitem(last=False)
+        return ejecucion
+    
+    async def _correr_ejecucion(self, ejecucion: Dict):
+        """Ejecutar una tarea registrada y actualizar su estado al terminar"""
+        inicio = time.perf_counter()
+        renovacion = None
+        try:
+            tarea = ejecucion['tarea']
+            if tarea in self.TAREAS_CON_BLOQUEO:
+                if not await self._tomar_bloqueo(tarea, settings.bloqueo_tareas_segundos):
+                    logger.info(f"⏭️  {tarea} la está ejecutando otra instancia, se omite")
+                    ejecucion['estado'] = 'omitida'
+                    ejecucion['resultado'] = {'motivo': 'bloqueo tomado por otra instancia'}
+                    return
+                renovacion = asyncio.create_task(self._renovar_bloqueo(tarea, settings.bloqueo_tareas_segundos))
+            await db.guardar_ejecucion(ejecucion)
+            
+            funcion = self._funciones_tareas()[tarea]
+            resultado = await funcion(ejecucion=ejecucion, **ejecucion['parametros'])
+            ejecucion['resultado'] = resultado
+            if resultado is None:
+                ejecucion['estado'] = 'fallida'
+            elif resultado.get('simbolos_fallidos') or resultado.get('errores'):
+                # Escribió datos pero no todos: queda visible y la próxima ejecución la reanuda
+                ejecucion['estado'] = 'parcial'
+            else:
+                ejecucion['estado'] = 'completada'
+            if resultado is not None:
+                # Los datos cambiaron: las respuestas cacheadas ya no son válidas
+                cache_respuestas.invalidar()
+                await self._notificar_clientes(ejecucion)
+        except Exception as e:
+            logger.error(f"❌ Error en ejecución {ejecucion['id']}: {e}")
+            ejecucion['estado'] = 'fallida'
+            ejecucion['resultado'] = {'error': str(e)}
+        finally:
+            if renovacion is not None:
+                renovacion.cancel()
+                await self._tomar_bloqueo(ejecucion['tarea'], self.RETENCION_BLOQUEO_SEGUNDOS)
+            ejecucion['fin'] = datetime.now().isoformat()
+            ejecucion['duracion_segundos'] = round(time.perf_counter() - inicio, 3)
+            EJECUCIONES.labels(ejecucion['tarea'], ejecucion['estado']).inc()
+            EJECUCION_DURACION.labels(ejecucion['tarea']).observe(ejecucion['duracion_segundos'])
+            self._tareas.pop(ejecucion['tarea'], None)
+            if ejecucion['estado'] != 'omitida':
+                await db.guardar_ejecucion(ejecucion)
+                if ejecucion['tarea'] == 'bvc':
+                    await self._guardar_resumen_ejecucion(ejecucion)
+    
+    async def _guardar_resumen_ejecucion(self, ejecucion: Dict):
+        """Guardar duración y desglose por etapa de la última actualización BVC"""
+        try:
+            resumen = {
+                clave: ejecucion[clave]
+                for clave in ('id', 'estado', 'inicio', 'fin', 'duracion_segundos', 'etapas', 'resultado')
+            }
+            await db.update_config('ultima_ejecucion_bvc', json.dumps(resumen, default=str))
+        except Exception as e:
+            logger.error(f"❌ Error al guardar el resumen de la ejecución {ejecucion['id']}: {e}")
+    
+    async def _notificar_clientes(self, ejecucion: Dict):
+        """Enviar a los dashboards conectados los cambios producidos por una ejecución"""
+        try:
+            if ejecucion['tarea'] in ('bvc', 'backfill'):
+                await bus_eventos.publicar_resumen()
+                bus_eventos.publicar('actualizacion', {
+                    'ultima_actualizacion_bvc': datetime.now().isoformat()
+                })
+        except Exception as e:
+            logger.error(f"❌ Error al notificar a los clientes: {e}")
+    
+    @staticmethod
+    def _fecha_desde_ejecucion(ejecucion: Dict) -> Optional[date]:
+        """Fecha más antigua que pudo escribir una ejecución (None: cualquiera)"""
+        hoy = date.fromisoformat(ejecucion['fin'][:10])
+        if ejecucion['tarea'] == 'bvc':
+            fechas = (ejecucion.get('puntos_control') or {}).get('fechas')
+            return min(date.fromisoformat(fechas[0]), hoy) if fechas else hoy
+        if ejecucion['tarea'] == 'backfill':
+            fecha_inicio = (ejecucion.get('parametros') or {}).get('fecha_inicio')
+            return date.fromisoformat(str(fecha_inicio)[:10]) if fecha_inicio else None
+        return hoy
+    
+    async def seguir_ejecuciones(self):
+        """Aplicar en esta instancia los cambios de las ejecuciones terminadas en otras.
+        
+        Con varias instancias solo la que toma el bloqueo ejecuta bvc, tasas y
+        backfill, y solo ella actualiza su espejo, su caché y sus clientes SSE.
+        Las demás revisan el historial de ejecuciones: refrescan el espejo desde
+        la fecha más antigua que tocó cada ejecución, vacían la caché de
+        respuestas y avisan a sus dashboards conectados.
+        """
+        try:
+            if self._seguimiento_hasta is None:
+                self._seguimiento_hasta = almacen_local.version or datetime.now()
+            desde = self._seguimiento_hasta - timedelta(seconds=self.MARGEN_SEGUIMIENTO_SEGUNDOS)
+            nuevas = [
+                e for e in await db.get_ejecuciones_terminadas(desde)
+                if e['id'] not in self._ejecuciones_aplicadas
+            ]
+            if not nuevas:
+                return
+            
+            ajenas = [e for e in nuevas if e['instancia'] != self.instancia]
+            if ajenas:
+                logger.info(f"🔁 Aplicando {len(ajenas)} ejecuciones de otras instancias")
+                if almacen_local.sincronizado:
+                    fechas = [self._fecha_desde_ejecucion(e) for e in ajenas]
+                    desde_espejo = None if None in fechas else min(fechas)
+                    if await self.sincronizar_espejo(desde=desde_espejo) is None:
+                        # Se reintenta en la próxima revisión
+                        return
+                cache_respuestas.invalidar()
+                for tarea in ('bvc', 'backfill'):
+                    ultima = next((e for e in reversed(ajenas) if e['tarea'] == tarea), None)
+                    if ultima is not None:
+                        await self._notificar_clientes(ultima)
+                        break
+            
+            fines = {e['id']: datetime.fromisoformat(e['fin']) for e in nuevas}
+            self._seguimiento_hasta = max(self._seguimiento_hasta, *fines.values())
+            if almacen_local.sincronizado:
+                almacen_local.marcar_sincronizado(self._seguimiento_hasta)
+            # Solo hace falta recordar las ejecuciones que entran en el margen
+            limite = self._seguimiento_hasta - timedelta(seconds=self.MARGEN_SEGUIMIENTO_SEGUNDOS)
+            self._ejecuciones_aplicadas = {
+                id_: fin for id_, fin in {**self._ejecuciones_aplicadas, **fines}.items() if fin > limite
+            }
+        except Exception as e:
+            logger.error(f"❌ Error al seguir las ejecuciones de otras instancias: {e}")
+    
+    def lanzar(self, tarea: str = "bvc", **parametros) -> Dict:
+        """Lanzar una tarea en segundo plano y devolver su registro de estado.
+        
+        Si ya hay una ejecución en curso de la misma tarea, se devuelve esa en
+        lugar de iniciar otra. Las tareas desconocidas (p. ej. "todo") ejecutan
+        la actualización BVC.
+        """
+        if tarea not in self._funciones_tareas():
+            tarea = "bvc"
+        en_curso = self._tareas.get(tarea)
+        if en_curso is not None and not en_curso.done():
+            return next(e for e in reversed(self.ejecuciones.values()) if e['tarea'] == tarea)
+        
+        ejecucion = self._registrar_ejecucion(tarea, parametros)
+        self._tareas[tarea] = asyncio.create_task(self._correr_ejecucion(ejecucion))
+        return ejecucion
+    
+    def get_ejecucion(self, ejecucion_id: str) -> Optional[Dict]:
+        """Obtener el estado de una ejecución registrada"""
+        return self.ejecuciones.get(ejecucion_id)
+    
+    async def _reanudar_interrumpida(self):
+        """Relanzar la actualización BVC de hoy si el proceso murió con ella en curso.
+        
+        El lease del proceso muerto sigue vigente hasta que expira, así que
+        mientras el relanzamiento se omita por el bloqueo se reintenta cada
+        tercio del lease, hasta que haya tenido tiempo de expirar. Si la
+        instancia de la ejecución renueva su lease entre dos intentos, sigue
+        viva y no se reanuda.
+        """
+        segundos = settings.bloqueo_tareas_segundos
+        limite = time.monotonic() + segundos * 4 / 3
+        vencimiento_visto = None
+        while True:
+            previa = await self._ejecucion_reanudable()
+            if previa is None or previa['estado'] in ('fallida', 'parcial'):
+                return
+            bloqueo = await db.get_bloqueo('bvc')
+            if bloqueo is not None and bloqueo['titular'] == previa['instancia']:
+                if vencimiento_visto is not None and bloqueo['expira_en'] != vencimiento_visto:
+                    logger.info(f"⏩ La ejecución BVC {previa['id']} sigue en curso en {previa['instancia']}, no se reanuda")
+                    return
+                vencimiento_visto = bloqueo['expira_en']
+            logger.info(f"⏯️  La ejecución BVC {previa['id']} quedó interrumpida, se reanuda")
+            ejecucion = await self.ejecutar_ahora('bvc')
+            if ejecucion['estado'] != 'omitida' or time.monotonic() >= limite:
+                return
+            logger.info(f"⏳ El bloqueo de bvc sigue vigente, se reintenta la reanudación en {segundos / 3:.0f}s")
+            await asyncio.sleep(segundos / 3)
+    
+    async def ejecutar_programada(self, tarea: str):
+        """Punto de entrada de los trabajos programados"""
+        ejecucion = await self.ejecutar_ahora(tarea)
+        logger.info(f"📋 Ejecución programada {ejecucion['id']} ({tarea}): {ejecucion['estado']}")
     
     def start(self):
         """Iniciar el programador de tareas"""
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+        
         try:
             # Obtener hora de actualización desde configuración
             hora, minuto = settings.hora_actualizacion_bvc.split(':')
+            hora_tasas = datetime(2000, 1, 1, int(hora), int(minuto)) - timedelta(minutes=10)
             
             # Programar actualización de tasas 10 minutos antes
             self.scheduler.add_job(
-                self.actualizar_tasa_cambio,
-                CronTrigger(hour=int(hora), minute=int(minuto)-10, timezone=self.timezone),
+                self.ejecutar_programada,
+                CronTrigger(hour=hora_tasas.hour, minute=hora_tasas.minute, timezone=self.timezone),
+                args=['tasas'],
                 id='actualizar_tasas',
                 name='Actualizar tasas de cambio',
                 replace_existing=True
@@ -136,39 +784,96 @@ class UpdateScheduler:
             
             # Programar actualización BVC de lunes a viernes a las 5 PM
             self.scheduler.add_job(
-                self.actualizar_precios_bvc,
+                self.ejecutar_programada,
                 CronTrigger(
                     day_of_week='mon-fri',  # Solo días laborables
                     hour=int(hora), 
                     minute=int(minuto), 
                     timezone=self.timezone
                 ),
+                args=['bvc'],
                 id='actualizar_bvc',
                 name='Actualizar precios BVC',
                 replace_existing=True
             )
             logger.info(f"📅 Programada actualización BVC L-V a las {settings.hora_actualizacion_bvc}")
             
+            # Revisiones adicionales: con la ingesta incremental solo escriben correcciones
+            for revision in filter(None, (h.strip() for h in settings.bvc_revisiones.split(','))):
+                hora_rev, minuto_rev = revision.split(':')
+                self.scheduler.add_job(
+                    self.ejecutar_programada,
+                    CronTrigger(
+                        day_of_week='mon-fri',
+                        hour=int(hora_rev),
+                        minute=int(minuto_rev),
+                        timezone=self.timezone
+                    ),
+                    args=['bvc'],
+                    id=f'revisar_bvc_{hora_rev}{minuto_rev}',
+                    name=f'Revisar precios BVC ({revision})',
+                    replace_existing=True
+                )
+                logger.info(f"📅 Programada revisión BVC L-V a las {revision}")
+            
+            # Serie intradía de tasas: muestreo periódico y compactación cada hora
+            if settings.tasas_intradia_muestreo_segundos > 0:
+                self.scheduler.add_job(
+                    self.muestrear_tasas_intradia,
+                    IntervalTrigger(seconds=settings.tasas_intradia_muestreo_segundos, timezone=self.timezone),
+                    id='muestrear_tasas_intradia',
+                    name='Muestrear tasas intradía',
+                    replace_existing=True
+                )
+                self.scheduler.add_job(
+                    self.compactar_tasas_intradia,
+                    CronTrigger(minute=7, timezone=self.timezone),
+                    id='compactar_tasas_intradia',
+                    name='Compactar tasas intradía',
+                    replace_existing=True
+                )
+                logger.info(f"📅 Programado muestreo de tasas cada {settings.tasas_intradia_muestreo_segundos}s")
+            
+            # Las ejecuciones de otras instancias se aplican aquí al espejo, la caché y los clientes SSE
+            if settings.seguimiento_ejecuciones_segundos > 0:
+                self.scheduler.add_job(
+                    self.seguir_ejecuciones,
+                    IntervalTrigger(seconds=settings.seguimiento_ejecuciones_segundos, timezone=self.timezone),
+                    id='seguir_ejecuciones',
+                    name='Seguir ejecuciones de otras instancias',
+                    replace_existing=True
+                )
+                logger.info(f"📅 Programado seguimiento de ejecuciones cada {settings.seguimiento_ejecuciones_segundos}s")
+            
             # Iniciar el scheduler
             self.scheduler.start()
             logger.info("✅ Scheduler iniciado correctamente")
             
+            # Copia inicial del espejo local; después se mantiene con cada ejecución
+            if almacen_local.habilitado and not almacen_local.sincronizado:
+                self.lanzar('espejo')
+            
+            # Una actualización BVC cortada por un reinicio continúa desde su último lote
+            self._reanudacion = asyncio.create_task(self._reanudar_interrumpida())
+            
         except Exception as e:
             logger.error(f"❌ Error al iniciar scheduler: {e}")
     
     def shutdown(self):
         """Detener el programador"""
-        self.scheduler.shutdown()
+        if self._reanudacion is not None:
+            self._reanudacion.cancel()
+        if self._programador is not None and self._programador.running:
+            self._programador.shutdown()
         logger.info("🛑 Scheduler detenido")
     
-    async def ejecutar_ahora(self, tarea: str = "todo"):
-        """Ejecutar una tarea de actualización inmediatamente (para testing)"""
-        if tarea == "bvc":
-            await self.actualizar_precios_bvc()
-        elif tarea == "tasas":
-            await self.actualizar_tasa_cambio()
-        else:
-            await self.actualizar_precios_bvc()
+    async def ejecutar_ahora(self, tarea: str = "todo", **parametros) -> Dict:
+        """Ejecutar una tarea de actualización inmediatamente y esperar a que termine"""
+        ejecucion = self.lanzar(tarea, **parametros)
+        tarea_activa = self._tareas.get(ejecucion['tarea'])
+        if tarea_activa is not None:
+            await tarea_activa
+        return ejecucion
 
 
 # Instancia global del scheduler
@@ -1,12 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import numpy as np
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from agregacion_p2p import COMPRA, VENTA, METODOS, calcular_tasas
+from http_cliente import cliente_http
+from metricas import SIMBOLO_DURACION, medir_etapa
+import hashlib
+import random
 import time
 import logging
 
+# pandas, numpy, BeautifulSoup y lxml se importan dentro de los métodos que los
+# usan: solo la ingesta y el parseo del BCV los necesitan, no el arranque de la API
+if TYPE_CHECKING:
+    import pandas as pd
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -24,78 +32,161 @@ class BinanceP2PService:
         "Referer": "https://p2p.binance.com/es"
     }
     
+    LADOS = (COMPRA, VENTA)
+    
+    def __init__(
+        self,
+        paginas: Optional[int] = None,
+        filas_por_pagina: Optional[int] = None,
+        metodos_pago: Optional[List[str]] = None,
+        agregacion: Optional[str] = None
+    ):
+        self.paginas = paginas or settings.p2p_paginas
+        self.filas_por_pagina = filas_por_pagina or settings.p2p_filas_por_pagina
+        if metodos_pago is None:
+            metodos_pago = [m.strip() for m in settings.p2p_metodos_pago.split(',') if m.strip()]
+        self.metodos_pago = metodos_pago
+        self.agregacion = agregacion or settings.p2p_agregacion
+        if self.agregacion not in METODOS:
+            logger.warning(f"Agregación P2P desconocida '{self.agregacion}', se usa top5")
+            self.agregacion = 'top5'
+    
+    def _normalizar_oferta(self, it: Dict, lado: str, pagina: int) -> Dict:
+        adv = it.get("adv", {}) or {}
+        advr = it.get("advertiser", {}) or {}
+        price = adv.get("price")
+        vol = adv.get("surplusAmount") or adv.get("tradableQuantity")
+        
+        return {
+            "id": adv.get("advNo"),
+            "price": float(price) if price else None,
+            "volume_usdt": float(vol) if vol else None,
+            "minVES": float(adv.get("minSingleTransAmount")) if adv.get("minSingleTransAmount") else None,
+            "maxVES": float(adv.get("maxSingleTransAmount")) if adv.get("maxSingleTransAmount") else None,
+            "merchant": advr.get("nickName") or advr.get("userNo"),
+            "payments": [m.get("tradeMethodName") for m in (adv.get("tradeMethods") or []) if m.get("tradeMethodName")],
+            "source": {"endpoint": "friendly", "tradeType": lado, "page": pagina}
+        }
+    
+    def _buscar_pagina(self, lado: str, pagina: int, metodos_pago: Optional[List[str]] = None) -> List[Dict]:
+        """Una página de anuncios USDT/VES de un lado del libro. Lanza excepción si falla"""
+        payload = {
+            "asset": "USDT",
+            "fiat": "VES",
+            "tradeType": lado,
+            "page": pagina,
+            "rows": self.filas_por_pagina,
+            "payTypes": self.metodos_pago if metodos_pago is None else metodos_pago,
+            "publisherType": None,
+            "merchantCheck": False
+        }
+        
+        r = cliente_http.post(self.FRIENDLY_URL, json=payload, headers=self.HEADERS, timeout=15)
+        r.raise_for_status()
+        j = r.json()
+        
+        return [self._normalizar_oferta(it, lado, pagina) for it in (j.get("data") or [])]
+    
     def get_top5_usdt_ves(self) -> List[Dict]:
         """Obtener top 5 ofertas USDT/VES en Binance P2P"""
         try:
-            payload = {
-                "asset": "USDT",
-                "fiat": "VES",
-                "tradeType": "BUY",
-                "page": 1,
-                "rows": 20,
-                "payTypes": [],
-                "publisherType": None,
-                "merchantCheck": False
-            }
-            
-            with requests.Session() as s:
-                s.trust_env = False
-                s.headers.update(self.HEADERS)
-                r = s.post(self.FRIENDLY_URL, json=payload, timeout=15)
-                r.raise_for_status()
-                j = r.json()
-                
-                data = (j.get("data") or [])[:5]
-                out = []
-                
-                for it in data:
-                    adv = it.get("adv", {}) or {}
-                    advr = it.get("advertiser", {}) or {}
-                    price = adv.get("price")
-                    vol = adv.get("surplusAmount") or adv.get("tradableQuantity")
-                    
-                    out.append({
-                        "price": float(price) if price else None,
-                        "volume_usdt": float(vol) if vol else None,
-                        "minVES": float(adv.get("minSingleTransAmount")) if adv.get("minSingleTransAmount") else None,
-                        "maxVES": float(adv.get("maxSingleTransAmount")) if adv.get("maxSingleTransAmount") else None,
-                        "merchant": advr.get("nickName") or advr.get("userNo"),
-                        "payments": [m.get("tradeMethodName") for m in (adv.get("tradeMethods") or []) if m.get("tradeMethodName")],
-                        "source": {"endpoint": "friendly", "tradeType": "BUY"}
-                    })
-                
-                return out
-                
+            return self._buscar_pagina(COMPRA, 1, metodos_pago=[])[:5]
         except Exception as e:
             logger.error(f"Error al obtener precio Binance P2P: {e}")
             return []
     
-    def get_precio_promedio_compra(self) -> Optional[float]:
-        """Calcular precio promedio de compra ponderado por volumen"""
+    def get_libro_ordenes(self) -> Optional[Dict]:
+        """Descargar en paralelo varias páginas de compra y venta filtradas por método de pago.
+        
+        Las páginas se piden a la vez, así que el libro completo tarda lo mismo
+        que una sola petición. Los anuncios repetidos entre páginas (el libro
+        se mueve mientras se consulta) se descartan. Devuelve None si no se
+        pudo descargar ninguna página.
+        """
+        peticiones = [(lado, pagina) for lado in self.LADOS for pagina in range(1, self.paginas + 1)]
+        
+        def descargar(peticion):
+            try:
+                return self._buscar_pagina(*peticion)
+            except Exception as e:
+                logger.error(f"Error en página {peticion[1]} ({peticion[0]}) de Binance P2P: {e}")
+                return None
+        
+        capturado_en = datetime.now()
+        with ThreadPoolExecutor(max_workers=len(peticiones), thread_name_prefix="p2p") as executor:
+            resultados = list(executor.map(descargar, peticiones))
+        
+        fallidas = sum(1 for r in resultados if r is None)
+        if fallidas == len(peticiones):
+            logger.error("No se pudo descargar ninguna página de Binance P2P")
+            return None
+        
+        libro = {lado: [] for lado in self.LADOS}
+        vistos = set()
+        for (lado, _), ofertas in zip(peticiones, resultados):
+            for oferta in ofertas or []:
+                clave = (lado, oferta['id'])
+                if oferta['id'] is None or clave not in vistos:
+                    vistos.add(clave)
+                    libro[lado].append(oferta)
+        
+        # Mejor oferta primero: la compra más barata y la venta más cara
+        libro[COMPRA].sort(key=lambda o: o['price'] or float('inf'))
+        libro[VENTA].sort(key=lambda o: -(o['price'] or 0))
+        
+        return {
+            **libro,
+            'capturado_en': capturado_en,
+            'metodos_pago': self.metodos_pago,
+            'paginas': self.paginas,
+            'paginas_fallidas': fallidas
+        }
+    
+    def get_tasa_paralelo(self, agregacion: Optional[str] = None) -> Optional[Dict]:
+        """Tasa paralelo calculada sobre el libro completo con el método configurado.
+        
+        Devuelve la tasa elegida, el método usado, las tasas de todos los
+        métodos y el libro descargado (para guardarlo como snapshot). Si el
+        método elegido no puede calcularse (por ejemplo, sin ofertas de venta)
+        se usa top5.
+        """
         try:
-            ofertas = self.get_top5_usdt_ves()
-            if not ofertas:
+            libro = self.get_libro_ordenes()
+            if not libro:
                 return None
             
-            # Calcular promedio ponderado por volumen
-            total_volumen = sum(o['volume_usdt'] for o in ofertas if o['volume_usdt'])
-            if total_volumen == 0:
-                # Si no hay volumen, usar promedio simple
-                precios = [o['price'] for o in ofertas if o['price']]
-                return sum(precios) / len(precios) if precios else None
-            
-            precio_ponderado = sum(
-                o['price'] * o['volume_usdt'] 
-                for o in ofertas 
-                if o['price'] and o['volume_usdt']
-            ) / total_volumen
+            tasas = calcular_tasas(
+                libro,
+                recorte=settings.p2p_recorte,
+                profundidad_usdt=settings.p2p_profundidad_usdt
+            )
+            metodo = agregacion or self.agregacion
+            if tasas.get(metodo) is None and metodo != 'top5':
+                logger.warning(f"Sin tasa P2P con el método {metodo}, se usa top5")
+                metodo = 'top5'
+            if tasas.get(metodo) is None:
+                logger.error("Libro de Binance P2P sin ofertas de compra")
+                return None
             
-            logger.info(f"Precio promedio P2P calculado: {precio_ponderado:.2f} VES/USDT")
-            return precio_ponderado
+            logger.info(
+                f"Tasa P2P ({metodo}): {tasas[metodo]:.2f} VES/USDT sobre "
+                f"{len(libro[COMPRA])} ofertas de compra y {len(libro[VENTA])} de venta"
+            )
+            return {
+                'tasa': tasas[metodo],
+                'metodo': metodo,
+                'tasas': tasas,
+                'libro': libro
+            }
             
         except Exception as e:
-            logger.error(f"Error al calcular precio promedio P2P: {e}")
+            logger.error(f"Error al calcular tasa paralelo P2P: {e}")
             return None
+    
+    def get_precio_promedio_compra(self) -> Optional[float]:
+        """Tasa paralelo con la agregación configurada (por defecto, VWAP de las 5 mejores ofertas)"""
+        resultado = self.get_tasa_paralelo()
+        return resultado['tasa'] if resultado else None
 
 
 class BCVService:
@@ -103,6 +194,108 @@ class BCVService:
     
     BCV_URL = "https://www.bcv.org.ve/estadisticas/tasa-de-cambio"
     
+    # Inicio del contenedor de la tabla de tasas en el HTML del BCV
+    MARCA_CONTENEDOR = b'view-content'
+    
+    def _celdas_rapido(self, contenido: bytes) -> Optional[List[str]]:
+        """Celdas de la primera fila de la tabla con lxml, sin construir el árbol de toda la página.
+        
+        Solo se parsea el fragmento entre el contenedor view-content y el
+        primer </table> siguiente. Devuelve None si el fragmento no tiene la
+        forma esperada, para que se use el parser completo.
+        """
+        from lxml import html as lxml_html
+        
+        inicio = contenido.find(self.MARCA_CONTENEDOR)
+        if inicio == -1:
+            return None
+        fin = contenido.find(b'</table>', inicio)
+        if fin == -1:
+            return None
+        inicio = contenido.rfind(b'<div', 0, inicio)
+        
+        fragmento = lxml_html.fragment_fromstring(
+            contenido[inicio:fin + len(b'</table>')].decode('utf-8', errors='replace'),
+            create_parent='div'
+        )
+        fila = fragmento.xpath('.//table//tbody/tr[1]')
+        if not fila:
+            return None
+        celdas = [td.text_content().strip() for td in fila[0].xpath('./td')]
+        return celdas if len(celdas) >= 2 else None
+    
+    def _celdas_completo(self, contenido: bytes) -> Optional[List[str]]:
+        """Celdas de la primera fila de la tabla con BeautifulSoup sobre la página completa"""
+        from bs4 import BeautifulSoup
+        
+        soup = BeautifulSoup(contenido, 'html.parser')
+        data_table_wrapper = soup.find('div', class_='view-content')
+        
+        if not data_table_wrapper:
+            logger.error("No se encontró el contenedor de datos del BCV")
+            return None
+        
+        table = data_table_wrapper.find('table')
+        if not table:
+            logger.error("No se encontró la tabla de datos del BCV")
+            return None
+        
+        first_data_row = table.find('tbody').find('tr')
+        if not first_data_row:
+            logger.error("No se encontró fila de datos en tabla BCV")
+            return None
+        
+        cells = first_data_row.find_all('td')
+        if len(cells) < 2:
+            logger.error("Fila sin suficientes celdas en tabla BCV")
+            return None
+        
+        return [c.get_text(strip=True) for c in cells]
+    
+    def parsear_tasa_oficial(self, contenido: bytes) -> Optional[Dict]:
+        """Extraer fecha y tasa de la página de estadísticas del BCV.
+        
+        Intenta primero la extracción parcial con lxml y, si la estructura
+        cambió o el fragmento no se puede interpretar, recurre a BeautifulSoup
+        sobre el documento completo.
+        """
+        try:
+            cells = self._celdas_rapido(contenido)
+        except Exception as e:
+            logger.warning(f"Extracción rápida de la tasa BCV falló: {e}")
+            cells = None
+        if cells is None:
+            logger.warning("Estructura inesperada en la página del BCV, usando el parser completo")
+            cells = self._celdas_completo(contenido)
+            if cells is None:
+                return None
+        
+        # Extraer fecha y tasa
+        fecha_str_raw = cells[0]
+        tasa_str_raw = cells[1]
+        
+        # Procesar fecha
+        fecha_obj = None
+        for fmt in ('%d-%m-%Y', '%Y-%m-%d'):
+            try:
+                fecha_obj = datetime.strptime(fecha_str_raw, fmt).date()
+                break
+            except ValueError:
+                continue
+        
+        if not fecha_obj:
+            logger.warning(f"Formato de fecha no reconocido: {fecha_str_raw}")
+            fecha_obj = date.today()
+        
+        # Limpiar tasa (eliminar puntos de miles, cambiar coma por punto)
+        tasa_clean = tasa_str_raw.replace('.', '').replace(',', '.')
+        tasa_float = float(tasa_clean)
+        
+        return {
+            'fecha': fecha_obj,
+            'tasa_oficial': tasa_float
+        }
+    
     def get_official_rate(self) -> Optional[Dict]:
         """Obtener tasa oficial del BCV"""
         try:
@@ -112,58 +305,15 @@ class BCVService:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(self.BCV_URL, headers=headers, timeout=10)
+            response = cliente_http.get(self.BCV_URL, headers=headers, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            data_table_wrapper = soup.find('div', class_='view-content')
-            
-            if not data_table_wrapper:
-                logger.error("No se encontró el contenedor de datos del BCV")
-                return None
-            
-            table = data_table_wrapper.find('table')
-            if not table:
-                logger.error("No se encontró la tabla de datos del BCV")
+            tasa = self.parsear_tasa_oficial(response.content)
+            if not tasa:
                 return None
             
-            first_data_row = table.find('tbody').find('tr')
-            if not first_data_row:
-                logger.error("No se encontró fila de datos en tabla BCV")
-                return None
-            
-            cells = first_data_row.find_all('td')
-            if len(cells) < 2:
-                logger.error("Fila sin suficientes celdas en tabla BCV")
-                return None
-            
-            # Extraer fecha y tasa
-            fecha_str_raw = cells[0].get_text(strip=True)
-            tasa_str_raw = cells[1].get_text(strip=True)
-            
-            # Procesar fecha
-            fecha_obj = None
-            for fmt in ('%d-%m-%Y', '%Y-%m-%d'):
-                try:
-                    fecha_obj = datetime.strptime(fecha_str_raw, fmt).date()
-                    break
-                except ValueError:
-                    continue
-            
-            if not fecha_obj:
-                logger.warning(f"Formato de fecha no reconocido: {fecha_str_raw}")
-                fecha_obj = date.today()
-            
-            # Limpiar tasa (eliminar puntos de miles, cambiar coma por punto)
-            tasa_clean = tasa_str_raw.replace('.', '').replace(',', '.')
-            tasa_float = float(tasa_clean)
-            
-            logger.info(f"Tasa oficial BCV obtenida: {tasa_float:.2f} Bs/USD (fecha: {fecha_obj})")
-            
-            return {
-                'fecha': fecha_obj,
-                'tasa_oficial': tasa_float
-            }
+            logger.info(f"Tasa oficial BCV obtenida: {tasa['tasa_oficial']:.2f} Bs/USD (fecha: {tasa['fecha']})")
+            return tasa
             
         except Exception as e:
             logger.error(f"Error al obtener tasa BCV: {e}")
@@ -173,43 +323,159 @@ class BCVService:
 class BVCService:
     """Servicio para extraer datos de la Bolsa de Valores de Caracas"""
     
+    BVC_URL = "https://www.bolsadecaracas.com/wp-admin/admin-ajax.php"
+    
     SIMBOLOS = ['ABC.A', 'ALZ.B', 'BNC', 'BPV', 'BVCC', 'BVL', 'CCR', 'CGQ',
                 'CRM.A', 'DOM', 'EFE', 'ENV', 'FNC', 'GMC.B', 'GZL', 'ICP.B',
                 'IVC.A', 'IVC.B', 'MPA', 'MTC.B', 'MVZ.A', 'MVZ.B', 'PGR', 
                 'PIV.B', 'PTN', 'RST', 'RST.B', 'SVS', 'TDV.D']
     
+    # Días hacia atrás en los que se acepta la última tasa conocida (fines de semana y feriados)
+    DIAS_TOLERANCIA_TASA = 7
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        peticiones_por_segundo: Optional[float] = None,
+        reintentos: Optional[int] = None,
+        backoff_segundos: Optional[float] = None
+    ):
+        self.max_workers = max_workers or settings.bvc_max_workers
+        self.reintentos = settings.bvc_reintentos if reintentos is None else reintentos
+        self.backoff_segundos = settings.bvc_backoff_segundos if backoff_segundos is None else backoff_segundos
+        # El ritmo lo aplica el cliente HTTP (adaptativo, con este máximo) en cada petición a la BVC
+        cliente_http.configurar_ritmo(self.BVC_URL, peticiones_por_segundo or settings.bvc_peticiones_por_segundo)
+    
+    def _peticion_simbolo(self, simbolo: str, cabeceras: Optional[Dict[str, str]] = None):
+        """POST a admin-ajax.php con el histórico de un símbolo. Devuelve la respuesta HTTP"""
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": "https://www.bolsadecaracas.com/historicos/",
+            **(cabeceras or {})
+        }
+        
+        data = {
+            "action": "getHistoricoSimbolo",
+            "simbolo": simbolo
+        }
+        
+        return cliente_http.post(
+            self.BVC_URL,
+            headers=headers,
+            data=data,
+            timeout=15
+        )
+    
     def obtener_datos_desnudos(self, simbolo: str) -> Optional[Dict]:
         """Extraer datos desde la API de la BVC"""
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://www.bolsadecaracas.com/historicos/"
-            }
+            response = self._peticion_simbolo(simbolo)
             
-            data = {
-                "action": "getHistoricoSimbolo",
-                "simbolo": simbolo
-            }
+            if response.status_code != 200:
+                logger.error(f"Error en respuesta BVC para {simbolo}: {response.status_code}")
+                return None
             
-            response = requests.post(
-                "https://www.bolsadecaracas.com/wp-admin/admin-ajax.php",
-                headers=headers,
-                data=data,
-                timeout=15
-            )
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error procesando {simbolo}: {e}")
+            return None
+    
+    def obtener_datos_si_cambiaron(self, simbolo: str, estado: Optional[Dict] = None) -> Optional[Dict]:
+        """Descargar un símbolo solo si su contenido cambió desde la última ingesta.
+        
+        Envía If-None-Match / If-Modified-Since cuando la BVC devolvió ETag o
+        Last-Modified, y compara el hash SHA-256 del cuerpo con el guardado en
+        estado_ingesta. Devuelve {'sin_cambios': True, ...} si no hay nada
+        nuevo, el payload con sus validadores si cambió, o None si falla.
+        """
+        estado = estado or {}
+        try:
+            cabeceras = {}
+            if estado.get('etag'):
+                cabeceras['If-None-Match'] = estado['etag']
+            if estado.get('last_modified'):
+                cabeceras['If-Modified-Since'] = estado['last_modified']
+            
+            response = self._peticion_simbolo(simbolo, cabeceras)
             
+            if response.status_code == 304:
+                return {'sin_cambios': True, 'hash_contenido': estado.get('hash_contenido')}
             if response.status_code != 200:
                 logger.error(f"Error en respuesta BVC para {simbolo}: {response.status_code}")
                 return None
             
-            return response.json()
+            hash_contenido = hashlib.sha256(response.content).hexdigest()
+            resultado = {
+                'sin_cambios': hash_contenido == estado.get('hash_contenido'),
+                'hash_contenido': hash_contenido,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified')
+            }
+            if not resultado['sin_cambios']:
+                resultado['datos'] = response.json()
+            return resultado
             
         except Exception as e:
             logger.error(f"Error procesando {simbolo}: {e}")
             return None
     
+    def _con_reintentos(self, simbolo: str, descarga: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Ejecutar una descarga con reintentos y backoff exponencial.
+        
+        El límite de tasa lo aplica el cliente HTTP. Con el circuito de la BVC
+        abierto no se reintenta: fallaría al instante hasta la próxima prueba.
+        """
+        inicio = time.perf_counter()
+        for intento in range(self.reintentos + 1):
+            datos = descarga()
+            if datos is not None:
+                SIMBOLO_DURACION.labels(simbolo, 'ok').observe(time.perf_counter() - inicio)
+                return datos
+            
+            if not cliente_http.disponible(self.BVC_URL):
+                break
+            if intento < self.reintentos:
+                espera = self.backoff_segundos * (2 ** intento) * (1 + random.random() * 0.25)
+                logger.warning(f"Reintentando {simbolo} en {espera:.1f}s (intento {intento + 2}/{self.reintentos + 1})")
+                time.sleep(espera)
+        
+        SIMBOLO_DURACION.labels(simbolo, 'fallido').observe(time.perf_counter() - inicio)
+        logger.error(f"No se pudieron obtener datos de {simbolo} tras {intento + 1} intentos")
+        return None
+    
+    def obtener_datos_con_reintentos(self, simbolo: str) -> Optional[Dict]:
+        """Extraer datos de un símbolo respetando el límite de tasa, con reintentos y backoff exponencial"""
+        return self._con_reintentos(simbolo, lambda: self.obtener_datos_desnudos(simbolo))
+    
+    def obtener_datos_simbolos(self, simbolos: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Extraer datos de varios símbolos en paralelo. Devuelve resultados parciales si alguno falla"""
+        simbolos = simbolos or self.SIMBOLOS
+        inicio = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bvc") as executor:
+            resultados = executor.map(self.obtener_datos_con_reintentos, simbolos)
+            datos_finales = {
+                simbolo: datos
+                for simbolo, datos in zip(simbolos, resultados)
+                if datos is not None
+            }
+        
+        fallidos = [s for s in simbolos if s not in datos_finales]
+        logger.info(
+            f"Descarga BVC: {len(datos_finales)}/{len(simbolos)} símbolos en "
+            f"{time.monotonic() - inicio:.1f}s"
+        )
+        if fallidos:
+            logger.warning(f"Símbolos sin datos: {', '.join(fallidos)}")
+        
+        return datos_finales
+    
     def limpiar_numero(self, valor: str) -> float:
         """Limpiar y convertir strings a números"""
+        import pandas as pd
+        import numpy as np
+        
         if pd.isna(valor) or valor == "":
             return np.nan
         
@@ -221,8 +487,31 @@ class BVCService:
         except ValueError:
             return np.nan
     
-    def procesar_datos_accion(self, simbolo: str, datos: Dict) -> pd.DataFrame:
+    @staticmethod
+    def limpiar_columnas_numericas(df: "pd.DataFrame", columnas: List[str]):
+        """Limpiar varias columnas numéricas a la vez, con la misma regla que limpiar_numero.
+        
+        Une todas las celdas en un único texto, aplica los reemplazos de una
+        sola pasada y convierte el resultado con pd.to_numeric, en lugar de
+        hacer una llamada Python por celda.
+        """
+        import pandas as pd
+        
+        presentes = [c for c in columnas if c in df.columns]
+        if not presentes or df.empty:
+            return
+        
+        separador = "\x1f"
+        texto = separador.join(df[presentes].to_numpy(dtype=str).ravel())
+        texto = texto.replace(".", "").replace(",", ".")
+        valores = pd.to_numeric(pd.Series(texto.split(separador)), errors='coerce').to_numpy(dtype=float)
+        
+        df[presentes] = valores.reshape(len(df), len(presentes))
+    
+    def procesar_datos_accion(self, simbolo: str, datos: Dict) -> "pd.DataFrame":
         """Procesar datos de una acción específica"""
+        import pandas as pd
+        
         if 'cur_hist_mov_emisora' not in datos or datos['cur_hist_mov_emisora'] is None:
             return pd.DataFrame({'ACCION': [simbolo]})
         
@@ -252,45 +541,80 @@ class BVCService:
                              'PRECIO_MAX', 'PRECIO_MIN', 'N_OPERACIONES', 
                              'TITULOS_NEGOCIADOS', 'MONTO_EFECTIVO']
         
-        for col in columnas_numericas:
-            if col in df.columns:
-                df[col] = df[col].apply(self.limpiar_numero)
+        self.limpiar_columnas_numericas(df, columnas_numericas)
         
         df['ACCION'] = simbolo
         return df
     
+    def obtener_datos_totales(self) -> "pd.DataFrame":
+        """Descargar y procesar el histórico completo de todas las acciones en un solo DataFrame"""
+        import pandas as pd
+        
+        # Recoger datos de todas las acciones (en paralelo, con límite de tasa)
+        datos_finales = self.obtener_datos_simbolos()
+        
+        # Procesar todos los datos
+        dataframes = []
+        for simbolo, datos in datos_finales.items():
+            df = self.procesar_datos_accion(simbolo, datos)
+            if not df.empty:
+                dataframes.append(df)
+        
+        if not dataframes:
+            return pd.DataFrame()
+        
+        datos_totales = pd.concat(dataframes, ignore_index=True)
+        datos_totales['FECHA'] = pd.to_datetime(datos_totales['FECHA'])
+        return datos_totales
+    
+    def convertir_a_registros(self, datos: "pd.DataFrame") -> List[Dict]:
+        """Convertir filas con columnas de tasa 'Oficial' y 'Paralelo' a la estructura BVC_USD.
+        
+        La conversión a USD se hace columna a columna y los registros se arman
+        a partir de las columnas ya convertidas a listas, sin recorrer el
+        DataFrame fila a fila.
+        """
+        if datos.empty:
+            return []
+        
+        precio = datos['PRECIO_CIE'].to_numpy(dtype=float)
+        monto = datos['MONTO_EFECTIVO'].to_numpy(dtype=float)
+        oficial = datos['Oficial'].to_numpy(dtype=float)
+        paralelo = datos['Paralelo'].to_numpy(dtype=float)
+        
+        columnas = {
+            'accion_codigo': datos['ACCION'].tolist(),
+            'fecha': datos['FECHA'].dt.date.tolist(),
+            'precio_cierre_bs': precio.tolist(),
+            'precio_cierre_usd_oficial': (precio / oficial).tolist(),
+            'precio_cierre_usd_paralelo': (precio / paralelo).tolist(),
+            'monto_efectivo_usd_oficial': (monto / oficial).tolist(),
+            'monto_efectivo_usd_paralelo': (monto / paralelo).tolist(),
+            'num_operaciones': datos['N_OPERACIONES'].fillna(0).to_numpy(dtype='int64').tolist(),
+            'titulos_negociados': datos['TITULOS_NEGOCIADOS'].fillna(0).to_numpy(dtype='int64').tolist()
+        }
+        
+        claves = list(columnas)
+        return [
+            {
+                **dict(zip(claves, fila)),
+                'capitalizacion_oficial': None,  # Calcular después con acciones en circulación
+                'capitalizacion_paralelo': None
+            }
+            for fila in zip(*columnas.values())
+        ]
+    
     def get_precios_cierre(self, tasa_oficial: float, tasa_paralelo: float) -> List[Dict]:
         """Obtener todos los precios de cierre del día con conversión a USD"""
         try:
             logger.info("Iniciando extracción de datos BVC...")
             
-            # Recoger datos de todas las acciones
-            datos_finales = {}
-            for simbolo in self.SIMBOLOS:
-                logger.info(f"Procesando: {simbolo}")
-                datos = self.obtener_datos_desnudos(simbolo)
-                if datos is not None:
-                    datos_finales[simbolo] = datos
-                    time.sleep(1.5)
-            
-            # Procesar todos los datos
-            dataframes = []
-            for simbolo, datos in datos_finales.items():
-                df = self.procesar_datos_accion(simbolo, datos)
-                if not df.empty:
-                    dataframes.append(df)
-            
-            if not dataframes:
+            datos_totales = self.obtener_datos_totales()
+            if datos_totales.empty:
                 logger.warning("No se obtuvieron datos de BVC")
                 return []
             
-            datos_totales = pd.concat(dataframes, ignore_index=True)
-            
-            # Filtrar solo datos del día actual o más reciente
-            fecha_hoy = date.today()
-            datos_totales['FECHA'] = pd.to_datetime(datos_totales['FECHA'])
-            
-            # Obtener la fecha más reciente disponible
+            # Filtrar solo los datos de la fecha más reciente disponible
             fecha_mas_reciente = datos_totales['FECHA'].max()
             datos_dia = datos_totales[datos_totales['FECHA'] == fecha_mas_reciente].copy()
             
@@ -304,22 +628,7 @@ class BVCService:
             datos_dia['Paralelo'] = tasa_paralelo
             
             # Crear estructura BVC_USD
-            precios = []
-            for _, row in datos_dia.iterrows():
-                precio_dict = {
-                    'accion_codigo': row['ACCION'],
-                    'fecha': row['FECHA'].date(),
-                    'precio_cierre_bs': row['PRECIO_CIE'],
-                    'precio_cierre_usd_oficial': row['PRECIO_CIE'] / tasa_oficial,
-                    'precio_cierre_usd_paralelo': row['PRECIO_CIE'] / tasa_paralelo,
-                    'monto_efectivo_usd_oficial': row['MONTO_EFECTIVO'] / tasa_oficial,
-                    'monto_efectivo_usd_paralelo': row['MONTO_EFECTIVO'] / tasa_paralelo,
-                    'num_operaciones': int(row['N_OPERACIONES']) if not pd.isna(row['N_OPERACIONES']) else 0,
-                    'titulos_negociados': int(row['TITULOS_NEGOCIADOS']) if not pd.isna(row['TITULOS_NEGOCIADOS']) else 0,
-                    'capitalizacion_oficial': None,  # Calcular después con acciones en circulación
-                    'capitalizacion_paralelo': None
-                }
-                precios.append(precio_dict)
+            precios = self.convertir_a_registros(datos_dia)
             
             logger.info(f"Procesados {len(precios)} registros de BVC")
             return precios
@@ -328,8 +637,234 @@ class BVCService:
             logger.error(f"Error al obtener precios BVC: {e}")
             return []
     
-    def aplicar_ajustes(self, datos: pd.DataFrame):
+    def get_precios_historicos(
+        self,
+        tasas: List[Dict],
+        fecha_inicio: Optional[date] = None,
+        fecha_fin: Optional[date] = None
+    ) -> List[Dict]:
+        """Obtener todo el histórico de precios convirtiendo cada fila con la tasa de su propia fecha.
+        
+        Cada fila usa la tasa registrada en tasas_cambio para su fecha o, si ese
+        día no hay tasa, la más reciente de los DIAS_TOLERANCIA_TASA anteriores.
+        Las filas sin tasa aplicable se descartan.
+        """
+        import pandas as pd
+        
+        try:
+            logger.info("Iniciando extracción del histórico BVC...")
+            
+            if not tasas:
+                logger.warning("No hay tasas de cambio registradas para convertir el histórico")
+                return []
+            
+            datos_totales = self.obtener_datos_totales()
+            if datos_totales.empty:
+                logger.warning("No se obtuvieron datos de BVC")
+                return []
+            
+            datos = datos_totales.dropna(subset=['FECHA'])
+            if fecha_inicio:
+                datos = datos[datos['FECHA'] >= pd.Timestamp(fecha_inicio)]
+            if fecha_fin:
+                datos = datos[datos['FECHA'] <= pd.Timestamp(fecha_fin)]
+            datos = datos.sort_values('FECHA').copy()
+            
+            self.aplicar_ajustes(datos)
+            
+            precios = self.convertir_con_tasas(datos, tasas)
+            logger.info(f"Procesados {len(precios)} registros históricos de BVC")
+            return precios
+            
+        except Exception as e:
+            logger.error(f"Error al obtener histórico BVC: {e}")
+            return []
+    
+    def convertir_con_tasas(self, datos: "pd.DataFrame", tasas: List[Dict]) -> List[Dict]:
+        """Convertir filas ordenadas por FECHA con la tasa de su fecha (o la última de DIAS_TOLERANCIA_TASA)"""
+        import pandas as pd
+        
+        df_tasas = pd.DataFrame(tasas)
+        df_tasas = pd.DataFrame({
+            'FECHA_TASA': pd.to_datetime(df_tasas['fecha']),
+            'Oficial': pd.to_numeric(df_tasas['tasa_oficial'], errors='coerce'),
+            'Paralelo': pd.to_numeric(df_tasas['tasa_paralelo'], errors='coerce')
+        }).dropna().sort_values('FECHA_TASA')
+        
+        datos = pd.merge_asof(
+            datos,
+            df_tasas,
+            left_on='FECHA',
+            right_on='FECHA_TASA',
+            direction='backward',
+            tolerance=pd.Timedelta(days=self.DIAS_TOLERANCIA_TASA)
+        )
+        
+        sin_tasa = datos['Oficial'].isna() | datos['Paralelo'].isna()
+        if sin_tasa.any():
+            logger.warning(f"{int(sin_tasa.sum())} filas sin tasa de cambio aplicable, se omiten")
+        
+        return self.convertir_a_registros(datos[~sin_tasa])
+    
+    @staticmethod
+    def hash_filas(df: "pd.DataFrame") -> "pd.Series":
+        """Hash hexadecimal del contenido de cada fila (fecha y valores de mercado)"""
+        import pandas as pd
+        
+        columnas = [c for c in ('FECHA', 'PRECIO_CIE', 'PRECIO_APERT', 'PRECIO_MAX', 'PRECIO_MIN',
+                                'N_OPERACIONES', 'TITULOS_NEGOCIADOS', 'MONTO_EFECTIVO') if c in df.columns]
+        return pd.util.hash_pandas_object(df[columnas], index=False).map('{:016x}'.format)
+    
+    def get_precios_incrementales(
+        self,
+        tasas: List[Dict],
+        estados: Dict[str, Dict],
+        dias_correccion: Optional[int] = None,
+        simbolos: Optional[List[str]] = None,
+        fecha_mercado: Optional[date] = None
+    ) -> Optional[Dict]:
+        """Obtener solo los precios nuevos o corregidos desde la última ingesta.
+        
+        Los símbolos cuya respuesta no cambió (304 o mismo hash) no se
+        procesan. De los demás se toman las filas posteriores a su última
+        fecha ingerida y las de los últimos dias_correccion días cuyo hash
+        difiere del guardado. Sin estado previo se toma, como antes, el día
+        más reciente del mercado. Devuelve los precios a escribir, los nuevos
+        estados por símbolo, el resultado de cada símbolo ('sin_tasa' si
+        alguna de sus filas no tenía tasa y queda pendiente) y estadísticas de
+        la ejecución, o None si no se pudo descargar ningún símbolo.
+        
+        Con `simbolos` se procesa solo ese subconjunto (ingesta por lotes);
+        `fecha_mercado` es el día más reciente visto en lotes anteriores.
+        """
+        import pandas as pd
+        
+        try:
+            dias_correccion = settings.bvc_dias_correccion if dias_correccion is None else dias_correccion
+            simbolos = simbolos or self.SIMBOLOS
+            inicio = time.monotonic()
+            etapas = {}
+            
+            with medir_etapa('bvc', 'descarga_bvc', etapas), \
+                    ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bvc") as executor:
+                descargas = dict(zip(simbolos, executor.map(
+                    lambda simbolo: self._con_reintentos(
+                        simbolo, lambda: self.obtener_datos_si_cambiaron(simbolo, estados.get(simbolo))
+                    ),
+                    simbolos
+                )))
+            
+            estadisticas = {
+                'simbolos': len(simbolos),
+                'sin_cambios': sum(1 for d in descargas.values() if d and d['sin_cambios']),
+                'fallidos': [s for s, d in descargas.items() if d is None],
+                'filas_nuevas': 0,
+                'filas_corregidas': 0,
+                'filas_sin_tasa': 0
+            }
+            if len(estadisticas['fallidos']) == len(simbolos):
+                logger.error("No se pudo descargar ningún símbolo de la BVC")
+                return None
+            
+            with medir_etapa('bvc', 'parseo', etapas):
+                # Procesar solo los símbolos con contenido nuevo
+                cambiados = {}
+                for simbolo, descarga in descargas.items():
+                    if descarga and not descarga['sin_cambios']:
+                        df = self.procesar_datos_accion(simbolo, descarga['datos'])
+                        if 'FECHA' in df.columns:
+                            df = df.dropna(subset=['FECHA'])
+                            if not df.empty:
+                                df['HASH'] = self.hash_filas(df).to_numpy()
+                                cambiados[simbolo] = df
+                
+                fecha_mercado = max(
+                    [df['FECHA'].max() for df in cambiados.values()]
+                    + ([pd.Timestamp(fecha_mercado)] if fecha_mercado else []),
+                    default=None
+                )
+                candidatos = []
+                estados_nuevos = {}
+                
+                for simbolo, df in cambiados.items():
+                    estado = estados.get(simbolo) or {}
+                    ultima = pd.Timestamp(estado['ultima_fecha']) if estado.get('ultima_fecha') else None
+                    hashes = estado.get('hashes_filas') or {}
+                    
+                    if ultima is None:
+                        seleccion = df[df['FECHA'] == fecha_mercado]
+                        nuevas, corregidas = len(seleccion), 0
+                    else:
+                        nuevas_mask = df['FECHA'] > ultima
+                        en_ventana = (df['FECHA'] > ultima - pd.Timedelta(days=dias_correccion)) & ~nuevas_mask
+                        fechas_iso = df['FECHA'].dt.strftime('%Y-%m-%d')
+                        cambiada = df['HASH'] != fechas_iso.map(hashes)
+                        seleccion = df[nuevas_mask | (en_ventana & cambiada)]
+                        nuevas, corregidas = int(nuevas_mask.sum()), int((en_ventana & cambiada).sum())
+                    
+                    candidatos.append(seleccion)
+                    estadisticas['filas_nuevas'] += nuevas
+                    estadisticas['filas_corregidas'] += corregidas
+                    
+                    nueva_ultima = df['FECHA'].max() if ultima is None else max(ultima, df['FECHA'].max())
+                    ventana = df[df['FECHA'] > nueva_ultima - pd.Timedelta(days=dias_correccion)]
+                    estados_nuevos[simbolo] = {
+                        'simbolo': simbolo,
+                        'ultima_fecha': nueva_ultima.date().isoformat(),
+                        'hash_contenido': descargas[simbolo]['hash_contenido'],
+                        'etag': descargas[simbolo]['etag'],
+                        'last_modified': descargas[simbolo]['last_modified'],
+                        'hashes_filas': dict(zip(ventana['FECHA'].dt.strftime('%Y-%m-%d'), ventana['HASH']))
+                    }
+                
+                precios = []
+                datos = pd.concat(candidatos, ignore_index=True) if candidatos else pd.DataFrame()
+                if not datos.empty:
+                    datos = datos.sort_values('FECHA').copy()
+                    self.aplicar_ajustes(datos)
+                    precios = self.convertir_con_tasas(datos, tasas)
+                    estadisticas['filas_sin_tasa'] = len(datos) - len(precios)
+            
+            # Los símbolos con filas sin tasa conservan su estado anterior y se reintentan
+            sin_tasa = set()
+            if estadisticas['filas_sin_tasa']:
+                convertidas = pd.Series([p['accion_codigo'] for p in precios], dtype=object).value_counts()
+                pendientes = datos['ACCION'].value_counts()
+                for simbolo, total in pendientes.items():
+                    if convertidas.get(simbolo, 0) < total:
+                        estados_nuevos.pop(simbolo, None)
+                        sin_tasa.add(simbolo)
+            
+            estadisticas['actualizados'] = len(cambiados)
+            logger.info(
+                f"Ingesta incremental BVC en {time.monotonic() - inicio:.1f}s: "
+                f"{estadisticas['sin_cambios']} símbolos sin cambios, {len(cambiados)} con cambios, "
+                f"{estadisticas['filas_nuevas']} filas nuevas, {estadisticas['filas_corregidas']} corregidas"
+            )
+            if estadisticas['fallidos']:
+                logger.warning(f"Símbolos sin datos: {', '.join(estadisticas['fallidos'])}")
+            
+            return {
+                'precios': precios,
+                'estados': list(estados_nuevos.values()),
+                'simbolos': {
+                    simbolo: 'fallido' if d is None else 'sin_cambios' if d['sin_cambios'] else
+                    'sin_tasa' if simbolo in sin_tasa else 'cambiado'
+                    for simbolo, d in descargas.items()
+                },
+                'fecha_mercado': fecha_mercado.date() if fecha_mercado is not None else None,
+                'estadisticas': estadisticas,
+                'etapas': etapas
+            }
+            
+        except Exception as e:
+            logger.error(f"Error en ingesta incremental BVC: {e}")
+            return None
+    
+    def aplicar_ajustes(self, datos: "pd.DataFrame"):
         """Aplicar ajustes específicos para BNC y BPV"""
+        import pandas as pd
+        
         # Ajustes BNC
         fechas_bnc = ["2024-12-30", "2025-01-02", "2025-01-03", "2025-01-07", "2025-01-08"]
         fechas_bnc_dt = pd.to_datetime(fechas_bnc)
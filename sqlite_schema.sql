@@ -0,0 +1,241 @@
+-- ============================================
+-- SCHEMA DE BASE DE DATOS PARA SQLITE (ALMACENAMIENTO=sqlite)
+-- Mismas tablas, vista e índices que supabase_schema.sql.
+-- Tipos: DECIMAL -> REAL, DATE/TIMESTAMP -> TEXT ISO 8601,
+-- JSONB y TEXT[] -> JSON (texto), BOOLEAN -> 0/1.
+-- Las funciones refrescar_agregados, compactar_tasas_intradia y
+-- adquirir_bloqueo están en almacenamiento_sqlite.py
+-- ============================================
+
+PRAGMA foreign_keys = ON;
+
+-- Tabla de acciones
+CREATE TABLE IF NOT EXISTS acciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo VARCHAR(20) UNIQUE NOT NULL,
+    nombre VARCHAR(200),
+    acciones_circulacion BIGINT,
+    activa BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de precios históricos BVC
+CREATE TABLE IF NOT EXISTS precios_bvc (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    accion_codigo VARCHAR(20) NOT NULL,
+    fecha DATE NOT NULL,
+    precio_cierre_bs REAL,
+    precio_cierre_usd_oficial REAL,
+    precio_cierre_usd_paralelo REAL,
+    monto_efectivo_usd_oficial REAL,
+    monto_efectivo_usd_paralelo REAL,
+    num_operaciones INTEGER,
+    titulos_negociados BIGINT,
+    capitalizacion_oficial REAL,
+    capitalizacion_paralelo REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(accion_codigo, fecha),
+    FOREIGN KEY (accion_codigo) REFERENCES acciones(codigo) ON DELETE CASCADE
+);
+
+-- Tabla de tasas de cambio
+CREATE TABLE IF NOT EXISTS tasas_cambio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha DATE NOT NULL UNIQUE,
+    tasa_oficial REAL,
+    tasa_paralelo REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de configuración
+CREATE TABLE IF NOT EXISTS configuracion (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave VARCHAR(100) UNIQUE NOT NULL,
+    valor TEXT,
+    descripcion TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Estado de la ingesta incremental por símbolo (última fecha y huellas del contenido)
+CREATE TABLE IF NOT EXISTS estado_ingesta (
+    simbolo VARCHAR(20) PRIMARY KEY,
+    ultima_fecha DATE,
+    hash_contenido VARCHAR(64),
+    etag TEXT,
+    last_modified TEXT,
+    hashes_filas JSON DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Snapshots del libro de Binance P2P (ofertas de ambos lados y tasa con cada agregación)
+CREATE TABLE IF NOT EXISTS libro_p2p (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    capturado_en TIMESTAMP NOT NULL,
+    metodos_pago JSON DEFAULT '[]',
+    paginas INTEGER,
+    tasa REAL,
+    metodo VARCHAR(30),
+    tasas JSON DEFAULT '{}',
+    volumen_compra_usdt REAL,
+    volumen_venta_usdt REAL,
+    ofertas_compra JSON DEFAULT '[]',
+    ofertas_venta JSON DEFAULT '[]',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índices para mejorar rendimiento
+CREATE INDEX IF NOT EXISTS idx_precios_bvc_fecha ON precios_bvc(fecha DESC);
+CREATE INDEX IF NOT EXISTS idx_precios_bvc_accion ON precios_bvc(accion_codigo);
+CREATE INDEX IF NOT EXISTS idx_precios_bvc_accion_fecha ON precios_bvc(accion_codigo, fecha DESC);
+CREATE INDEX IF NOT EXISTS idx_tasas_fecha ON tasas_cambio(fecha DESC);
+CREATE INDEX IF NOT EXISTS idx_libro_p2p_capturado ON libro_p2p(capturado_en DESC);
+
+-- Trigger para actualizar updated_at automáticamente
+CREATE TRIGGER IF NOT EXISTS update_acciones_updated_at AFTER UPDATE ON acciones
+FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE acciones SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+
+-- Insertar configuración inicial
+INSERT INTO configuracion (clave, valor, descripcion) VALUES
+('hora_actualizacion_bvc', '17:00', 'Hora para actualizar precios BVC (formato HH:MM)'),
+('timezone', 'America/Caracas', 'Zona horaria para las actualizaciones'),
+('ultima_actualizacion_bvc', NULL, 'Última actualización de precios BVC'),
+('ultima_ejecucion_bvc', NULL, 'Duración y desglose por etapa de la última actualización BVC (JSON)')
+ON CONFLICT (clave) DO NOTHING;
+
+-- Vista con el último precio de cada acción activa (una sola consulta para el resumen)
+CREATE VIEW IF NOT EXISTS ultimos_precios_bvc AS
+SELECT
+    a.codigo,
+    a.nombre,
+    u.fecha,
+    u.precio_cierre_usd_oficial,
+    u.precio_cierre_usd_paralelo,
+    u.capitalizacion_oficial,
+    u.capitalizacion_paralelo
+FROM acciones a
+LEFT JOIN precios_bvc u
+  ON u.accion_codigo = a.codigo
+ AND u.fecha = (SELECT MAX(p.fecha) FROM precios_bvc p WHERE p.accion_codigo = a.codigo)
+WHERE a.activa = 1;
+
+-- ============================================
+-- AGREGADOS PRECALCULADOS
+-- ============================================
+
+-- Totales diarios del mercado (último precio de cada acción activa a esa fecha)
+CREATE TABLE IF NOT EXISTS agregados_mercado (
+    fecha DATE PRIMARY KEY,
+    total_acciones INTEGER,
+    acciones_negociadas INTEGER,
+    capitalizacion_total_oficial REAL,
+    capitalizacion_total_paralelo REAL,
+    monto_efectivo_usd_oficial REAL,
+    monto_efectivo_usd_paralelo REAL,
+    num_operaciones INTEGER,
+    titulos_negociados BIGINT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Estadísticas móviles por acción y ventana (7/30/90/365 días hasta su último cierre)
+CREATE TABLE IF NOT EXISTS estadisticas_acciones (
+    accion_codigo VARCHAR(20) NOT NULL REFERENCES acciones(codigo) ON DELETE CASCADE,
+    ventana_dias INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    precio_actual_oficial REAL,
+    precio_actual_paralelo REAL,
+    capitalizacion_oficial REAL,
+    capitalizacion_paralelo REAL,
+    precio_minimo_oficial REAL,
+    precio_maximo_oficial REAL,
+    precio_promedio_oficial REAL,
+    precio_minimo_paralelo REAL,
+    precio_maximo_paralelo REAL,
+    precio_promedio_paralelo REAL,
+    titulos_negociados BIGINT,
+    monto_efectivo_usd_oficial REAL,
+    retorno_oficial REAL,
+    retorno_paralelo REAL,
+    sesiones INTEGER,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (accion_codigo, ventana_dias)
+);
+
+-- ============================================
+-- TASAS INTRADÍA
+-- ============================================
+
+-- Muestras crudas
+CREATE TABLE IF NOT EXISTS tasas_intradia (
+    capturado_en TIMESTAMP PRIMARY KEY,
+    tasa_oficial REAL,
+    tasa_paralelo REAL
+);
+
+-- Velas OHLC por hora ('1h') y por día ('1d')
+CREATE TABLE IF NOT EXISTS tasas_intradia_ohlc (
+    resolucion VARCHAR(3) NOT NULL,
+    inicio TIMESTAMP NOT NULL,
+    oficial_apertura REAL,
+    oficial_maximo REAL,
+    oficial_minimo REAL,
+    oficial_cierre REAL,
+    paralelo_apertura REAL,
+    paralelo_maximo REAL,
+    paralelo_minimo REAL,
+    paralelo_cierre REAL,
+    muestras INTEGER,
+    PRIMARY KEY (resolucion, inicio)
+);
+
+-- ============================================
+-- BLOQUEOS DE TAREAS PROGRAMADAS
+-- ============================================
+
+-- Leases de los trabajos programados (adquirir_bloqueo)
+CREATE TABLE IF NOT EXISTS bloqueos_tareas (
+    tarea VARCHAR(50) PRIMARY KEY,
+    titular TEXT NOT NULL,
+    adquirido_en TIMESTAMP NOT NULL,
+    expira_en TIMESTAMP NOT NULL
+);
+
+-- ============================================
+-- HISTORIAL DE EJECUCIONES
+-- ============================================
+
+-- Ejecuciones de las tareas (bvc, tasas, backfill, espejo) con sus puntos de control
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id VARCHAR(32) PRIMARY KEY,
+    tarea VARCHAR(20) NOT NULL,
+    instancia TEXT,
+    estado VARCHAR(20) NOT NULL,
+    parametros JSON DEFAULT '{}',
+    inicio TIMESTAMP NOT NULL,
+    fin TIMESTAMP,
+    duracion_segundos REAL,
+    etapas JSON DEFAULT '{}',
+    progreso JSON,
+    resultado JSON,
+    puntos_control JSON DEFAULT '{}',
+    reanuda VARCHAR(32),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Resultado de cada símbolo en una ejecución BVC (pendiente, sin_cambios, escrito, fallido)
+CREATE TABLE IF NOT EXISTS ejecuciones_simbolos (
+    ejecucion_id VARCHAR(32) NOT NULL REFERENCES ejecuciones(id) ON DELETE CASCADE,
+    simbolo VARCHAR(20) NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    filas INTEGER DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ejecucion_id, simbolo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_inicio ON ejecuciones(inicio DESC);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_tarea_inicio ON ejecuciones(tarea, inicio DESC);
+-- Seguimiento de ejecuciones terminadas por las demás instancias
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_fin ON ejecuciones(fin);
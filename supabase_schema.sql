@@ -51,10 +51,39 @@ CREATE TABLE IF NOT EXISTS configuracion (
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Estado de la ingesta incremental por símbolo (última fecha y huellas del contenido)
+CREATE TABLE IF NOT EXISTS estado_ingesta (
+    simbolo VARCHAR(20) PRIMARY KEY,
+    ultima_fecha DATE,
+    hash_contenido VARCHAR(64),
+    etag TEXT,
+    last_modified TEXT,
+    hashes_filas JSONB DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Snapshots del libro de Binance P2P (ofertas de ambos lados y tasa con cada agregación)
+CREATE TABLE IF NOT EXISTS libro_p2p (
+    id BIGSERIAL PRIMARY KEY,
+    capturado_en TIMESTAMP NOT NULL,
+    metodos_pago TEXT[] DEFAULT '{}',
+    paginas INTEGER,
+    tasa DECIMAL(10, 4),
+    metodo VARCHAR(30),
+    tasas JSONB DEFAULT '{}'::jsonb,
+    volumen_compra_usdt DECIMAL(20, 2),
+    volumen_venta_usdt DECIMAL(20, 2),
+    ofertas_compra JSONB DEFAULT '[]'::jsonb,
+    ofertas_venta JSONB DEFAULT '[]'::jsonb,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
 -- Índices para mejorar rendimiento
 CREATE INDEX idx_precios_bvc_fecha ON precios_bvc(fecha DESC);
 CREATE INDEX idx_precios_bvc_accion ON precios_bvc(accion_codigo);
+CREATE INDEX idx_precios_bvc_accion_fecha ON precios_bvc(accion_codigo, fecha DESC);
 CREATE INDEX idx_tasas_fecha ON tasas_cambio(fecha DESC);
+CREATE INDEX idx_libro_p2p_capturado ON libro_p2p(capturado_en DESC);
 
 -- Trigger para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -72,7 +101,8 @@ CREATE TRIGGER update_acciones_updated_at BEFORE UPDATE ON acciones
 INSERT INTO configuracion (clave, valor, descripcion) VALUES
 ('hora_actualizacion_bvc', '17:00', 'Hora para actualizar precios BVC (formato HH:MM)'),
 ('timezone', 'America/Caracas', 'Zona horaria para las actualizaciones'),
-('ultima_actualizacion_bvc', NULL, 'Última actualización de precios BVC')
+('ultima_actualizacion_bvc', NULL, 'Última actualización de precios BVC'),
+('ultima_ejecucion_bvc', NULL, 'Duración y desglose por etapa de la última actualización BVC (JSON)')
 ON CONFLICT (clave) DO NOTHING;
 
 -- Función para obtener el resumen de una acción
@@ -118,3 +148,388 @@ BEGIN
     WHERE a.codigo = p_codigo;
 END;
 $$ LANGUAGE plpgsql;
+
+-- Vista con el último precio de cada acción activa (una sola consulta para el resumen)
+CREATE OR REPLACE VIEW ultimos_precios_bvc AS
+SELECT
+    a.codigo,
+    a.nombre,
+    u.fecha,
+    u.precio_cierre_usd_oficial,
+    u.precio_cierre_usd_paralelo,
+    u.capitalizacion_oficial,
+    u.capitalizacion_paralelo
+FROM acciones a
+LEFT JOIN (
+    SELECT DISTINCT ON (accion_codigo) *
+    FROM precios_bvc
+    ORDER BY accion_codigo, fecha DESC
+) u ON u.accion_codigo = a.codigo
+WHERE a.activa = true;
+
+-- ============================================
+-- AGREGADOS PRECALCULADOS
+-- Se materializan al final de cada ingesta con refrescar_agregados()
+-- ============================================
+
+-- Totales diarios del mercado (último precio de cada acción activa a esa fecha)
+CREATE TABLE IF NOT EXISTS agregados_mercado (
+    fecha DATE PRIMARY KEY,
+    total_acciones INTEGER,
+    acciones_negociadas INTEGER,
+    capitalizacion_total_oficial DECIMAL(24, 2),
+    capitalizacion_total_paralelo DECIMAL(24, 2),
+    monto_efectivo_usd_oficial DECIMAL(24, 2),
+    monto_efectivo_usd_paralelo DECIMAL(24, 2),
+    num_operaciones INTEGER,
+    titulos_negociados BIGINT,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Estadísticas móviles por acción y ventana (7/30/90/365 días hasta su último cierre)
+CREATE TABLE IF NOT EXISTS estadisticas_acciones (
+    accion_codigo VARCHAR(20) NOT NULL REFERENCES acciones(codigo) ON DELETE CASCADE,
+    ventana_dias INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    precio_actual_oficial DECIMAL(20, 4),
+    precio_actual_paralelo DECIMAL(20, 4),
+    capitalizacion_oficial DECIMAL(20, 2),
+    capitalizacion_paralelo DECIMAL(20, 2),
+    precio_minimo_oficial DECIMAL(20, 4),
+    precio_maximo_oficial DECIMAL(20, 4),
+    precio_promedio_oficial DECIMAL(20, 4),
+    precio_minimo_paralelo DECIMAL(20, 4),
+    precio_maximo_paralelo DECIMAL(20, 4),
+    precio_promedio_paralelo DECIMAL(20, 4),
+    titulos_negociados BIGINT,
+    monto_efectivo_usd_oficial DECIMAL(24, 2),
+    retorno_oficial DECIMAL(12, 6),
+    retorno_paralelo DECIMAL(12, 6),
+    sesiones INTEGER,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (accion_codigo, ventana_dias)
+);
+
+-- Recalcular los agregados diarios de un rango de fechas y las estadísticas móviles
+-- de cada acción a su último cierre
+CREATE OR REPLACE FUNCTION refrescar_agregados(
+    p_fecha_inicio DATE DEFAULT CURRENT_DATE,
+    p_fecha_fin DATE DEFAULT CURRENT_DATE,
+    p_ventanas INTEGER[] DEFAULT ARRAY[7, 30, 90, 365]
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_dias INTEGER;
+BEGIN
+    -- 1. Un registro por día con sesión dentro del rango
+    INSERT INTO agregados_mercado (
+        fecha, total_acciones, acciones_negociadas,
+        capitalizacion_total_oficial, capitalizacion_total_paralelo,
+        monto_efectivo_usd_oficial, monto_efectivo_usd_paralelo,
+        num_operaciones, titulos_negociados, updated_at
+    )
+    WITH dias AS (
+        SELECT fecha, COUNT(*) AS acciones_negociadas,
+               SUM(monto_efectivo_usd_oficial) AS monto_oficial,
+               SUM(monto_efectivo_usd_paralelo) AS monto_paralelo,
+               SUM(num_operaciones) AS operaciones,
+               SUM(titulos_negociados) AS titulos
+        FROM precios_bvc
+        WHERE fecha BETWEEN p_fecha_inicio AND p_fecha_fin
+        GROUP BY fecha
+    ),
+    capitalizaciones AS (
+        SELECT d.fecha,
+               COUNT(u.fecha) AS total_acciones,
+               COALESCE(SUM(u.capitalizacion_oficial), 0) AS cap_oficial,
+               COALESCE(SUM(u.capitalizacion_paralelo), 0) AS cap_paralelo
+        FROM dias d
+        CROSS JOIN acciones a
+        LEFT JOIN LATERAL (
+            SELECT p.fecha, p.capitalizacion_oficial, p.capitalizacion_paralelo
+            FROM precios_bvc p
+            WHERE p.accion_codigo = a.codigo AND p.fecha <= d.fecha
+            ORDER BY p.fecha DESC
+            LIMIT 1
+        ) u ON true
+        WHERE a.activa = true
+        GROUP BY d.fecha
+    )
+    SELECT d.fecha, c.total_acciones, d.acciones_negociadas,
+           c.cap_oficial, c.cap_paralelo,
+           d.monto_oficial, d.monto_paralelo,
+           d.operaciones, d.titulos, NOW()
+    FROM dias d
+    JOIN capitalizaciones c ON c.fecha = d.fecha
+    ON CONFLICT (fecha) DO UPDATE SET
+        total_acciones = EXCLUDED.total_acciones,
+        acciones_negociadas = EXCLUDED.acciones_negociadas,
+        capitalizacion_total_oficial = EXCLUDED.capitalizacion_total_oficial,
+        capitalizacion_total_paralelo = EXCLUDED.capitalizacion_total_paralelo,
+        monto_efectivo_usd_oficial = EXCLUDED.monto_efectivo_usd_oficial,
+        monto_efectivo_usd_paralelo = EXCLUDED.monto_efectivo_usd_paralelo,
+        num_operaciones = EXCLUDED.num_operaciones,
+        titulos_negociados = EXCLUDED.titulos_negociados,
+        updated_at = NOW();
+    
+    GET DIAGNOSTICS v_dias = ROW_COUNT;
+    
+    -- 2. Estadísticas de cada ventana hasta el último cierre de cada acción
+    INSERT INTO estadisticas_acciones (
+        accion_codigo, ventana_dias, fecha,
+        precio_actual_oficial, precio_actual_paralelo,
+        capitalizacion_oficial, capitalizacion_paralelo,
+        precio_minimo_oficial, precio_maximo_oficial, precio_promedio_oficial,
+        precio_minimo_paralelo, precio_maximo_paralelo, precio_promedio_paralelo,
+        titulos_negociados, monto_efectivo_usd_oficial,
+        retorno_oficial, retorno_paralelo, sesiones, updated_at
+    )
+    WITH ultimos AS (
+        SELECT DISTINCT ON (accion_codigo) *
+        FROM precios_bvc
+        ORDER BY accion_codigo, fecha DESC
+    ),
+    ventanas AS (
+        SELECT u.accion_codigo, v.dias, u.fecha,
+               u.precio_cierre_usd_oficial, u.precio_cierre_usd_paralelo,
+               u.capitalizacion_oficial, u.capitalizacion_paralelo,
+               MIN(p.precio_cierre_usd_oficial) AS min_oficial,
+               MAX(p.precio_cierre_usd_oficial) AS max_oficial,
+               AVG(p.precio_cierre_usd_oficial) AS prom_oficial,
+               MIN(p.precio_cierre_usd_paralelo) AS min_paralelo,
+               MAX(p.precio_cierre_usd_paralelo) AS max_paralelo,
+               AVG(p.precio_cierre_usd_paralelo) AS prom_paralelo,
+               SUM(p.titulos_negociados) AS titulos,
+               SUM(p.monto_efectivo_usd_oficial) AS monto_oficial,
+               (ARRAY_AGG(p.precio_cierre_usd_oficial ORDER BY p.fecha)
+                    FILTER (WHERE p.precio_cierre_usd_oficial > 0))[1] AS inicial_oficial,
+               (ARRAY_AGG(p.precio_cierre_usd_paralelo ORDER BY p.fecha)
+                    FILTER (WHERE p.precio_cierre_usd_paralelo > 0))[1] AS inicial_paralelo,
+               COUNT(*) AS sesiones
+        FROM ultimos u
+        CROSS JOIN UNNEST(p_ventanas) AS v(dias)
+        JOIN precios_bvc p
+          ON p.accion_codigo = u.accion_codigo
+         AND p.fecha > u.fecha - v.dias
+         AND p.fecha <= u.fecha
+        GROUP BY u.accion_codigo, v.dias, u.fecha,
+                 u.precio_cierre_usd_oficial, u.precio_cierre_usd_paralelo,
+                 u.capitalizacion_oficial, u.capitalizacion_paralelo
+    )
+    SELECT accion_codigo, dias, fecha,
+           precio_cierre_usd_oficial, precio_cierre_usd_paralelo,
+           capitalizacion_oficial, capitalizacion_paralelo,
+           min_oficial, max_oficial, prom_oficial,
+           min_paralelo, max_paralelo, prom_paralelo,
+           titulos, monto_oficial,
+           precio_cierre_usd_oficial / NULLIF(inicial_oficial, 0) - 1,
+           precio_cierre_usd_paralelo / NULLIF(inicial_paralelo, 0) - 1,
+           sesiones, NOW()
+    FROM ventanas
+    ON CONFLICT (accion_codigo, ventana_dias) DO UPDATE SET
+        fecha = EXCLUDED.fecha,
+        precio_actual_oficial = EXCLUDED.precio_actual_oficial,
+        precio_actual_paralelo = EXCLUDED.precio_actual_paralelo,
+        capitalizacion_oficial = EXCLUDED.capitalizacion_oficial,
+        capitalizacion_paralelo = EXCLUDED.capitalizacion_paralelo,
+        precio_minimo_oficial = EXCLUDED.precio_minimo_oficial,
+        precio_maximo_oficial = EXCLUDED.precio_maximo_oficial,
+        precio_promedio_oficial = EXCLUDED.precio_promedio_oficial,
+        precio_minimo_paralelo = EXCLUDED.precio_minimo_paralelo,
+        precio_maximo_paralelo = EXCLUDED.precio_maximo_paralelo,
+        precio_promedio_paralelo = EXCLUDED.precio_promedio_paralelo,
+        titulos_negociados = EXCLUDED.titulos_negociados,
+        monto_efectivo_usd_oficial = EXCLUDED.monto_efectivo_usd_oficial,
+        retorno_oficial = EXCLUDED.retorno_oficial,
+        retorno_paralelo = EXCLUDED.retorno_paralelo,
+        sesiones = EXCLUDED.sesiones,
+        updated_at = NOW();
+    
+    RETURN v_dias;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- TASAS INTRADÍA
+-- Muestras de las cotizaciones en vivo cada TASAS_INTRADIA_MUESTREO_SEGUNDOS, que
+-- compactar_tasas_intradia() resume en velas OHLC horarias y diarias
+-- ============================================
+
+-- Muestras crudas (se conservan TASAS_INTRADIA_RETENCION_DIAS)
+CREATE TABLE IF NOT EXISTS tasas_intradia (
+    capturado_en TIMESTAMP PRIMARY KEY,
+    tasa_oficial DECIMAL(12, 4),
+    tasa_paralelo DECIMAL(12, 4)
+);
+
+-- Velas OHLC por hora ('1h', se conservan TASAS_INTRADIA_RETENCION_HORARIA_DIAS) y por día ('1d')
+CREATE TABLE IF NOT EXISTS tasas_intradia_ohlc (
+    resolucion VARCHAR(3) NOT NULL,
+    inicio TIMESTAMP NOT NULL,
+    oficial_apertura DECIMAL(12, 4),
+    oficial_maximo DECIMAL(12, 4),
+    oficial_minimo DECIMAL(12, 4),
+    oficial_cierre DECIMAL(12, 4),
+    paralelo_apertura DECIMAL(12, 4),
+    paralelo_maximo DECIMAL(12, 4),
+    paralelo_minimo DECIMAL(12, 4),
+    paralelo_cierre DECIMAL(12, 4),
+    muestras INTEGER,
+    PRIMARY KEY (resolucion, inicio)
+);
+
+-- Recalcular las velas de los periodos que aún tienen muestras y aplicar la retención.
+-- La referencia de tiempo es la última muestra, no NOW(), para no depender de la zona
+-- horaria de la sesión (las muestras se guardan en hora local de Caracas)
+CREATE OR REPLACE FUNCTION compactar_tasas_intradia(
+    p_retencion_muestras INTERVAL DEFAULT INTERVAL '7 days',
+    p_retencion_horaria INTERVAL DEFAULT INTERVAL '90 days'
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_referencia TIMESTAMP;
+    v_desde TIMESTAMP;
+    v_borradas INTEGER;
+BEGIN
+    SELECT MAX(capturado_en), MIN(capturado_en) INTO v_referencia, v_desde FROM tasas_intradia;
+    IF v_referencia IS NULL THEN
+        RETURN 0;
+    END IF;
+    
+    -- 1. Velas horarias a partir de las muestras (la hora en curso se corrige en la siguiente pasada)
+    INSERT INTO tasas_intradia_ohlc
+    SELECT '1h', DATE_TRUNC('hour', capturado_en),
+           (ARRAY_AGG(tasa_oficial ORDER BY capturado_en) FILTER (WHERE tasa_oficial IS NOT NULL))[1],
+           MAX(tasa_oficial), MIN(tasa_oficial),
+           (ARRAY_AGG(tasa_oficial ORDER BY capturado_en DESC) FILTER (WHERE tasa_oficial IS NOT NULL))[1],
+           (ARRAY_AGG(tasa_paralelo ORDER BY capturado_en) FILTER (WHERE tasa_paralelo IS NOT NULL))[1],
+           MAX(tasa_paralelo), MIN(tasa_paralelo),
+           (ARRAY_AGG(tasa_paralelo ORDER BY capturado_en DESC) FILTER (WHERE tasa_paralelo IS NOT NULL))[1],
+           COUNT(*)
+    FROM tasas_intradia
+    GROUP BY DATE_TRUNC('hour', capturado_en)
+    ON CONFLICT (resolucion, inicio) DO UPDATE SET
+        oficial_apertura = EXCLUDED.oficial_apertura,
+        oficial_maximo = EXCLUDED.oficial_maximo,
+        oficial_minimo = EXCLUDED.oficial_minimo,
+        oficial_cierre = EXCLUDED.oficial_cierre,
+        paralelo_apertura = EXCLUDED.paralelo_apertura,
+        paralelo_maximo = EXCLUDED.paralelo_maximo,
+        paralelo_minimo = EXCLUDED.paralelo_minimo,
+        paralelo_cierre = EXCLUDED.paralelo_cierre,
+        muestras = EXCLUDED.muestras;
+    
+    -- 2. Velas diarias a partir de las horarias de los días que aún tienen muestras
+    INSERT INTO tasas_intradia_ohlc
+    SELECT '1d', DATE_TRUNC('day', inicio),
+           (ARRAY_AGG(oficial_apertura ORDER BY inicio) FILTER (WHERE oficial_apertura IS NOT NULL))[1],
+           MAX(oficial_maximo), MIN(oficial_minimo),
+           (ARRAY_AGG(oficial_cierre ORDER BY inicio DESC) FILTER (WHERE oficial_cierre IS NOT NULL))[1],
+           (ARRAY_AGG(paralelo_apertura ORDER BY inicio) FILTER (WHERE paralelo_apertura IS NOT NULL))[1],
+           MAX(paralelo_maximo), MIN(paralelo_minimo),
+           (ARRAY_AGG(paralelo_cierre ORDER BY inicio DESC) FILTER (WHERE paralelo_cierre IS NOT NULL))[1],
+           SUM(muestras)
+    FROM tasas_intradia_ohlc
+    WHERE resolucion = '1h' AND inicio >= DATE_TRUNC('day', v_desde)
+    GROUP BY DATE_TRUNC('day', inicio)
+    ON CONFLICT (resolucion, inicio) DO UPDATE SET
+        oficial_apertura = EXCLUDED.oficial_apertura,
+        oficial_maximo = EXCLUDED.oficial_maximo,
+        oficial_minimo = EXCLUDED.oficial_minimo,
+        oficial_cierre = EXCLUDED.oficial_cierre,
+        paralelo_apertura = EXCLUDED.paralelo_apertura,
+        paralelo_maximo = EXCLUDED.paralelo_maximo,
+        paralelo_minimo = EXCLUDED.paralelo_minimo,
+        paralelo_cierre = EXCLUDED.paralelo_cierre,
+        muestras = EXCLUDED.muestras;
+    
+    -- 3. Retención: muestras crudas y velas horarias antiguas (las diarias se conservan).
+    -- Se corta en límite de día para que el primer día con muestras siga completo
+    DELETE FROM tasas_intradia WHERE capturado_en < DATE_TRUNC('day', v_referencia - p_retencion_muestras);
+    GET DIAGNOSTICS v_borradas = ROW_COUNT;
+    
+    DELETE FROM tasas_intradia_ohlc
+    WHERE resolucion = '1h' AND inicio < v_referencia - p_retencion_horaria;
+    
+    RETURN v_borradas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- BLOQUEOS DE TAREAS PROGRAMADAS
+-- Con varios workers o réplicas cada instancia inicia su propio scheduler;
+-- antes de correr un trabajo se toma un lease en esta tabla para que solo
+-- una instancia lo ejecute. El titular lo renueva mientras la tarea sigue
+-- en curso y al terminar lo acorta en lugar de borrarlo, para que las demás
+-- instancias que disparan el mismo horario un poco después no lo repitan.
+-- Si la instancia muere, otra lo toma cuando expira.
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS bloqueos_tareas (
+    tarea VARCHAR(50) PRIMARY KEY,
+    titular TEXT NOT NULL,
+    adquirido_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expira_en TIMESTAMPTZ NOT NULL
+);
+
+-- Tomar el bloqueo si está libre o expirado, o renovarlo si ya es de p_titular.
+-- Devuelve TRUE si queda a nombre de p_titular durante p_segundos
+CREATE OR REPLACE FUNCTION adquirir_bloqueo(
+    p_tarea TEXT,
+    p_titular TEXT,
+    p_segundos INTEGER
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+    INSERT INTO bloqueos_tareas (tarea, titular, adquirido_en, expira_en)
+    VALUES (p_tarea, p_titular, NOW(), NOW() + MAKE_INTERVAL(secs => p_segundos))
+    ON CONFLICT (tarea) DO UPDATE SET
+        titular = EXCLUDED.titular,
+        adquirido_en = CASE
+            WHEN bloqueos_tareas.titular = EXCLUDED.titular THEN bloqueos_tareas.adquirido_en
+            ELSE EXCLUDED.adquirido_en
+        END,
+        expira_en = EXCLUDED.expira_en
+    WHERE bloqueos_tareas.titular = EXCLUDED.titular
+       OR bloqueos_tareas.expira_en < NOW();
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ============================================
+-- HISTORIAL DE EJECUCIONES
+-- ============================================
+
+-- Ejecuciones de las tareas (bvc, tasas, backfill, espejo) con sus puntos de control
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id VARCHAR(32) PRIMARY KEY,
+    tarea VARCHAR(20) NOT NULL,
+    instancia TEXT,
+    estado VARCHAR(20) NOT NULL,
+    parametros JSONB DEFAULT '{}'::jsonb,
+    inicio TIMESTAMP NOT NULL,
+    fin TIMESTAMP,
+    duracion_segundos DECIMAL(12, 3),
+    etapas JSONB DEFAULT '{}'::jsonb,
+    progreso JSONB,
+    resultado JSONB,
+    puntos_control JSONB DEFAULT '{}'::jsonb,
+    reanuda VARCHAR(32),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Resultado de cada símbolo en una ejecución BVC (pendiente, sin_cambios, escrito, fallido)
+CREATE TABLE IF NOT EXISTS ejecuciones_simbolos (
+    ejecucion_id VARCHAR(32) NOT NULL REFERENCES ejecuciones(id) ON DELETE CASCADE,
+    simbolo VARCHAR(20) NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    filas INTEGER DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (ejecucion_id, simbolo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_inicio ON ejecuciones(inicio DESC);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_tarea_inicio ON ejecuciones(tarea, inicio DESC);
+-- Seguimiento de ejecuciones terminadas por las demás instancias
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_fin ON ejecuciones(fin);
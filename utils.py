@@ -7,7 +7,7 @@ import sys
 from database import db
 from scheduler import scheduler
 from services import binance_p2p_service, bcv_service, bvc_service
-from datetime import date
+from datetime import date, datetime
 
 
 async def poblar_acciones_ejemplo():
@@ -120,6 +120,33 @@ async def actualizar_ahora():
     print("✅ Actualización completada")
 
 
+def _leer_fecha(texto: str):
+    """Convertir una fecha YYYY-MM-DD opcional"""
+    texto = texto.strip()
+    return datetime.strptime(texto, "%Y-%m-%d").date() if texto else None
+
+
+async def backfill_historico(fecha_inicio=None, fecha_fin=None, confirmar: bool = True):
+    """Reconstruir el histórico completo de precios BVC"""
+    print("📚 Backfill del histórico de precios BVC")
+    print("   - Descarga el histórico completo de cada acción")
+    print("   - Convierte cada fila con la tasa de cambio de su fecha")
+    print("   - Escribe en lotes (upsert), se puede repetir sin duplicar\n")
+    
+    if confirmar:
+        fecha_inicio = _leer_fecha(input("Fecha inicio (YYYY-MM-DD, vacío = todo): "))
+        fecha_fin = _leer_fecha(input("Fecha fin (YYYY-MM-DD, vacío = hoy): "))
+    
+    ejecucion = await scheduler.ejecutar_ahora("backfill", fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    resultado = ejecucion.get('resultado') or {}
+    
+    if ejecucion['estado'] in ('completada', 'parcial'):
+        print(f"✅ Backfill completado: {resultado.get('insertados', 0)} insertados, "
+              f"{resultado.get('actualizados', 0)} actualizados, {resultado.get('errores', 0)} errores")
+    else:
+        print("❌ El backfill no se completó, revisa los logs")
+
+
 async def ver_resumen():
     """Ver resumen del mercado"""
     print("📊 Obteniendo resumen del mercado...")
@@ -171,6 +198,7 @@ def mostrar_menu():
     print("5. Actualizar precios ahora (¡LENTO! ~5 min)")
     print("6. Ver resumen del mercado")
     print("7. Verificar configuración")
+    print("8. Backfill del histórico BVC (¡LENTO!)")
     print("0. Salir")
     print("="*60)
 
@@ -200,6 +228,8 @@ async def main():
                 await ver_resumen()
             elif opcion == "7":
                 await verificar_config()
+            elif opcion == "8":
+                await backfill_historico()
             else:
                 print("❌ Opción inválida")
             
@@ -214,4 +244,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Uso no interactivo: python utils.py backfill [YYYY-MM-DD inicio] [YYYY-MM-DD fin]
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        fechas = [_leer_fecha(f) for f in sys.argv[2:4]]
+        fechas += [None] * (2 - len(fechas))
+        asyncio.run(backfill_historico(*fechas, confirmar=False))
+    else:
+        asyncio.run(main())